@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Analytics Report Segment Ingestion
+Downloads the gzipped TSV segments behind analytics report instances to disk
+and streams them, row by row, into the local analytics store
+"""
+
+import io
+import csv
+import gzip
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from analytics_store import (
+    DIMENSION_COLUMNS, MEASURE_COLUMNS, AnalyticsStore, header_mapping, instances_watermark_key, parse_measure,
+    parse_report_date
+)
+from appstore_client import AppStoreConnectClient, AppStoreConnectError, file_md5
+from appstore_http_cache import APPSTORE_DATA_DIR
+from report_columns import NUMPY_AVAILABLE, ColumnReader, np, open_report
+
+DEFAULT_SEGMENT_DIR = APPSTORE_DATA_DIR / "segments"
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Report cells can be long (page titles, campaign names)
+csv.field_size_limit(1 << 20)
+
+
+def open_segment(path: Path) -> io.TextIOBase:
+    """Text stream over a downloaded segment, decompressing on the fly when it is gzipped"""
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    if magic == GZIP_MAGIC:
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    # Served with Content-Encoding: gzip, so the transport already decompressed it
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def iter_segment_rows(path: Path) -> Iterator[Dict]:
+    """Typed report_rows dicts from a segment file, one line at a time"""
+    with open_segment(path) as f:
+        reader = csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE)
+        header = next(reader, None)
+        if not header:
+            return
+        mapping = header_mapping(header)
+
+        for cells in reader:
+            if not cells:
+                continue
+            row = {}
+            for index, column, kind in mapping:
+                value = cells[index] if index < len(cells) else ""
+                if kind == "measure":
+                    row[column] = parse_measure(value)
+                elif kind == "date":
+                    row[column] = parse_report_date(value)
+                else:
+                    row[column] = value or None
+            if row.get("date"):
+                yield row
+
+
+def iter_segment_columns(path: Path) -> Iterator[Dict[str, List]]:
+    """report_rows columns of a segment file, one NumPy block at a time; rows without a date are dropped"""
+    with open_report(path) as f:
+        for block in ColumnReader(f, DIMENSION_COLUMNS, MEASURE_COLUMNS):
+            columns = {}
+            for name, column in DIMENSION_COLUMNS.items():
+                if name in block:
+                    # Dictionary-encoded, so each distinct value is converted once per block
+                    codes, values = block.codes(name)
+                    convert = parse_report_date if column == "date" else (lambda value: value or None)
+                    columns[column] = np.asarray([convert(value) for value in values], dtype=object)[codes]
+            if "date" not in columns:
+                return
+
+            for name, column in MEASURE_COLUMNS.items():
+                if name in block:
+                    numbers = block.number(name)
+                    blank = np.isnan(numbers)
+                    measure = np.where(blank, 0, numbers).astype(np.int64).astype(object)
+                    measure[blank] = None
+                    columns[column] = measure
+
+            dated = np.not_equal(columns["date"], None)
+            yield {column: values[dated].tolist() for column, values in columns.items()}
+
+
+class SegmentIngestor:
+    """Downloads report segments and loads each into the store exactly once; the pipeline's workers share one"""
+
+    def __init__(self, client: AppStoreConnectClient, store: AnalyticsStore,
+                 segment_dir: Path = DEFAULT_SEGMENT_DIR):
+        self.client = client
+        self.store = store
+        self.segment_dir = Path(segment_dir)
+
+        self._lock = threading.Lock()
+        self.counters = {"downloaded": 0, "reused": 0, "skipped": 0, "rows": 0, "bytes": 0}
+        self.errors: List[Dict] = []
+        self._failed_instances = set()
+
+    def segments_for(self, instances: Iterable[Dict], report_names: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Flatten walker instances into segment descriptors, optionally for some reports only"""
+        wanted = set(report_names) if report_names else None
+        segments = []
+        for instance in instances:
+            if wanted is not None and instance.get("report_name") not in wanted:
+                continue
+            for segment in instance.get("segments", []):
+                if segment.get("url"):
+                    segments.append(dict(segment,
+                                         instance_id=instance["id"],
+                                         report_name=instance.get("report_name"),
+                                         category=instance.get("category"),
+                                         granularity=instance.get("granularity"),
+                                         processing_date=instance.get("processing_date")))
+        return segments
+
+    def ingest_segment(self, segment: Dict, raise_errors: bool = False) -> int:
+        """Download one segment to disk and stream its rows into the store; returns the rows loaded
+
+        Failures are recorded (and the instance kept behind its watermark);
+        raise_errors also re-raises them, for callers that count failures.
+        """
+        if self.store.has_segment(segment["id"], segment.get("checksum")):
+            with self._lock:
+                self.counters["skipped"] += 1
+            return 0
+
+        path = self.segment_dir / f"{segment['id']}.tsv.gz"
+        try:
+            size = self._fetch(segment, path)
+            if NUMPY_AVAILABLE:
+                rows = self.store.write_segment_columns(segment, iter_segment_columns(path))
+            else:
+                rows = self.store.write_segment(segment, iter_segment_rows(path))
+        except AppStoreConnectError as e:
+            with self._lock:
+                self.errors.append(e.to_dict())
+                self._failed_instances.add(segment["instance_id"])
+            if raise_errors:
+                raise
+            return 0
+        except (OSError, ValueError, csv.Error) as e:
+            with self._lock:
+                self.errors.append({"error": "segment_parse_failed", "message": str(e), "segment": segment["id"]})
+                self._failed_instances.add(segment["instance_id"])
+            if raise_errors:
+                raise
+            return 0
+
+        with self._lock:
+            self.counters["bytes"] += size
+            self.counters["rows"] += rows
+        return rows
+
+    def _fetch(self, segment: Dict, path: Path) -> int:
+        """Bytes downloaded for a segment; a local copy that matches its checksum is reused as is"""
+        checksum = segment.get("checksum")
+        if checksum and path.exists() and file_md5(path) == checksum.lower():
+            with self._lock:
+                self.counters["reused"] += 1
+            return 0
+        size = self.client.download(segment["url"], path, checksum=checksum)
+        with self._lock:
+            self.counters["downloaded"] += 1
+        return size
+
+    def complete_through(self, instances: Iterable[Dict],
+                         report_names: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """Newest fully ingested instance per report, stopping before any instance that failed"""
+        wanted = set(report_names) if report_names else None
+        by_report: Dict[str, List[Dict]] = {}
+        for instance in instances:
+            name = instance.get("report_name")
+            if instance.get("processing_date") and (wanted is None or name in wanted):
+                by_report.setdefault(name, []).append(instance)
+
+        marks = {}
+        for name, report_instances in by_report.items():
+            for instance in sorted(report_instances, key=lambda item: item["processing_date"]):
+                if instance["id"] in self._failed_instances:
+                    break
+                marks[name] = instance
+        return marks
+
+    def advance_watermarks(self, instances: Iterable[Dict],
+                           report_names: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """Move each report's watermark to its newest fully ingested instance"""
+        watermarks = {}
+        for name, instance in self.complete_through(instances, report_names).items():
+            self.store.advance_watermark(instances_watermark_key(name), instance["processing_date"], instance["id"])
+            watermarks[name] = instance["processing_date"]
+        return watermarks
+
+    def stats(self) -> Dict:
+        """Download counters and errors so far"""
+        with self._lock:
+            return dict(self.counters, errors=list(self.errors))
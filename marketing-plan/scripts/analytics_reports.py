@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Analytics Report Tree Walker
+Resolves analyticsReportRequests → reports → instances → segments for an app
+in a bounded number of round trips instead of one request per child
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from appstore_client import AppStoreConnectClient, AppStoreConnectError
+from appstore_query import MAX_INCLUDED_LIMIT, QueryBuilder
+
+# Only the attributes the collectors and segment ingestion actually read
+REQUEST_FIELDS = ("accessType", "stoppedDueToInactivity", "reports")
+REPORT_FIELDS = ("name", "category", "instances")
+INSTANCE_FIELDS = ("granularity", "processingDate", "segments")
+SEGMENT_FIELDS = ("checksum", "sizeInBytes", "url")
+
+
+class AnalyticsReportWalker:
+    """Builds the full analytics report tree with include= where possible and concurrent fan-out elsewhere"""
+
+    def __init__(self, client: AppStoreConnectClient, max_workers: int = 8):
+        self.client = client
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+        self.round_trips = 0
+        self.errors: List[Dict] = []
+
+    def _get_all(self, endpoint: str) -> List[Dict]:
+        """Fetch every page of a listing, recording round trips and errors instead of raising"""
+        with self._lock:
+            self.round_trips += 1
+
+        result = self.client.get_all(endpoint)
+        if "error" in result:
+            with self._lock:
+                self.errors.append(result)
+            return []
+        return result.get("data", [])
+
+    def _stream(self, endpoint: str) -> Iterator[Dict]:
+        """Yield a listing's resources as they are parsed, recording errors instead of raising"""
+        with self._lock:
+            self.round_trips += 1
+
+        try:
+            yield from self.client.stream_resources(endpoint)
+        except AppStoreConnectError as e:
+            with self._lock:
+                self.errors.append(e.to_dict())
+        except ValueError as e:
+            with self._lock:
+                self.errors.append(AppStoreConnectError("invalid_json", str(e), endpoint).to_dict())
+
+    def _fan_out(self, items: List[Dict], fetch: Callable[[Dict], None]):
+        """Run fetch for every item concurrently; one level of the tree per call"""
+        if not items:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            list(executor.map(fetch, items))
+
+    def list_requests_with_reports(self, app_id: str, access_type: Optional[str] = None) -> List[Dict]:
+        """Levels 1 and 2: report requests with their reports inlined via include=reports"""
+        query = (QueryBuilder(f"/v1/apps/{app_id}/analyticsReportRequests")
+                 .include("reports")
+                 .fields("analyticsReportRequests", *REQUEST_FIELDS)
+                 .fields("analyticsReports", *REPORT_FIELDS)
+                 .limit(MAX_INCLUDED_LIMIT, "reports"))
+        if access_type:
+            query.filter("accessType", access_type)
+        endpoint = query.build()
+
+        requests_tree = []
+        try:
+            for page in self.client.iter_pages(endpoint):
+                with self._lock:
+                    self.round_trips += 1
+
+                included_reports = {
+                    resource["id"]: resource
+                    for resource in page.get("included") or []
+                    if resource.get("type") == "analyticsReports"
+                }
+
+                for request in page.get("data") or []:
+                    relationship = (request.get("relationships") or {}).get("reports") or {}
+                    linked = relationship.get("data") or []
+                    total = ((relationship.get("meta") or {}).get("paging") or {}).get("total", len(linked))
+
+                    requests_tree.append({
+                        "id": request["id"],
+                        "access_type": (request.get("attributes") or {}).get("accessType"),
+                        "stopped_due_to_inactivity": (request.get("attributes") or {}).get("stoppedDueToInactivity"),
+                        "reports": [self._report_node(included_reports[ref["id"]])
+                                    for ref in linked if ref.get("id") in included_reports],
+                        # More reports than include= returns; fetched separately below
+                        "_reports_truncated": total > len(linked)
+                    })
+        except AppStoreConnectError as e:
+            self.errors.append(e.to_dict())
+
+        truncated = [node for node in requests_tree if node.pop("_reports_truncated")]
+
+        def fetch_reports(node: Dict):
+            node["reports"] = [self._report_node(report) for report in self._get_all(
+                QueryBuilder(f"/v1/analyticsReportRequests/{node['id']}/reports")
+                .fields("analyticsReports", *REPORT_FIELDS).build()
+            )]
+
+        self._fan_out(truncated, fetch_reports)
+        return requests_tree
+
+    def _report_node(self, report: Dict) -> Dict:
+        attributes = report.get("attributes") or {}
+        return {
+            "id": report["id"],
+            "name": attributes.get("name"),
+            "category": attributes.get("category"),
+            "instances": []
+        }
+
+    def walk(self, app_id: str, categories: Optional[Iterable[str]] = None,
+             report_names: Optional[Iterable[str]] = None,
+             granularity: Optional[str] = "DAILY",
+             include_segments: bool = True,
+             access_type: Optional[str] = None,
+             processed_since: Optional[Dict[str, str]] = None) -> Dict:
+        """Return the request→report→instance→segment tree for an app
+
+        Round trips: one paged listing for requests and reports, then one
+        concurrent wave for instances and one for segments. Instance listings
+        are streamed, so each instance's segment lookup starts as soon as the
+        instance is parsed rather than after the whole wave. categories,
+        report_names and granularity limit how far the fan-out goes.
+        processed_since maps report names to a processing date; older instances
+        of those reports are listed without looking up their segments.
+        """
+        self.round_trips = 0
+        self.errors = []
+        processed_since = processed_since or {}
+
+        requests_tree = self.list_requests_with_reports(app_id, access_type)
+
+        category_filter = set(categories) if categories else None
+        name_filter = set(report_names) if report_names else None
+
+        reports = []
+        report_parents = {}
+        for request_node in requests_tree:
+            request_node["reports"] = [
+                report for report in request_node["reports"]
+                if (category_filter is None or report["category"] in category_filter)
+                and (name_filter is None or report["name"] in name_filter)
+            ]
+            reports.extend(request_node["reports"])
+            for report in request_node["reports"]:
+                report_parents[report["id"]] = request_node["id"]
+
+        # Level 4: segments for one instance
+        def fetch_segments(instance: Dict):
+            for segment in self._stream(
+                    QueryBuilder(f"/v1/analyticsReportInstances/{instance['id']}/segments")
+                    .fields("analyticsReportSegments", *SEGMENT_FIELDS).build()):
+                attributes = segment.get("attributes") or {}
+                instance["segments"].append({
+                    "id": segment["id"],
+                    "checksum": attributes.get("checksum"),
+                    "size_in_bytes": attributes.get("sizeInBytes"),
+                    "url": attributes.get("url")
+                })
+
+        # Level 3: instances for every report, concurrently, queueing each instance's segments on arrival
+        with ThreadPoolExecutor(max_workers=self.max_workers) as segment_pool:
+            segment_lookups = []
+
+            def fetch_instances(report: Dict):
+                cutoff = processed_since.get(report["name"])
+                query = QueryBuilder(f"/v1/analyticsReports/{report['id']}/instances")
+                if granularity:
+                    query.filter("granularity", granularity)
+                for instance in self._stream(query.fields("analyticsReportInstances", *INSTANCE_FIELDS).build()):
+                    attributes = instance.get("attributes") or {}
+                    node = {
+                        "id": instance["id"],
+                        "granularity": attributes.get("granularity"),
+                        "processing_date": attributes.get("processingDate"),
+                        "segments": []
+                    }
+                    report["instances"].append(node)
+                    if cutoff is not None and (node["processing_date"] or "") < cutoff:
+                        # Already ingested in an earlier run
+                        node["segments_skipped"] = True
+                    elif include_segments:
+                        segment_lookups.append(segment_pool.submit(fetch_segments, node))
+
+            self._fan_out(reports, fetch_instances)
+            for lookup in segment_lookups:
+                lookup.result()
+
+        instances = [instance for report in reports for instance in report["instances"]]
+
+        # Flat view for callers that only want instances and their download segments
+        flat_instances = [
+            dict(instance, request_id=report_parents[report["id"]], report_id=report["id"],
+                 report_name=report["name"], category=report["category"])
+            for report in reports for instance in report["instances"]
+        ]
+
+        return {
+            "report_requests": requests_tree,
+            "instances": flat_instances,
+            "totals": {
+                "requests": len(requests_tree),
+                "reports": len(reports),
+                "instances": len(instances),
+                "segments": sum(len(instance["segments"]) for instance in instances),
+                "instances_already_processed": sum(1 for instance in instances if instance.get("segments_skipped"))
+            },
+            "round_trips": self.round_trips,
+            "errors": self.errors
+        }
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Local Analytics Report Store
+SQLite tables of typed rows parsed from App Store Connect analytics report
+segments and of sales report summaries, the aggregates behind the dashboard
+overview metrics, and the watermarks incremental runs resume from
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from appstore_http_cache import APPSTORE_DATA_DIR
+
+DEFAULT_STORE_PATH = APPSTORE_DATA_DIR / "analytics.sqlite"
+
+# Reports that feed the overview metrics
+ENGAGEMENT_REPORT = "App Store Discovery and Engagement Standard"
+DOWNLOADS_REPORT = "App Downloads Standard"
+SESSIONS_REPORT = "App Sessions Standard"
+CRASHES_REPORT = "App Crashes"
+OVERVIEW_REPORTS = (ENGAGEMENT_REPORT, DOWNLOADS_REPORT, SESSIONS_REPORT, CRASHES_REPORT)
+
+# TSV header → report_rows column; the event column holds Event or Download Type
+DIMENSION_COLUMNS = {
+    "Date": "date",
+    "Event": "event",
+    "Download Type": "event",
+    "Territory": "territory",
+    "Source Type": "source_type",
+    "Device": "device"
+}
+MEASURE_COLUMNS = {
+    "Counts": "counts",
+    "Unique Counts": "unique_counts",
+    "Sessions": "sessions",
+    "Total Session Duration": "session_duration",
+    "Unique Devices": "unique_devices",
+    "Crashes": "crashes"
+}
+ROW_COLUMNS = ("segment_id", "report_name", "date", "event", "territory", "source_type", "device",
+               "counts", "unique_counts", "sessions", "session_duration", "unique_devices", "crashes")
+TOTAL_COLUMNS = ROW_COLUMNS[7:]
+
+# Days before a watermark that incremental runs re-check for late or restated data
+DEFAULT_LATE_DAYS = 3
+
+# Download types the App Store Connect dashboard counts as "Total Downloads"
+COUNTED_DOWNLOAD_TYPES = ("First-time download", "Redownload")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    segment_id TEXT PRIMARY KEY,
+    instance_id TEXT NOT NULL,
+    report_name TEXT NOT NULL,
+    category TEXT,
+    granularity TEXT,
+    processing_date TEXT,
+    checksum TEXT,
+    size_in_bytes INTEGER,
+    row_count INTEGER NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS report_rows (
+    segment_id TEXT NOT NULL REFERENCES segments(segment_id),
+    report_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    event TEXT,
+    territory TEXT,
+    source_type TEXT,
+    device TEXT,
+    counts INTEGER,
+    unique_counts INTEGER,
+    sessions INTEGER,
+    session_duration INTEGER,
+    unique_devices INTEGER,
+    crashes INTEGER
+);
+CREATE INDEX IF NOT EXISTS report_rows_by_report_date ON report_rows (report_name, date);
+CREATE INDEX IF NOT EXISTS report_rows_by_segment ON report_rows (segment_id);
+CREATE TABLE IF NOT EXISTS sales_reports (
+    report_type TEXT NOT NULL,
+    frequency TEXT NOT NULL,
+    report_date TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    PRIMARY KEY (report_type, frequency, report_date)
+);
+CREATE TABLE IF NOT EXISTS day_partitions (
+    report_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    instance_id TEXT NOT NULL,
+    processing_date TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (report_name, date)
+);
+CREATE TABLE IF NOT EXISTS daily_totals (
+    report_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    event TEXT NOT NULL,
+    counts INTEGER,
+    unique_counts INTEGER,
+    sessions INTEGER,
+    session_duration INTEGER,
+    unique_devices INTEGER,
+    crashes INTEGER,
+    PRIMARY KEY (report_name, date, event)
+);
+CREATE TABLE IF NOT EXISTS dirty_partitions (
+    report_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    marked_at TEXT NOT NULL,
+    PRIMARY KEY (report_name, date)
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    key TEXT PRIMARY KEY,
+    report_date TEXT,
+    instance_id TEXT,
+    updated_at TEXT NOT NULL
+);
+"""
+
+
+def parse_report_date(value: str) -> Optional[str]:
+    """ISO date from the YYYY-MM-DD or MM/DD/YYYY forms used in report files"""
+    value = value.strip()
+    for date_format in ("%Y-%m-%d", "%m/%d/%Y"):
+        try:
+            return datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_measure(value: str) -> Optional[int]:
+    """Integer measure from a report cell; blank or non-numeric cells become NULL"""
+    value = value.strip().replace(",", "")
+    if not value:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+def header_mapping(header: List[str]) -> List[Tuple[int, str, str]]:
+    """(TSV column index, report_rows column, kind) for the known columns of a report header"""
+    mapping = []
+    for index, name in enumerate(header):
+        name = name.strip()
+        if name in DIMENSION_COLUMNS:
+            mapping.append((index, DIMENSION_COLUMNS[name], "date" if name == "Date" else "text"))
+        elif name in MEASURE_COLUMNS:
+            mapping.append((index, MEASURE_COLUMNS[name], "measure"))
+    return mapping
+
+
+def sales_watermark_key(report_type: str, frequency: str) -> str:
+    return f"salesReports/{report_type}/{frequency}"
+
+
+def instances_watermark_key(report_name: str) -> str:
+    return f"analyticsReports/{report_name}"
+
+
+def percent_change(current: float, previous: float) -> str:
+    """Dashboard-style change label, e.g. '+12%'"""
+    if not previous:
+        return "0%"
+    change = (current - previous) / previous * 100
+    return f"{change:+.0f}%"
+
+
+class AnalyticsStore:
+    """Thread-safe SQLite store of analytics report rows keyed by segment
+
+    Each (report, day) partition belongs to the newest instance that carried
+    rows for it. A re-issued instance replaces only the days it covers, and
+    those days' daily_totals are marked dirty and rebuilt on the next read.
+    """
+
+    def __init__(self, path: Path = DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+        self._connection.commit()
+        self._migrate()
+        self.counters = {"reissued_days": 0, "stale_days": 0}
+
+    def _migrate(self):
+        """Build day partitions and daily totals for rows stored before they existed"""
+        with self._lock, self._connection:
+            if self._connection.execute("SELECT 1 FROM day_partitions LIMIT 1").fetchone() is not None:
+                return
+            now = datetime.now().isoformat()
+            # SQLite takes the bare columns from the row holding MAX()
+            self._connection.execute(
+                "INSERT INTO day_partitions "
+                "SELECT report_rows.report_name, date, instance_id, MAX(processing_date), ? "
+                "FROM report_rows JOIN segments USING (segment_id) GROUP BY report_rows.report_name, date", (now,))
+            self._connection.execute(
+                "INSERT OR IGNORE INTO dirty_partitions SELECT report_name, date, ? FROM day_partitions", (now,))
+
+    def has_segment(self, segment_id: str, checksum: Optional[str] = None) -> bool:
+        """Whether the segment is stored; with a checksum, only if it was stored with that checksum
+
+        Apple re-issues a segment under the same id with a new checksum, so a
+        different one means the stored copy is outdated.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT checksum FROM segments WHERE segment_id = ?", (segment_id,)).fetchone()
+        if row is None:
+            return False
+        return checksum is None or row[0] is None or row[0] == checksum
+
+    def write_segment(self, segment: Dict, rows: Iterable[Dict], batch_size: int = 5000) -> int:
+        """Replace one segment's rows in a single transaction, inserting in batches"""
+        def batches() -> Iterator[List[Tuple]]:
+            batch = []
+            for row in rows:
+                row["segment_id"] = segment["id"]
+                row["report_name"] = segment["report_name"]
+                batch.append(tuple(row.get(column) for column in ROW_COLUMNS))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        return self._replace_segment(segment, batches())
+
+    def write_segment_columns(self, segment: Dict, blocks: Iterable[Dict[str, List]]) -> int:
+        """Replace one segment's rows from column blocks (report_rows column → values), one insert per block"""
+        def batches() -> Iterator[List[Tuple]]:
+            for block in blocks:
+                count = len(next(iter(block.values()), ()))
+                if not count:
+                    continue
+                block = dict(block, segment_id=repeat(segment["id"], count),
+                             report_name=repeat(segment["report_name"], count))
+                yield list(zip(*(block.get(column) or repeat(None, count) for column in ROW_COLUMNS)))
+
+        return self._replace_segment(segment, batches())
+
+    def _replace_segment(self, segment: Dict, batches: Iterable[List[Tuple]]) -> int:
+        insert = (f"INSERT INTO report_rows ({', '.join(ROW_COLUMNS)}) "
+                  f"VALUES ({', '.join('?' for _ in ROW_COLUMNS)})")
+
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM report_rows WHERE segment_id = ?", (segment["id"],))
+            for batch in batches:
+                self._connection.executemany(insert, batch)
+
+            self._connection.execute(
+                "INSERT OR REPLACE INTO segments VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, ?)",
+                (segment["id"], segment["instance_id"], segment["report_name"], segment.get("category"),
+                 segment.get("granularity"), segment.get("processing_date"), segment.get("checksum"),
+                 segment.get("size_in_bytes"), datetime.now().isoformat()))
+            self._reconcile_days(segment)
+
+            count = self._connection.execute(
+                "SELECT COUNT(*) FROM report_rows WHERE segment_id = ?", (segment["id"],)).fetchone()[0]
+            self._connection.execute("UPDATE segments SET row_count = ? WHERE segment_id = ?",
+                                     (count, segment["id"]))
+        return count
+
+    def _reconcile_days(self, segment: Dict):
+        """Upsert the day partitions a newly written segment covers (inside its transaction)
+
+        Days owned by an older instance are re-issued: that instance's rows
+        for the day are replaced by this segment's. Days already owned by a
+        newer instance keep their rows and this segment's rows for them are
+        dropped, so out-of-order ingestion can't bring stale numbers back.
+        """
+        report_name, instance_id = segment["report_name"], segment["instance_id"]
+        processing_date = segment.get("processing_date") or ""
+        now = datetime.now().isoformat()
+
+        days = self._connection.execute(
+            "SELECT DISTINCT report_rows.date, day_partitions.instance_id, day_partitions.processing_date "
+            "FROM report_rows LEFT JOIN day_partitions "
+            "ON day_partitions.report_name = report_rows.report_name AND day_partitions.date = report_rows.date "
+            "WHERE report_rows.segment_id = ?", (segment["id"],)).fetchall()
+
+        displaced = set()
+        for day, owner, owner_processing_date in days:
+            if owner is not None and owner != instance_id:
+                if (owner_processing_date or "") > processing_date:
+                    self._connection.execute(
+                        "DELETE FROM report_rows WHERE segment_id = ? AND date = ?", (segment["id"], day))
+                    self.counters["stale_days"] += 1
+                    continue
+                other_segments = ("FROM report_rows WHERE report_name = ? AND date = ? AND segment_id IN "
+                                  "(SELECT segment_id FROM segments WHERE instance_id != ?)")
+                displaced.update(row[0] for row in self._connection.execute(
+                    f"SELECT DISTINCT segment_id {other_segments}", (report_name, day, instance_id)))
+                self._connection.execute(f"DELETE {other_segments}", (report_name, day, instance_id))
+                self.counters["reissued_days"] += 1
+
+            self._connection.execute(
+                "INSERT OR REPLACE INTO day_partitions VALUES (?, ?, ?, ?, ?)",
+                (report_name, day, instance_id, segment.get("processing_date"), now))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO dirty_partitions VALUES (?, ?, ?)", (report_name, day, now))
+
+        # Keep the row counts of the segments that lost days in step with report_rows
+        self._connection.executemany(
+            "UPDATE segments SET row_count = (SELECT COUNT(*) FROM report_rows WHERE segment_id = ?) "
+            "WHERE segment_id = ?", [(segment_id, segment_id) for segment_id in displaced])
+
+    def refresh_aggregates(self) -> int:
+        """Rebuild daily_totals for the dirty (report, day) partitions only; returns how many were rebuilt"""
+        sums = ", ".join(f"SUM({column})" for column in TOTAL_COLUMNS)
+        with self._lock, self._connection:
+            dirty = self._connection.execute("SELECT COUNT(*) FROM dirty_partitions").fetchone()[0]
+            if not dirty:
+                return 0
+            self._connection.execute(
+                "DELETE FROM daily_totals WHERE (report_name, date) IN "
+                "(SELECT report_name, date FROM dirty_partitions)")
+            self._connection.execute(
+                f"INSERT INTO daily_totals SELECT report_name, date, COALESCE(event, ''), {sums} "
+                f"FROM report_rows WHERE (report_name, date) IN (SELECT report_name, date FROM dirty_partitions) "
+                f"GROUP BY report_name, date, COALESCE(event, '')")
+            self._connection.execute("DELETE FROM dirty_partitions")
+        return dirty
+
+    def reconciliation(self) -> Dict:
+        """Re-issued and stale day partitions seen by this store, and partitions awaiting a refresh"""
+        with self._lock:
+            dirty = self._connection.execute("SELECT COUNT(*) FROM dirty_partitions").fetchone()[0]
+            return dict(self.counters, dirty_partitions=dirty)
+
+    def latest_date(self, report_names: Iterable[str] = OVERVIEW_REPORTS) -> Optional[str]:
+        names = list(report_names)
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT MAX(date) FROM report_rows WHERE report_name IN ({', '.join('?' for _ in names)})",
+                names).fetchone()
+        return row[0] if row else None
+
+    def _sum(self, column: str, report_name: str, start: str, end: str,
+             events: Optional[Tuple[str, ...]] = None) -> int:
+        query = (f"SELECT COALESCE(SUM({column}), 0) FROM daily_totals "
+                 f"WHERE report_name = ? AND date BETWEEN ? AND ?")
+        params: List = [report_name, start, end]
+        if events:
+            query += f" AND event IN ({', '.join('?' for _ in events)})"
+            params.extend(events)
+        with self._lock:
+            return self._connection.execute(query, params).fetchone()[0]
+
+    def period_totals(self, start: str, end: str) -> Dict[str, int]:
+        """Raw totals for the overview metrics between two ISO dates, inclusive"""
+        self.refresh_aggregates()
+        return {
+            "impressions": self._sum("counts", ENGAGEMENT_REPORT, start, end, ("Impression",)),
+            "unique_impressions": self._sum("unique_counts", ENGAGEMENT_REPORT, start, end, ("Impression",)),
+            "product_page_views": self._sum("counts", ENGAGEMENT_REPORT, start, end, ("Page view",)),
+            "total_downloads": self._sum("counts", DOWNLOADS_REPORT, start, end, COUNTED_DOWNLOAD_TYPES),
+            "sessions": self._sum("sessions", SESSIONS_REPORT, start, end),
+            "active_devices": self._sum("unique_devices", SESSIONS_REPORT, start, end),
+            "crashes": self._sum("crashes", CRASHES_REPORT, start, end)
+        }
+
+    def overview_metrics(self, days: int = 30, end: Optional[str] = None) -> Dict[str, Dict]:
+        """Overview metric values and changes for the last `days` days of stored data"""
+        end = end or self.latest_date()
+        if end is None:
+            return {}
+
+        end_date = date.fromisoformat(end)
+        start_date = end_date - timedelta(days=days - 1)
+        current = self.period_totals(start_date.isoformat(), end_date.isoformat())
+        previous = self.period_totals((start_date - timedelta(days=days)).isoformat(),
+                                      (start_date - timedelta(days=1)).isoformat())
+
+        def conversion(totals: Dict[str, int]) -> float:
+            return totals["total_downloads"] / totals["unique_impressions"] * 100 if totals["unique_impressions"] else 0.0
+
+        def sessions_per_device(totals: Dict[str, int]) -> float:
+            # Unique devices are per row, so this matches the dashboard's daily average only approximately
+            return totals["sessions"] / totals["active_devices"] if totals["active_devices"] else 0.0
+
+        period = {"start": start_date.isoformat(), "end": end_date.isoformat()}
+        metrics = {
+            name: {"value": current[name], "change": percent_change(current[name], previous[name])}
+            for name in ("impressions", "product_page_views", "total_downloads", "crashes")
+        }
+        metrics["conversion_rate"] = {
+            "value": f"{conversion(current):.2f}%",
+            "change": percent_change(conversion(current), conversion(previous))
+        }
+        metrics["sessions_per_active_device"] = {
+            "value": round(sessions_per_device(current), 2),
+            "change": percent_change(sessions_per_device(current), sessions_per_device(previous))
+        }
+        for metric in metrics.values():
+            metric["period"] = period
+        return metrics
+
+    def write_sales_reports(self, reports: Iterable[Dict]):
+        """Store per-period sales report summaries, replacing earlier fetches of the same period"""
+        fetched_at = datetime.now().isoformat()
+        rows = [(report["report_type"], report["frequency"], report["report_date"],
+                 json.dumps({key: value for key, value in report.items()
+                             if key not in ("report_type", "frequency", "report_date")}),
+                 fetched_at)
+                for report in reports]
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO sales_reports VALUES (?, ?, ?, ?, ?)", rows)
+
+    def sales_reports(self, report_type: str, frequency: str, start: str, end: str) -> List[Dict]:
+        """Stored summaries for report dates between start and end, inclusive, newest first"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT report_date, summary FROM sales_reports "
+                "WHERE report_type = ? AND frequency = ? AND report_date BETWEEN ? AND ? "
+                "ORDER BY report_date DESC", (report_type, frequency, start, end)).fetchall()
+        return [dict(json.loads(summary), report_type=report_type, frequency=frequency, report_date=report_date)
+                for report_date, summary in rows]
+
+    def watermark(self, key: str) -> Optional[Dict]:
+        """Last complete report date and last processed instance id recorded under key"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT report_date, instance_id, updated_at FROM watermarks WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return {"report_date": row[0], "instance_id": row[1], "updated_at": row[2]}
+
+    def advance_watermark(self, key: str, report_date: str, instance_id: Optional[str] = None):
+        """Move a watermark forward; an older report date never moves it back"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO watermarks VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET report_date = excluded.report_date, "
+                "instance_id = excluded.instance_id, updated_at = excluded.updated_at "
+                "WHERE excluded.report_date >= watermarks.report_date OR watermarks.report_date IS NULL",
+                (key, report_date, instance_id, datetime.now().isoformat()))
+
+    def resume_date(self, key: str, late_days: int = DEFAULT_LATE_DAYS) -> Optional[str]:
+        """First report date an incremental run should fetch again, or None to fetch everything
+
+        Watermarks on a full date step back late_days to pick up late or
+        restated data; month and year periods re-check the watermark period itself.
+        """
+        watermark = self.watermark(key)
+        if watermark is None or not watermark["report_date"]:
+            return None
+        try:
+            watermark_date = date.fromisoformat(watermark["report_date"])
+        except ValueError:
+            return watermark["report_date"]
+        return (watermark_date - timedelta(days=late_days)).isoformat()
+
+    def resume_dates(self, keys: Iterable[str], late_days: int = DEFAULT_LATE_DAYS) -> Dict[str, str]:
+        """resume_date() for each key that has a watermark"""
+        resumes = {}
+        for key in keys:
+            resume = self.resume_date(key, late_days)
+            if resume is not None:
+                resumes[key] = resume
+        return resumes
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+App Store Connect Record/Replay Archive
+Stores every response of a collection run in a compressed, content-addressed
+archive so the whole pipeline can later be replayed offline and deterministically
+"""
+
+import os
+import gzip
+import json
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+from appstore_http_cache import APPSTORE_DATA_DIR
+
+DEFAULT_ARCHIVE_DIR = APPSTORE_DATA_DIR / "archive"
+
+# Response headers worth keeping; everything else is transport detail
+ARCHIVED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def request_key(method: str, url: str, data: Optional[Dict] = None) -> str:
+    """Archive key for a request: method and URL, plus a body digest for writes"""
+    key = f"{method.upper()} {url}"
+    if data is not None:
+        body = json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        key += f" #{hashlib.sha256(body).hexdigest()[:16]}"
+    return key
+
+
+def list_runs(root: Path = DEFAULT_ARCHIVE_DIR) -> List[Dict]:
+    """Recorded runs, oldest first"""
+    runs = []
+    for index_path in sorted((Path(root) / "runs").glob("*.json")):
+        with open(index_path, "r") as f:
+            index = json.load(f)
+        runs.append({
+            "run_id": index["run_id"],
+            "recorded_at": index["recorded_at"],
+            "responses": len(index["responses"])
+        })
+    return runs
+
+
+class ResponseArchive:
+    """One recorded run: an index of request keys pointing at gzip blobs named by their SHA-256"""
+
+    def __init__(self, run_id: Optional[str] = None, root: Path = DEFAULT_ARCHIVE_DIR,
+                 replay: bool = False):
+        self.root = Path(root)
+        self.replaying = replay
+        self._lock = threading.Lock()
+        self.counters = {"recorded": 0, "replayed": 0, "missing": 0, "blobs_written": 0}
+
+        if replay:
+            if run_id is None:
+                raise ValueError("Replay needs the run id of a recorded run")
+            index_path = self._index_path(run_id)
+            if not index_path.exists():
+                raise ValueError(f"No recorded run {run_id} in {self.root}")
+            with open(index_path, "r") as f:
+                index = json.load(f)
+            self.run_id = index["run_id"]
+            self.recorded_at = datetime.fromisoformat(index["recorded_at"])
+            self.responses: Dict[str, Dict] = index["responses"]
+            self.metadata: Dict = index.get("metadata", {})
+        else:
+            self.recorded_at = datetime.now()
+            self.run_id = run_id or self.recorded_at.strftime("%Y%m%d_%H%M%S")
+            self.responses = {}
+            # Run state that decides which requests are made (e.g. ingestion watermarks),
+            # so a replay issues exactly the recorded requests
+            self.metadata = {}
+
+    def _index_path(self, run_id: str) -> Path:
+        return self.root / "runs" / f"{run_id}.json"
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / "blobs" / digest[:2] / f"{digest}.gz"
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _write_blob(self, body: bytes) -> str:
+        """Store a body once, however many runs or URLs return it"""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+            self._count("blobs_written")
+        return digest
+
+    def _add(self, key: str, response: requests.Response, digest: str):
+        entry = {
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in ARCHIVED_HEADERS if name in response.headers},
+            "blob": digest
+        }
+        with self._lock:
+            self.responses[key] = entry
+            self.counters["recorded"] += 1
+
+    def record(self, method: str, url: str, data: Optional[Dict], response: requests.Response,
+               stream: bool = False):
+        """Archive a successful response
+
+        A streamed response is archived as its caller consumes it, so its
+        body is never buffered in memory just for the archive.
+        """
+        if stream:
+            self._tee(request_key(method, url, data), response)
+        else:
+            self._add(request_key(method, url, data), response, self._write_blob(response.content))
+
+    def _tee(self, key: str, response: requests.Response):
+        """Copy each chunk the caller reads from iter_content into a blob, recorded once the body is complete"""
+        iter_content = response.iter_content
+
+        def iter_and_record(chunk_size: int = 1):
+            blobs = self.root / "blobs"
+            blobs.mkdir(parents=True, exist_ok=True)
+            tmp_path = blobs / f"{os.getpid()}.{threading.get_ident()}.{id(response)}.tmp"
+            digest = hashlib.sha256()
+            try:
+                with gzip.open(tmp_path, "wb") as f:
+                    for chunk in iter_content(chunk_size=chunk_size):
+                        digest.update(chunk)
+                        f.write(chunk)
+                        yield chunk
+            except BaseException:
+                # Failed or abandoned part way; a partial body must never be replayed
+                tmp_path.unlink(missing_ok=True)
+                raise
+
+            path = self._blob_path(digest.hexdigest())
+            if path.exists():
+                tmp_path.unlink()
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, path)
+                self._count("blobs_written")
+            self._add(key, response, digest.hexdigest())
+
+        response.iter_content = iter_and_record
+
+    def record_error(self, method: str, url: str, data: Optional[Dict], error: Exception):
+        """Archive a failed request so replay fails the same way"""
+        entry = {
+            "error": getattr(error, "error", "request_failed"),
+            "message": getattr(error, "message", str(error)),
+            "api_errors": getattr(error, "api_errors", [])
+        }
+        with self._lock:
+            self.responses[request_key(method, url, data)] = entry
+            self.counters["recorded"] += 1
+
+    def replay(self, method: str, url: str, data: Optional[Dict], endpoint: str) -> requests.Response:
+        """Rebuild the recorded response for a request, raising AppStoreConnectError like the live call did"""
+        # Imported here because the client imports this module
+        from appstore_client import AppStoreConnectError
+
+        entry = self.responses.get(request_key(method, url, data))
+        if entry is None:
+            self._count("missing")
+            raise AppStoreConnectError("not_archived", f"{method} {url} was not recorded in run {self.run_id}",
+                                       endpoint)
+
+        self._count("replayed")
+        if "error" in entry:
+            raise AppStoreConnectError(entry["error"], entry["message"], endpoint, entry.get("api_errors"))
+
+        with gzip.open(self._blob_path(entry["blob"]), "rb") as f:
+            body = f.read()
+
+        response = requests.models.Response()
+        response.status_code = entry["status"]
+        response.url = url
+        response.encoding = "utf-8"
+        response._content = body
+        # Lets streamed callers (iter_content) read the recorded body instead of a socket
+        response._content_consumed = True
+        response.headers.update(entry["headers"])
+        response.headers["X-Archive-Run"] = self.run_id
+        return response
+
+    def save(self):
+        """Write the run index; blobs are already on disk"""
+        if self.replaying:
+            return
+
+        index_path = self._index_path(self.run_id)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            index = {
+                "run_id": self.run_id,
+                "recorded_at": self.recorded_at.isoformat(),
+                "responses": dict(self.responses),
+                "metadata": dict(self.metadata)
+            }
+
+        tmp_path = index_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, index_path)
+
+    def stats(self) -> Dict:
+        """Run id, mode and record/replay counts"""
+        with self._lock:
+            return dict(self.counters, run_id=self.run_id,
+                        mode="replay" if self.replaying else "record")
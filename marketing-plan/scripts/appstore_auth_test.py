@@ -5,72 +5,29 @@ This should handle the signature format correctly for Apple's App Store Connect
 """
 
 import jwt
-import time
 import sys
 import os
-from cryptography.hazmat.primitives import serialization
 
-def generate_jwt_token():
-    # Configuration
-    KEY_ID = "RHM24L7VXD"
-    ISSUER_ID = "c419fd84-aa0b-4d05-9688-19d736cc2575"
-    PRIVATE_KEY_PATH = "/Users/quang.tranminh/Library/Mobile Documents/com~apple~CloudDocs/DevelopmentCertificates/AuthKey_RHM24L7VXD.p8"
+from appstore_client import AppStoreConnectClient, AppStoreConnectError, get_shared_client
+
+def generate_jwt_token(client: AppStoreConnectClient = None):
+    client = client or get_shared_client()
     
     # Check if private key exists
-    if not os.path.exists(PRIVATE_KEY_PATH):
-        print(f"Error: Private key not found at {PRIVATE_KEY_PATH}", file=sys.stderr)
-        sys.exit(1)
-    
-    # Read and parse the private key
-    try:
-        with open(PRIVATE_KEY_PATH, 'rb') as key_file:
-            private_key = serialization.load_pem_private_key(
-                key_file.read(),
-                password=None
-            )
-    except Exception as e:
-        print(f"Error loading private key: {e}", file=sys.stderr)
+    if not os.path.exists(client.private_key_path):
+        print(f"Error: Private key not found at {client.private_key_path}", file=sys.stderr)
         sys.exit(1)
     
-    # Generate timestamps
-    now = int(time.time())
-    exp = now + 1200  # 20 minutes from now
-    
-    # Create JWT payload
-    payload = {
-        "iss": ISSUER_ID,
-        "iat": now,
-        "exp": exp,
-        "aud": "appstoreconnect-v1"
-    }
-    
-    # Create JWT headers
-    headers = {
-        "kid": KEY_ID,
-        "typ": "JWT"
-    }
-    
-    # Generate JWT token using the proper library
+    # Load the key and sign through the shared token provider
     try:
-        token = jwt.encode(
-            payload, 
-            private_key, 
-            algorithm="ES256",
-            headers=headers
-        )
-        return token
+        return client.generate_jwt_token()
     except Exception as e:
         print(f"Error generating JWT: {e}", file=sys.stderr)
         sys.exit(1)
 
-def test_token(token):
+def test_token(token, client: AppStoreConnectClient = None):
     """Test the token with App Store Connect API"""
-    import requests
-    
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
+    client = client or get_shared_client()
     
     # Try different endpoints to see which one works
     endpoints_to_test = [
@@ -82,31 +39,27 @@ def test_token(token):
     for endpoint, description in endpoints_to_test:
         print(f"\n🧪 Testing {description}: {endpoint}")
         try:
-            response = requests.get(
-                f"https://api.appstoreconnect.apple.com{endpoint}",
-                headers=headers,
-                timeout=30
-            )
+            response = client.send("GET", endpoint, token=token)
             
             print(f"   Status: {response.status_code}")
-            if response.status_code == 200:
-                print("   ✅ Success!")
-                data = response.json()
-                if 'data' in data:
-                    print(f"   📊 Found {len(data['data'])} items")
-                return True
-            else:
-                print("   ❌ Failed")
-                try:
-                    error_data = response.json()
-                    if 'errors' in error_data:
-                        for error in error_data['errors']:
-                            print(f"   Error: {error.get('title', 'Unknown error')}")
-                except:
-                    print(f"   Response: {response.text[:200]}...")
+            print("   ✅ Success!")
+            data = response.json()
+            if 'data' in data:
+                print(f"   📊 Found {len(data['data'])} items")
+            return True
                 
-        except requests.exceptions.RequestException as e:
-            print(f"   ❌ Request failed: {e}")
+        except AppStoreConnectError as e:
+            if e.status_code is None:
+                print(f"   ❌ Request failed: {e.message}")
+                continue
+            
+            print(f"   Status: {e.status_code}")
+            print("   ❌ Failed")
+            if e.api_errors:
+                for error in e.api_errors:
+                    print(f"   Error: {error.get('title', 'Unknown error')}")
+            else:
+                print(f"   Response: {e.message[:200]}...")
     
     return False
 
@@ -114,7 +67,8 @@ if __name__ == "__main__":
     print("🔑 Generating JWT token with proper library...")
     
     try:
-        token = generate_jwt_token()
+        client = get_shared_client()
+        token = generate_jwt_token(client)
         print("✅ JWT token generated successfully")
         print(f"Token: {token}")
         
@@ -141,7 +95,7 @@ if __name__ == "__main__":
         
         # Test the token
         print(f"\n🧪 Testing token with App Store Connect API...")
-        success = test_token(token)
+        success = test_token(token, client)
         
         if not success:
             print("\n❌ All API tests failed. Check:")
@@ -0,0 +1,641 @@
+#!/usr/bin/env python3
+"""
+Shared App Store Connect HTTP Client
+Pooled, keep-alive client with per-call timeouts and a single error model,
+used by every marketing analytics script
+"""
+
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from appstore_archive import ResponseArchive
+from appstore_http_cache import HttpResponseCache
+from appstore_json_stream import JsonDocumentStream
+from appstore_http2 import HTTP2_AVAILABLE, Http2Session
+from appstore_resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, is_outage
+from appstore_rate_limit import PRIORITY_NORMAL, RateLimitExceeded, RateLimitScheduler
+from appstore_token import get_token_provider
+
+# App Store Connect API credentials for Magical Stories
+APPSTORE_KEY_ID = "RHM24L7VXD"
+APPSTORE_ISSUER_ID = "c419fd84-aa0b-4d05-9688-19d736cc2575"
+APPSTORE_PRIVATE_KEY_PATH = "/Users/quang.tranminh/Library/Mobile Documents/com~apple~CloudDocs/DevelopmentCertificates/AuthKey_RHM24L7VXD.p8"
+APPSTORE_BASE_URL = "https://api.appstoreconnect.apple.com"
+
+# Connection pool and timeout defaults
+DEFAULT_POOL_SIZE = 16
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+
+# Sent with every request on either transport
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate",
+    "User-Agent": "MagicalStories-MarketingAnalytics/1.0"
+}
+
+# Largest page App Store Connect returns for list endpoints
+MAX_PAGE_SIZE = 200
+
+# Bytes read per socket read when streaming a response body
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Suffix of a download in progress; a later attempt resumes it with a Range request
+PART_SUFFIX = ".part"
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+def file_md5(path: Path) -> str:
+    """Hex MD5 of a file, read in chunks"""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def with_query_param(endpoint: str, name: str, value, replace: bool = False) -> str:
+    """Add a query parameter to an endpoint unless it is already set"""
+    parts = urlsplit(endpoint)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+
+    if any(key == name for key, _ in query):
+        if not replace:
+            return endpoint
+        query = [(key, val) for key, val in query if key != name]
+
+    query.append((name, str(value)))
+    # Keep JSON:API brackets and commas readable, e.g. filter[reportType]=SALES
+    return urlunsplit(parts._replace(query=urlencode(query, safe="[],")))
+
+
+class AppStoreConnectError(Exception):
+    """Failed App Store Connect call (HTTP error status or transport failure)"""
+
+    def __init__(self, error: Union[int, str], message: str, endpoint: str,
+                 api_errors: Optional[List[Dict]] = None, retry_after: Optional[str] = None):
+        super().__init__(f"{error}: {message}")
+        self.error = error
+        self.message = message
+        self.endpoint = endpoint
+        self.api_errors = api_errors or []
+        self.retry_after = retry_after
+
+    @property
+    def status_code(self) -> Optional[int]:
+        """HTTP status for response errors, None for transport failures"""
+        return self.error if isinstance(self.error, int) else None
+
+    def to_dict(self) -> Dict:
+        """Legacy error payload returned by make_request-style helpers"""
+        return {
+            "error": self.error,
+            "message": self.message,
+            "endpoint": self.endpoint
+        }
+
+    @classmethod
+    def from_response(cls, response: requests.Response, endpoint: str) -> "AppStoreConnectError":
+        """Build an error from a non-2xx response, keeping Apple's JSON:API error list"""
+        api_errors = []
+        try:
+            api_errors = response.json().get("errors", [])
+        except ValueError:
+            pass
+        return cls(response.status_code, response.text, endpoint, api_errors,
+                   response.headers.get("Retry-After"))
+
+
+class RequestCoalescer:
+    """Run-scoped GET cache where concurrent callers for the same URL share one in-flight request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Future] = {}
+        self.network_fetches = 0
+        self.coalesced = 0
+
+    def fetch(self, url: str, fetch: Callable[[], Dict]) -> Dict:
+        """Return the cached or in-flight result for url, calling fetch only for the first caller"""
+        with self._lock:
+            future = self._entries.get(url)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._entries[url] = future
+                self.network_fetches += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = fetch()
+        except BaseException as e:
+            self._forget(url)
+            future.set_exception(e)
+            raise
+
+        # Errors are shared with callers already waiting, but later callers try again
+        if "error" in result:
+            self._forget(url)
+        future.set_result(result)
+        return result
+
+    def _forget(self, url: str):
+        with self._lock:
+            self._entries.pop(url, None)
+
+    def stats(self) -> Dict:
+        """Unique network fetches versus duplicate GETs served from the run cache"""
+        return {
+            "unique_gets": self.network_fetches,
+            "coalesced_gets": self.coalesced
+        }
+
+
+class AppStoreConnectClient:
+    """Authenticated App Store Connect client with a tuned keep-alive connection pool"""
+
+    SUCCESS_STATUSES = (200, 201, 202, 204)
+
+    def __init__(self,
+                 key_id: str = APPSTORE_KEY_ID,
+                 issuer_id: str = APPSTORE_ISSUER_ID,
+                 private_key_path: str = APPSTORE_PRIVATE_KEY_PATH,
+                 base_url: str = APPSTORE_BASE_URL,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 breaker_threshold: int = 5,
+                 breaker_reset_timeout: float = 60.0,
+                 http_cache: Optional[HttpResponseCache] = None,
+                 http2: bool = False,
+                 archive: Optional[ResponseArchive] = None):
+        self.key_id = key_id
+        self.issuer_id = issuer_id
+        self.private_key_path = private_key_path
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.http2 = http2
+
+        self.token_provider = get_token_provider(key_id, issuer_id, private_key_path)
+        self.session = self._build_session()
+        self.rate_limiter = RateLimitScheduler()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset_timeout = breaker_reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        self.http_cache = http_cache
+        self.archive = archive
+        self._run_cache: Optional[RequestCoalescer] = None
+        # Caps requests in flight across every thread of a run; None leaves them unbounded
+        self._in_flight: Optional[threading.BoundedSemaphore] = None
+
+    def _build_session(self) -> Union[requests.Session, Http2Session]:
+        """Create a keep-alive session whose pool can hold pool_size warm connections
+
+        With http2=True all requests are multiplexed over one HTTP/2 connection
+        instead, falling back to the requests pool when httpx is not installed.
+        """
+        if self.http2:
+            if HTTP2_AVAILABLE:
+                return Http2Session(self.pool_size, dict(DEFAULT_HEADERS))
+            print('⚠️  HTTP/2 unavailable (pip3 install "httpx[http2]"), using HTTP/1.1')
+            self.http2 = False
+
+        session = requests.Session()
+
+        # Retries are handled explicitly by the client, never silently by urllib3
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        session.headers.update(DEFAULT_HEADERS)
+        session.headers["Connection"] = "keep-alive"
+        return session
+
+    def url_for(self, endpoint: str) -> str:
+        """Resolve an API path (or an absolute links.next URL) to a full URL"""
+        if endpoint.startswith("http://") or endpoint.startswith("https://"):
+            return endpoint
+        return f"{self.base_url}{endpoint}"
+
+    def generate_jwt_token(self) -> str:
+        """Return the cached JWT token for this client's API key"""
+        return self.token_provider.get_token()
+
+    def breaker_for(self, url: str) -> CircuitBreaker:
+        """Return the circuit breaker guarding url's host"""
+        host = urlsplit(url).netloc
+        with self._breakers_lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(host, self.breaker_threshold, self.breaker_reset_timeout)
+                self._breakers[host] = breaker
+            return breaker
+
+    def send(self, method: str, endpoint: str, data: Dict = None,
+             timeout: Optional[Timeout] = None, token: Optional[str] = None,
+             headers: Optional[Dict] = None, stream: bool = False,
+             priority: str = PRIORITY_NORMAL) -> requests.Response:
+        """Perform a request and return the raw response, raising AppStoreConnectError on failure
+
+        Idempotent requests are retried with backoff on throttling, 5xx and
+        connection errors, and every request fails fast while the host's
+        circuit breaker is open. With an archive attached, outcomes are
+        recorded, or served from the archive without any network access.
+        """
+        if self.archive is None:
+            return self._send(method, endpoint, data, timeout, token, headers, stream, priority)
+
+        url = self.url_for(endpoint)
+        if self.archive.replaying:
+            return self.archive.replay(method, url, data, endpoint)
+
+        try:
+            response = self._send(method, endpoint, data, timeout, token, headers, stream, priority)
+        except AppStoreConnectError as e:
+            self.archive.record_error(method, url, data, e)
+            raise
+        self.archive.record(method, url, data, response, stream)
+        return response
+
+    def _send(self, method: str, endpoint: str, data: Optional[Dict],
+              timeout: Optional[Timeout], token: Optional[str],
+              headers: Optional[Dict], stream: bool, priority: str) -> requests.Response:
+        """Live request with caching, retries and the circuit breaker"""
+        try:
+            auth_token = token or self.generate_jwt_token()
+        except Exception as e:
+            raise AppStoreConnectError("auth_failed", str(e), endpoint)
+
+        request_headers = {
+            "Authorization": f"Bearer {auth_token}",
+            "Content-Type": "application/json"
+        }
+        if headers:
+            request_headers.update(headers)
+
+        url = self.url_for(endpoint)
+        breaker = self.breaker_for(url)
+        attempt = 0
+
+        # Explicit tokens are auth checks and must always reach the API
+        cache_entry = None
+        use_cache = self.http_cache is not None and method == "GET" and not stream and token is None
+        if use_cache:
+            cache_entry = self.http_cache.lookup(url)
+            if cache_entry and self.http_cache.is_fresh(cache_entry):
+                return self.http_cache.to_response(cache_entry, "HIT")
+            if cache_entry:
+                request_headers.update(self.http_cache.validators(cache_entry))
+            else:
+                self.http_cache.record_miss()
+
+        while True:
+            try:
+                breaker.before_request()
+            except CircuitOpenError as e:
+                raise AppStoreConnectError("circuit_open", str(e), endpoint)
+
+            try:
+                response = self._send_once(method, url, endpoint, request_headers, data,
+                                           timeout, stream, priority)
+            except AppStoreConnectError as e:
+                if is_outage(e.error):
+                    breaker.record_failure()
+                elif e.status_code is not None:
+                    # Any other HTTP answer proves the host is up
+                    breaker.record_success()
+                else:
+                    # Never reached the host (e.g. quota exhausted); says nothing about its health
+                    breaker.release()
+
+                if e.status_code == 401 and token is None:
+                    # Force a re-sign in case the key was rotated or the clock drifted
+                    self.token_provider.invalidate()
+
+                if not self.retry_policy.should_retry(method, attempt, e.error):
+                    raise
+                time.sleep(self.retry_policy.delay(attempt, e.retry_after))
+                attempt += 1
+                continue
+
+            breaker.record_success()
+
+            if use_cache:
+                if response.status_code == 304 and cache_entry:
+                    self.http_cache.touch(cache_entry, response)
+                    return self.http_cache.to_response(cache_entry, "REVALIDATED")
+                self.http_cache.store(url, response)
+            return response
+
+    def _send_once(self, method: str, url: str, endpoint: str, headers: Dict,
+                   data: Optional[Dict], timeout: Optional[Timeout], stream: bool,
+                   priority: str) -> requests.Response:
+        """Single attempt: take a rate-limit token, send, and map failures to AppStoreConnectError"""
+        try:
+            self.rate_limiter.acquire(priority)
+        except RateLimitExceeded as e:
+            raise AppStoreConnectError("rate_limited", str(e), endpoint)
+
+        try:
+            with self._in_flight_slot():
+                response = self.session.request(
+                    method,
+                    url,
+                    headers=headers,
+                    json=data,
+                    timeout=timeout or self.timeout,
+                    stream=stream
+                )
+        except requests.exceptions.RequestException as e:
+            raise AppStoreConnectError("request_failed", str(e), endpoint)
+
+        self.rate_limiter.record_response(response.status_code, response.headers)
+
+        not_modified = response.status_code == 304 and (
+            "If-None-Match" in headers or "If-Modified-Since" in headers)
+        if response.status_code not in self.SUCCESS_STATUSES and not not_modified:
+            raise AppStoreConnectError.from_response(response, endpoint)
+
+        return response
+
+    def _in_flight_slot(self):
+        """Held while a request waits for its response (or a download transfers its file)"""
+        in_flight = self._in_flight
+        return in_flight if in_flight is not None else nullcontext()
+
+    @contextmanager
+    def run_scope(self, max_in_flight: Optional[int] = None) -> Iterator[RequestCoalescer]:
+        """Collapse identical GETs and track quota usage for the duration of one collection run
+
+        max_in_flight bounds the requests this client has outstanding at once,
+        whichever stage or worker pool sends them; the other threads wait
+        for a slot.
+        """
+        if self._run_cache is not None:
+            # Nested scopes share the outer run's cache and limit
+            yield self._run_cache
+            return
+
+        self.rate_limiter.begin_run()
+        self._run_cache = RequestCoalescer()
+        if max_in_flight:
+            self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        try:
+            yield self._run_cache
+        finally:
+            self._run_cache = None
+            self._in_flight = None
+
+    def request(self, endpoint: str, method: str = "GET", data: Dict = None,
+                timeout: Optional[Timeout] = None, priority: str = PRIORITY_NORMAL) -> Dict:
+        """Make an authenticated request and return parsed JSON or an error payload"""
+        run_cache = self._run_cache
+        if method == "GET" and run_cache is not None:
+            return run_cache.fetch(self.url_for(endpoint),
+                                   lambda: self._request(endpoint, method, data, timeout, priority))
+        return self._request(endpoint, method, data, timeout, priority)
+
+    def _request(self, endpoint: str, method: str, data: Optional[Dict],
+                 timeout: Optional[Timeout], priority: str) -> Dict:
+        """Uncached request returning parsed JSON or an error payload"""
+        try:
+            response = self.send(method, endpoint, data=data, timeout=timeout, priority=priority)
+            if not response.content:
+                return {}
+            return response.json()
+        except AppStoreConnectError as e:
+            return e.to_dict()
+        except ValueError as e:
+            return AppStoreConnectError("invalid_json", str(e), endpoint).to_dict()
+
+    def get(self, endpoint: str, timeout: Optional[Timeout] = None,
+            priority: str = PRIORITY_NORMAL) -> Dict:
+        """GET an endpoint and return parsed JSON or an error payload"""
+        return self.request(endpoint, "GET", timeout=timeout, priority=priority)
+
+    def post(self, endpoint: str, data: Dict, timeout: Optional[Timeout] = None,
+             priority: str = PRIORITY_NORMAL) -> Dict:
+        """POST a JSON body and return parsed JSON or an error payload"""
+        return self.request(endpoint, "POST", data=data, timeout=timeout, priority=priority)
+
+    def iter_pages(self, endpoint: str, limit: int = MAX_PAGE_SIZE,
+                   timeout: Optional[Timeout] = None,
+                   priority: str = PRIORITY_NORMAL) -> Iterator[Dict]:
+        """Yield every page document of a list endpoint, following links.next
+
+        The next page is requested in the background while the caller works
+        through the current one, so at most two pages are held in memory.
+        Raises AppStoreConnectError if any page fails.
+        """
+        def fetch_page(url: str) -> Dict:
+            return self.send("GET", url, timeout=timeout, priority=priority).json()
+
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            pending = prefetcher.submit(fetch_page, with_query_param(endpoint, "limit", limit))
+
+            while pending is not None:
+                page = pending.result()
+
+                next_url = (page.get("links") or {}).get("next")
+                pending = prefetcher.submit(fetch_page, next_url) if next_url else None
+
+                yield page
+
+    def paginate(self, endpoint: str, limit: int = MAX_PAGE_SIZE,
+                 timeout: Optional[Timeout] = None,
+                 priority: str = PRIORITY_NORMAL) -> Iterator[Dict]:
+        """Yield every resource of a list endpoint lazily, page by page"""
+        for page in self.iter_pages(endpoint, limit, timeout, priority):
+            resources = page.get("data") or []
+            del page
+            for resource in resources:
+                yield resource
+
+    def stream_resources(self, endpoint: str, limit: int = MAX_PAGE_SIZE,
+                         timeout: Optional[Timeout] = None,
+                         priority: str = PRIORITY_NORMAL) -> Iterator[Dict]:
+        """Yield every resource of a list endpoint as it is parsed off the socket
+
+        Unlike paginate, items are available before a page has finished
+        downloading and memory stays around one item plus a read chunk; the
+        next page is requested once the current page's links are parsed.
+        Raises AppStoreConnectError on HTTP failures and ValueError on invalid JSON.
+        """
+        url = with_query_param(endpoint, "limit", limit)
+        while url:
+            response = self.send("GET", url, timeout=timeout, stream=True, priority=priority)
+            try:
+                page = JsonDocumentStream(response.iter_content(chunk_size=STREAM_CHUNK_SIZE),
+                                          encoding=response.encoding or "utf-8")
+                for resource in page:
+                    yield resource
+            except requests.exceptions.RequestException as e:
+                raise AppStoreConnectError("request_failed", str(e), endpoint)
+            finally:
+                response.close()
+
+            url = (page.document.get("links") or {}).get("next")
+
+    def get_all(self, endpoint: str, limit: int = MAX_PAGE_SIZE,
+                timeout: Optional[Timeout] = None,
+                priority: str = PRIORITY_NORMAL) -> Dict:
+        """Fetch every page of a list endpoint into one {"data": [...]} document or an error payload"""
+        def fetch_all() -> Dict:
+            try:
+                return {"data": list(self.paginate(endpoint, limit, timeout, priority))}
+            except AppStoreConnectError as e:
+                return e.to_dict()
+            except ValueError as e:
+                return AppStoreConnectError("invalid_json", str(e), endpoint).to_dict()
+
+        run_cache = self._run_cache
+        if run_cache is not None:
+            return run_cache.fetch(self.url_for(with_query_param(endpoint, "limit", limit)), fetch_all)
+        return fetch_all()
+
+    def download(self, url: str, destination: Path, timeout: Optional[Timeout] = None,
+                 checksum: Optional[str] = None) -> int:
+        """Stream a pre-signed file URL (e.g. a report segment) to disk and return its size in bytes
+
+        The body is written chunk by chunk to <destination>.part and never held
+        in memory. An interrupted transfer leaves the part file behind, and the
+        next attempt (or run) asks only for the missing bytes with a Range
+        request. With a checksum, the finished file must match its MD5 before
+        it replaces destination. No token is sent and no API quota is used.
+        Transient failures are retried like idempotent API calls.
+        """
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        part_path = destination.with_name(destination.name + PART_SUFFIX)
+        attempt = 0
+        restarted = False
+
+        while True:
+            response = None
+            try:
+                offset = part_path.stat().st_size if part_path.exists() else 0
+                # Byte ranges and the checksum refer to the file as stored, so ask for it unencoded
+                headers = {"Accept-Encoding": "identity"}
+                if offset:
+                    headers["Range"] = f"bytes={offset}-"
+                with self._in_flight_slot():
+                    response = self.session.request("GET", url, headers=headers,
+                                                    timeout=timeout or self.timeout, stream=True)
+
+                    # 416: the part file already holds the whole body, if its size is the one the server reports
+                    if offset and response.status_code == 416:
+                        if response.headers.get("Content-Range", "") != f"bytes */{offset}":
+                            part_path.unlink(missing_ok=True)
+                            raise AppStoreConnectError("request_failed", "Part file does not match the file size",
+                                                       url)
+                    else:
+                        if response.status_code not in (200, 206):
+                            raise AppStoreConnectError.from_response(response, url)
+
+                        # A server that compresses anyway hands us decoded bytes, which can't be resumed or verified
+                        decoded = response.headers.get("Content-Encoding", "identity").lower() != "identity"
+                        resumed = response.status_code == 206 and not decoded
+                        if resumed and not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                            part_path.unlink(missing_ok=True)
+                            raise AppStoreConnectError("request_failed", "Unexpected Content-Range", url)
+                        if decoded:
+                            checksum = None
+
+                        with open(part_path, "ab" if resumed else "wb") as f:
+                            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                                f.write(chunk)
+
+                if checksum:
+                    actual = file_md5(part_path)
+                    if actual != checksum.lower():
+                        part_path.unlink(missing_ok=True)
+                        raise AppStoreConnectError("checksum_mismatch",
+                                                   f"MD5 {actual} does not match {checksum}", url)
+
+                size = part_path.stat().st_size
+                os.replace(part_path, destination)
+                return size
+            except requests.exceptions.RequestException as e:
+                error = AppStoreConnectError("request_failed", str(e), url)
+            except AppStoreConnectError as e:
+                error = e
+            finally:
+                if response is not None:
+                    response.close()
+
+            if error.error == "checksum_mismatch" and not restarted:
+                # The part file may have been stale; download the whole file once more
+                restarted = True
+                continue
+            if not self.retry_policy.should_retry("GET", attempt, error.error):
+                raise error
+            time.sleep(self.retry_policy.delay(attempt, error.retry_after))
+            attempt += 1
+
+    def warm_up(self, connections: int = 1) -> Dict:
+        """Sign a token and open up to connections pooled connections ahead of a run
+
+        The connections are opened with unauthenticated HEAD requests to the API
+        host. They carry no token, so they do not use the key's hourly quota,
+        and the run's first real requests skip DNS, TCP and TLS setup.
+        """
+        started = time.monotonic()
+        self.generate_jwt_token()
+
+        def open_connection(_) -> bool:
+            try:
+                self.session.request("HEAD", f"{self.base_url}/", timeout=self.timeout)
+                return True
+            except requests.exceptions.RequestException:
+                return False
+
+        # One HTTP/2 connection carries every request
+        count = 1 if self.http2 else max(1, min(connections, self.pool_size))
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            opened = sum(executor.map(open_connection, range(count)))
+
+        return {"connections": opened, "seconds": round(time.monotonic() - started, 3)}
+
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
+
+
+_shared_clients: Dict[Tuple, AppStoreConnectClient] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(key_id: str = APPSTORE_KEY_ID,
+                      issuer_id: str = APPSTORE_ISSUER_ID,
+                      private_key_path: str = APPSTORE_PRIVATE_KEY_PATH,
+                      base_url: str = APPSTORE_BASE_URL,
+                      http2: bool = False) -> AppStoreConnectClient:
+    """Return the process-wide client for a key so all callers share warm connections"""
+    cache_key = (key_id, issuer_id, private_key_path, base_url, http2)
+
+    with _shared_clients_lock:
+        client = _shared_clients.get(cache_key)
+        if client is None:
+            client = AppStoreConnectClient(key_id, issuer_id, private_key_path, base_url,
+                                           http_cache=HttpResponseCache(), http2=http2)
+            _shared_clients[cache_key] = client
+        return client
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+HTTP/2 Transport for the App Store Connect Client
+httpx-backed drop-in for requests.Session.request so concurrent calls share one
+multiplexed connection; requires `pip3 install "httpx[http2]"`
+"""
+
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple, Union
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+    import httpx
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTP2_AVAILABLE = False
+
+# Connection-specific headers are forbidden in HTTP/2 frames
+HOP_BY_HOP_HEADERS = ("connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade")
+
+
+@contextmanager
+def _requests_errors():
+    """Re-raise httpx failures as the requests exceptions the client retries and resumes on"""
+    try:
+        yield
+    except httpx.TimeoutException as e:
+        raise requests.exceptions.Timeout(str(e))
+    except httpx.TransportError as e:
+        raise requests.exceptions.ConnectionError(str(e))
+    except httpx.HTTPError as e:
+        raise requests.exceptions.RequestException(str(e))
+
+
+class _StreamedBody:
+    """File-like view of a streamed httpx response, as requests expects in Response.raw"""
+
+    def __init__(self, response):
+        self._response = response
+        self._chunks = response.iter_bytes()
+        self._buffer = b""
+
+    def read(self, amt: Optional[int] = None, **kwargs) -> bytes:
+        # A stream dropped mid-body fails here, after the request itself succeeded
+        with _requests_errors():
+            while amt is None or len(self._buffer) < amt:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._buffer += chunk
+
+        if amt is None:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def close(self):
+        self._response.close()
+
+
+class Http2Session:
+    """Subset of requests.Session used by AppStoreConnectClient, sent over HTTP/2 with httpx"""
+
+    def __init__(self, pool_size: int, headers: Dict[str, str]):
+        if not HTTP2_AVAILABLE:
+            raise ImportError('HTTP/2 transport needs httpx and h2: pip3 install "httpx[http2]"')
+
+        # HTTP/2 multiplexes requests over one connection per host, so the pool
+        # size only matters if Apple caps concurrent streams below our concurrency
+        self.headers = CaseInsensitiveDict(
+            {name: value for name, value in headers.items() if name.lower() not in HOP_BY_HOP_HEADERS})
+        self._client = httpx.Client(
+            http2=True,
+            headers=dict(self.headers),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            follow_redirects=True
+        )
+
+    def request(self, method: str, url: str, headers: Optional[Dict] = None,
+                json: Optional[Dict] = None, timeout: Union[float, Tuple[float, float], None] = None,
+                stream: bool = False) -> requests.Response:
+        """Send a request and return it as a requests.Response; raises requests exceptions"""
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+            httpx_timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        else:
+            httpx_timeout = httpx.Timeout(timeout)
+
+        request_headers = {name: value for name, value in (headers or {}).items()
+                           if name.lower() not in HOP_BY_HOP_HEADERS}
+
+        with _requests_errors():
+            request = self._client.build_request(method, url, headers=request_headers,
+                                                 json=json, timeout=httpx_timeout)
+            response = self._client.send(request, stream=stream)
+
+        return self._to_requests_response(response, stream)
+
+    def _to_requests_response(self, response, stream: bool) -> requests.Response:
+        converted = requests.models.Response()
+        converted.status_code = response.status_code
+        converted.url = str(response.url)
+        converted.reason = response.reason_phrase
+        converted.headers = CaseInsensitiveDict(response.headers)
+        converted.encoding = get_encoding_from_headers(converted.headers)
+
+        if stream:
+            # Bodies are already decompressed by httpx, so requests must not decode them again
+            converted.raw = _StreamedBody(response)
+        else:
+            converted._content = response.content
+        return converted
+
+    def close(self):
+        self._client.close()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Persistent App Store Connect Response Cache
+On-disk HTTP cache that stores ETag / Last-Modified validators, revalidates
+with conditional GETs and serves 304s and still-fresh entries from disk
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+# Shared local data directory for everything the App Store Connect tooling persists,
+# including sales and finance data; set APPSTORE_DATA_DIR to keep it outside the checkout
+APPSTORE_DATA_DIR = Path(os.environ.get("APPSTORE_DATA_DIR") or Path(__file__).parent / "appstore_data").expanduser()
+DEFAULT_CACHE_DIR = APPSTORE_DATA_DIR / "http_cache"
+
+# Seconds an entry may be served without contacting Apple, first match wins.
+# Anything unmatched is always revalidated (TTL 0) but can still come back as a 304.
+DEFAULT_TTL_RULES: List[Tuple[str, int]] = [
+    (r"^/v1/apps/[^/?]+(\?|$)", 6 * 3600),                 # app info
+    (r"/appStoreVersions", 6 * 3600),
+    (r"/subscriptionGroups", 6 * 3600),
+    (r"/subscriptions/[^/?]+/prices", 6 * 3600),
+    (r"/analyticsReportRequests(\?|$)", 3600),              # report request listings
+    (r"/(salesReports|financeReports)", 0)
+]
+
+
+class HttpResponseCache:
+    """Disk-backed cache of successful GET responses keyed by URL"""
+
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR,
+                 ttl_rules: Optional[List[Tuple[str, int]]] = None,
+                 default_ttl: int = 0):
+        self.cache_dir = Path(cache_dir)
+        self.ttl_rules = [(re.compile(pattern), ttl) for pattern, ttl in (ttl_rules or DEFAULT_TTL_RULES)]
+        self.default_ttl = default_ttl
+
+        self._lock = threading.Lock()
+        self.counters = {"fresh_hits": 0, "revalidated": 0, "misses": 0, "stored": 0}
+
+    def _entry_path(self, url: str) -> Path:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / digest[:2] / f"{digest}.json"
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def ttl_for(self, url: str) -> int:
+        """Freshness lifetime for a URL from the first matching TTL rule"""
+        parts = urlsplit(url)
+        target = parts.path + (f"?{parts.query}" if parts.query else "")
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(target):
+                return ttl
+        return self.default_ttl
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """Load the stored entry for a URL, or None"""
+        try:
+            with open(self._entry_path(url), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def is_fresh(self, entry: Dict) -> bool:
+        """Whether an entry can be served without revalidation"""
+        return time.time() - entry.get("stored_at", 0) < self.ttl_for(entry["url"])
+
+    def validators(self, entry: Dict) -> Dict[str, str]:
+        """Conditional request headers for an entry"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url: str, response: requests.Response):
+        """Persist a JSON 200 response when it can be reused (validators or a positive TTL)"""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        content_type = response.headers.get("Content-Type", "application/json")
+        if "json" not in content_type or not (etag or last_modified or self.ttl_for(url) > 0):
+            return
+
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_type": content_type,
+            "stored_at": time.time(),
+            "body": response.content.decode(response.encoding or "utf-8")
+        }
+        self._write(url, entry)
+        self._count("stored")
+
+    def touch(self, entry: Dict, response: requests.Response):
+        """Restart an entry's freshness after a 304, picking up any new validators"""
+        entry["stored_at"] = time.time()
+        entry["etag"] = response.headers.get("ETag") or entry.get("etag")
+        entry["last_modified"] = response.headers.get("Last-Modified") or entry.get("last_modified")
+        self._write(entry["url"], entry)
+
+    def _write(self, url: str, entry: Dict):
+        path = self._entry_path(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write-then-rename so a concurrent reader never sees a half-written entry
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def invalidate(self, url: str):
+        """Drop the entry for a URL, e.g. after a write made the cached listing stale"""
+        try:
+            os.remove(self._entry_path(url))
+        except FileNotFoundError:
+            pass
+
+    def to_response(self, entry: Dict, cache_status: str) -> requests.Response:
+        """Rebuild a 200 response from a stored entry"""
+        self._count("fresh_hits" if cache_status == "HIT" else "revalidated")
+
+        response = requests.models.Response()
+        response.status_code = 200
+        response.url = entry["url"]
+        response.encoding = "utf-8"
+        response._content = entry["body"].encode("utf-8")
+        response.headers["Content-Type"] = entry.get("content_type", "application/json")
+        response.headers["X-Cache"] = cache_status
+        return response
+
+    def record_miss(self):
+        self._count("misses")
+
+    def stats(self) -> Dict:
+        """Hit, revalidation and miss counts since this cache was created"""
+        with self._lock:
+            return dict(self.counters)
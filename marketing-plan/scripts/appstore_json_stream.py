@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON:API Document Parser
+Yields the items of a response's data array as the bytes arrive, keeping only
+the unparsed tail of the body in memory instead of the whole document
+"""
+
+import re
+import json
+import codecs
+from typing import Dict, Iterable, Iterator
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Characters that can only follow a number's leading digits as more of the same number
+NUMBER_CONTINUATION = frozenset(".eE+-0123456789")
+
+# Drop the parsed prefix of the buffer once it grows past this many characters
+COMPACT_THRESHOLD = 1 << 16
+
+
+class JsonDocumentStream:
+    """Parses {"data": [...], "links": ..., ...} from byte chunks, yielding data items one at a time
+
+    Every other top-level member (links, meta, included) is collected into
+    document, which is complete once iteration has finished. A data member that
+    is a single object is yielded as the only item.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], array_key: str = "data", encoding: str = "utf-8"):
+        self.array_key = array_key
+        self.document: Dict = {}
+        self.items_parsed = 0
+
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder(encoding)(errors="strict")
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Append the next decoded chunk to the buffer; False once the body is exhausted"""
+        if self._eof:
+            return False
+
+        if self._pos > COMPACT_THRESHOLD:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+        for chunk in self._chunks:
+            text = self._text.decode(chunk)
+            if text:
+                self._buffer += text
+                return True
+
+        self._buffer += self._text.decode(b"", final=True)
+        self._eof = True
+        return False
+
+    def _peek(self) -> str:
+        """Next non-whitespace character, reading more of the body as needed"""
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def _expect(self, char: str):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} at offset {self._pos}, found {found!r}")
+        self._pos += 1
+
+    def _value(self):
+        """Decode one complete JSON value starting at the next non-whitespace character"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # A value ending exactly at the buffer's end may be a truncated number or literal,
+                # and a number cut after "123." or "1e" decodes as just its leading digits
+                truncated = end == len(self._buffer) or (
+                    isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and self._buffer[end] in NUMBER_CONTINUATION)
+                if not truncated or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def _end(self):
+        """Read the body to its end, so the chunk source is exhausted; only whitespace may follow the document"""
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                raise ValueError(f"Unexpected data after the JSON document at offset {self._pos}")
+            if not self._fill():
+                return
+
+    def __iter__(self) -> Iterator:
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            self._end()
+            return
+
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected an object key at offset {self._pos}")
+            self._expect(":")
+
+            if key == self.array_key and self._peek() == "[":
+                self._pos += 1
+                yield from self._array_items()
+            elif key == self.array_key:
+                value = self._value()
+                if value is not None:
+                    self.items_parsed += 1
+                    yield value
+            else:
+                self.document[key] = self._value()
+
+            separator = self._peek()
+            self._pos += 1
+            if separator == "}":
+                self._end()
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or '}}' at offset {self._pos - 1}, found {separator!r}")
+
+    def _array_items(self) -> Iterator:
+        if self._peek() == "]":
+            self._pos += 1
+            return
+
+        while True:
+            item = self._value()
+            self.items_parsed += 1
+            yield item
+
+            separator = self._peek()
+            self._pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or ']' at offset {self._pos - 1}, found {separator!r}")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+App Store Connect Query Builder
+Typed JSON:API query strings (fields[...], include, limit[...], filter[...])
+so each endpoint returns only the attributes the KPI and dashboard code reads
+"""
+
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from appstore_client import MAX_PAGE_SIZE
+
+# Most related resources App Store Connect returns per relationship with include=
+MAX_INCLUDED_LIMIT = 50
+
+# Known fields (attributes and relationships) per resource type, used to catch typos
+# before they turn into a 400 from Apple. Types not listed here are not checked.
+RESOURCE_FIELDS: Dict[str, frozenset] = {
+    "apps": frozenset({
+        "name", "bundleId", "sku", "primaryLocale", "isOrEverWasMadeForKids",
+        "subscriptionStatusUrl", "contentRightsDeclaration",
+        "appStoreVersions", "prices", "subscriptionGroups", "analyticsReportRequests"
+    }),
+    "appStoreVersions": frozenset({
+        "platform", "versionString", "appStoreState", "appVersionState", "copyright",
+        "releaseType", "earliestReleaseDate", "downloadable", "createdDate", "app", "build"
+    }),
+    "appPrices": frozenset({"app", "priceTier"}),
+    "subscriptionGroups": frozenset({"referenceName", "subscriptions", "subscriptionGroupLocalizations"}),
+    "subscriptions": frozenset({
+        "name", "productId", "familySharable", "state", "subscriptionPeriod",
+        "reviewNote", "groupLevel", "group", "prices"
+    }),
+    "subscriptionPrices": frozenset({"startDate", "preserved", "subscriptionPricePoint", "territory"}),
+    "subscriptionPricePoints": frozenset({"customerPrice", "proceeds", "proceedsYear2", "territory"}),
+    "territories": frozenset({"currency"}),
+    "analyticsReportRequests": frozenset({"accessType", "stoppedDueToInactivity", "reports", "app"}),
+    "analyticsReports": frozenset({"name", "category", "instances"}),
+    "analyticsReportInstances": frozenset({"granularity", "processingDate", "segments"}),
+    "analyticsReportSegments": frozenset({"checksum", "sizeInBytes", "url"})
+}
+
+
+class QueryBuilder:
+    """Fluent builder for an App Store Connect endpoint with sparse fieldsets"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fields: Dict[str, List[str]] = {}
+        self._include: List[str] = []
+        self._limits: Dict[Optional[str], int] = {}
+        self._filters: List[Tuple[str, str]] = []
+        self._sort: List[str] = []
+
+    def fields(self, resource_type: str, *names: str) -> "QueryBuilder":
+        """Only return these attributes/relationships for resource_type"""
+        known = RESOURCE_FIELDS.get(resource_type)
+        if known is not None:
+            unknown = [name for name in names if name not in known]
+            if unknown:
+                raise ValueError(f"Unknown {resource_type} fields: {', '.join(unknown)}")
+
+        selected = self._fields.setdefault(resource_type, [])
+        selected.extend(name for name in names if name not in selected)
+        return self
+
+    def include(self, *relationships: str) -> "QueryBuilder":
+        """Inline related resources in the response's included array"""
+        self._include.extend(name for name in relationships if name not in self._include)
+        return self
+
+    def limit(self, count: int, relationship: Optional[str] = None) -> "QueryBuilder":
+        """Page size for the primary data, or for an included relationship"""
+        maximum = MAX_PAGE_SIZE if relationship is None else MAX_INCLUDED_LIMIT
+        if not 1 <= count <= maximum:
+            raise ValueError(f"limit must be between 1 and {maximum}, got {count}")
+        self._limits[relationship] = count
+        return self
+
+    def filter(self, name: str, *values: str) -> "QueryBuilder":
+        """filter[name]=value1,value2"""
+        self._filters.append((name, ",".join(str(value) for value in values)))
+        return self
+
+    def sort(self, *keys: str) -> "QueryBuilder":
+        """Sort keys, prefixed with - for descending"""
+        self._sort.extend(keys)
+        return self
+
+    def params(self) -> List[Tuple[str, str]]:
+        """Query parameters in a stable order, so equal queries produce equal URLs"""
+        params = [(f"filter[{name}]", value) for name, value in self._filters]
+        if self._include:
+            params.append(("include", ",".join(self._include)))
+        params.extend((f"fields[{resource_type}]", ",".join(names))
+                      for resource_type, names in self._fields.items())
+        for relationship, count in self._limits.items():
+            params.append(("limit" if relationship is None else f"limit[{relationship}]", str(count)))
+        if self._sort:
+            params.append(("sort", ",".join(self._sort)))
+        return params
+
+    def build(self) -> str:
+        """Endpoint string accepted by AppStoreConnectClient"""
+        query = "&".join(f"{name}={quote(value, safe=',:-')}" for name, value in self.params())
+        if not query:
+            return self.path
+        return f"{self.path}{'&' if '?' in self.path else '?'}{query}"
+
+    def __str__(self) -> str:
+        return self.build()
+
+
+# Queries for the endpoints the marketing scripts collect, trimmed to what the KPIs,
+# dashboards and reports read. The URL is also the coalescing and HTTP cache key, so
+# every collector asking for the same data must use the same function.
+
+def app_info_query(app_id: str) -> str:
+    """App attributes plus its most recent versions"""
+    return (QueryBuilder(f"/v1/apps/{app_id}")
+            .include("appStoreVersions", "prices")
+            .fields("apps", "name", "bundleId", "sku", "primaryLocale", "appStoreVersions", "prices")
+            .fields("appStoreVersions", "platform", "versionString", "appStoreState", "createdDate")
+            .limit(10, "appStoreVersions")
+            .build())
+
+
+def app_store_versions_query(app_id: str) -> str:
+    """Version history without review, build and localization details"""
+    return (QueryBuilder(f"/v1/apps/{app_id}/appStoreVersions")
+            .fields("appStoreVersions", "platform", "versionString", "appStoreState", "createdDate")
+            .build())
+
+
+def analytics_report_requests_query(app_id: str, access_type: Optional[str] = None) -> str:
+    """Analytics report requests with just their access type and status"""
+    query = QueryBuilder(f"/v1/apps/{app_id}/analyticsReportRequests")
+    if access_type:
+        query.filter("accessType", access_type)
+    return query.fields("analyticsReportRequests", "accessType", "stoppedDueToInactivity").build()
+
+
+def subscription_groups_query(app_id: str) -> str:
+    """Subscription groups with their subscriptions' identifying attributes inlined"""
+    return (QueryBuilder(f"/v1/apps/{app_id}/subscriptionGroups")
+            .include("subscriptions")
+            .fields("subscriptionGroups", "referenceName", "subscriptions")
+            .fields("subscriptions", "name", "productId", "state", "subscriptionPeriod", "groupLevel")
+            .limit(MAX_INCLUDED_LIMIT, "subscriptions")
+            .build())
+
+
+def subscription_prices_query(subscription_id: str) -> str:
+    """Every price of a subscription (current and scheduled) with its price point and territory currency"""
+    return (QueryBuilder(f"/v1/subscriptions/{subscription_id}/prices")
+            .include("subscriptionPricePoint", "territory")
+            .fields("subscriptionPrices", "startDate", "preserved", "subscriptionPricePoint", "territory")
+            .fields("subscriptionPricePoints", "customerPrice", "proceeds", "proceedsYear2")
+            .fields("territories", "currency")
+            .build())
+
+
+def sales_reports_query(vendor_number: str, report_date: str, frequency: str = "DAILY",
+                        report_type: str = "SALES", report_subtype: str = "SUMMARY",
+                        version: Optional[str] = None) -> str:
+    """One gzipped sales or subscription report for a single period"""
+    query = (QueryBuilder("/v1/salesReports")
+             .filter("frequency", frequency)
+             .filter("reportDate", report_date)
+             .filter("reportSubType", report_subtype)
+             .filter("reportType", report_type)
+             .filter("vendorNumber", vendor_number))
+    if version:
+        query.filter("version", version)
+    return query.build()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+App Store Connect Rate Limit Scheduler
+Token bucket paced by the X-Rate-Limit header so scheduled runs spread their
+requests across the hourly quota and critical endpoints are served first
+"""
+
+import time
+import threading
+from typing import Dict, Mapping, Optional
+
+# Request priorities, most important first
+PRIORITY_CRITICAL = "critical"
+PRIORITY_NORMAL = "normal"
+PRIORITY_OPTIONAL = "optional"
+PRIORITIES = (PRIORITY_CRITICAL, PRIORITY_NORMAL, PRIORITY_OPTIONAL)
+
+# App Store Connect's documented default hourly quota
+DEFAULT_HOURLY_LIMIT = 3600
+RATE_LIMIT_WINDOW_SECONDS = 3600
+
+
+def parse_rate_limit_header(value: Optional[str]) -> Dict[str, int]:
+    """Parse 'user-hour-lim:3600;user-hour-rem:3599;' into {'limit': 3600, 'remaining': 3599}"""
+    parsed = {}
+    if not value:
+        return parsed
+
+    for part in value.split(";"):
+        name, _, number = part.strip().partition(":")
+        if not number.strip().isdigit():
+            continue
+        if name.endswith("-lim"):
+            parsed["limit"] = int(number)
+        elif name.endswith("-rem"):
+            parsed["remaining"] = int(number)
+
+    return parsed
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request's priority does not allow spending the remaining quota"""
+
+
+class RateLimitScheduler:
+    """Priority-aware token bucket refilled at the pace the remaining hourly quota allows"""
+
+    def __init__(self, hourly_limit: int = DEFAULT_HOURLY_LIMIT, burst: int = 50,
+                 normal_reserve: float = 0.05, optional_reserve: float = 0.20,
+                 max_wait: float = 120.0):
+        self.quota_limit = hourly_limit
+        self.quota_remaining = hourly_limit
+        self.quota_known = False
+        self.burst = burst
+        self.max_wait = max_wait
+
+        # Fraction of the hourly quota kept back for higher-priority requests
+        self.reserves = {
+            PRIORITY_CRITICAL: 0.0,
+            PRIORITY_NORMAL: normal_reserve,
+            PRIORITY_OPTIONAL: optional_reserve
+        }
+
+        self._condition = threading.Condition()
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._waiting = {priority: 0 for priority in PRIORITIES}
+        self._run = self._new_run()
+
+    def _new_run(self) -> Dict:
+        return {
+            "started_at": time.time(),
+            "quota_remaining_at_start": self.quota_remaining if self.quota_known else None,
+            "requests": {priority: 0 for priority in PRIORITIES},
+            "rejected": {priority: 0 for priority in PRIORITIES},
+            "responses": 0,
+            "throttled_seconds": 0.0,
+            "rate_limited_responses": 0
+        }
+
+    def begin_run(self):
+        """Reset the per-run usage counters"""
+        with self._condition:
+            self._run = self._new_run()
+
+    def _refill_rate(self) -> float:
+        """Tokens per second that spread the remaining quota over the rest of the window"""
+        return max(self.quota_remaining, 1) / RATE_LIMIT_WINDOW_SECONDS
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        capacity = max(1.0, min(self.burst, self.quota_remaining))
+        self._tokens = min(capacity, self._tokens + (now - self._last_refill) * self._refill_rate())
+        self._last_refill = now
+
+    def _has_higher_priority_waiters(self, priority: str) -> bool:
+        rank = PRIORITIES.index(priority)
+        return any(self._waiting[p] for p in PRIORITIES[:rank])
+
+    def acquire(self, priority: str = PRIORITY_NORMAL):
+        """Block until a request of this priority may be sent, or raise RateLimitExceeded"""
+        if priority not in self.reserves:
+            priority = PRIORITY_NORMAL
+
+        with self._condition:
+            reserve = self.reserves[priority] * self.quota_limit
+            if priority != PRIORITY_CRITICAL and self.quota_remaining <= reserve:
+                self._run["rejected"][priority] += 1
+                raise RateLimitExceeded(
+                    f"{self.quota_remaining}/{self.quota_limit} requests left this hour; "
+                    f"reserved for higher-priority endpoints"
+                )
+
+            started = time.monotonic()
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    self._refill_locked()
+                    if self._tokens >= 1 and not self._has_higher_priority_waiters(priority):
+                        break
+
+                    waited = time.monotonic() - started
+                    if waited >= self.max_wait:
+                        self._run["rejected"][priority] += 1
+                        raise RateLimitExceeded(f"waited {waited:.0f}s for App Store Connect quota")
+
+                    deficit = max(1 - self._tokens, 0)
+                    self._condition.wait(min(max(deficit / self._refill_rate(), 0.05), self.max_wait - waited))
+            finally:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+
+            self._tokens -= 1
+            self._run["requests"][priority] += 1
+            self._run["throttled_seconds"] += time.monotonic() - started
+
+    def record_response(self, status_code: int, headers: Mapping[str, str]):
+        """Update the quota from X-Rate-Limit and drain the bucket on 429"""
+        quota = parse_rate_limit_header(headers.get("X-Rate-Limit"))
+
+        with self._condition:
+            self._run["responses"] += 1
+            if "limit" in quota:
+                self.quota_limit = quota["limit"]
+            if "remaining" in quota:
+                self.quota_remaining = quota["remaining"]
+                self.quota_known = True
+
+                if self._run["quota_remaining_at_start"] is None:
+                    # First header of a cold run: add back the responses this run has already received
+                    self._run["quota_remaining_at_start"] = self.quota_remaining + self._run["responses"]
+
+            if status_code == 429:
+                # Stop bursting; the retry policy waits out Retry-After before trying again
+                self._run["rate_limited_responses"] += 1
+                self._tokens = 0.0
+
+            self._condition.notify_all()
+
+    def run_usage(self) -> Dict:
+        """How much of the hourly quota the current run has used"""
+        with self._condition:
+            run = self._run
+            sent = sum(run["requests"].values())
+            start = run["quota_remaining_at_start"]
+            used = sent if start is None else max(start - self.quota_remaining, sent)
+            return {
+                "requests_sent": sent,
+                "requests_by_priority": dict(run["requests"]),
+                "requests_rejected": dict(run["rejected"]),
+                "quota_limit": self.quota_limit,
+                "quota_remaining_at_start": start,
+                "quota_remaining": self.quota_remaining,
+                "quota_used": used,
+                "throttled_seconds": round(run["throttled_seconds"], 2),
+                "rate_limited_responses": run["rate_limited_responses"]
+            }
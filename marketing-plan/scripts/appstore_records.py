@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Compact App Store Connect Resource Records
+Decodes JSON:API resources into __slots__ records that keep only the attributes
+the marketing scripts read, with interned ids and relationship linkage
+"""
+
+import sys
+from typing import Dict, List, Optional, Tuple, Type, Union
+
+Linkage = Union[str, Tuple[str, ...], None]
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Resource:
+    """Base record: subclasses list (JSON attribute, slot) pairs in FIELDS"""
+
+    __slots__ = ("id", "relationships")
+
+    TYPE = ""
+    FIELDS: Tuple[Tuple[str, str], ...] = ()
+    # Slots holding enum-like values (states, categories) that repeat across resources
+    INTERNED: Tuple[str, ...] = ()
+
+    def __init__(self, resource_id: str, attributes: Optional[Dict] = None,
+                 relationships: Optional[Dict[str, Linkage]] = None):
+        self.id = sys.intern(resource_id)
+        self.relationships = relationships or None
+
+        attributes = attributes or {}
+        for attribute, slot in self.FIELDS:
+            value = attributes.get(attribute)
+            setattr(self, slot, _intern(value) if slot in self.INTERNED else value)
+
+    def to_dict(self) -> Dict:
+        """JSON:API-shaped dict with only the kept, non-empty attributes"""
+        attributes = {attribute: getattr(self, slot) for attribute, slot in self.FIELDS
+                      if getattr(self, slot) is not None}
+        encoded = {"type": self.TYPE, "id": self.id}
+        if attributes:
+            encoded["attributes"] = attributes
+        if self.relationships:
+            encoded["relationships"] = {
+                name: list(ids) if isinstance(ids, tuple) else ids
+                for name, ids in self.relationships.items()
+            }
+        return encoded
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.id!r})"
+
+
+class App(Resource):
+    __slots__ = ("name", "bundle_id", "sku", "primary_locale")
+    TYPE = "apps"
+    FIELDS = (("name", "name"), ("bundleId", "bundle_id"), ("sku", "sku"), ("primaryLocale", "primary_locale"))
+    INTERNED = ("primary_locale",)
+
+
+class AppStoreVersion(Resource):
+    __slots__ = ("platform", "version_string", "app_store_state", "created_date")
+    TYPE = "appStoreVersions"
+    FIELDS = (("platform", "platform"), ("versionString", "version_string"),
+              ("appStoreState", "app_store_state"), ("createdDate", "created_date"))
+    INTERNED = ("platform", "app_store_state")
+
+
+class AnalyticsReportRequest(Resource):
+    __slots__ = ("access_type", "stopped_due_to_inactivity")
+    TYPE = "analyticsReportRequests"
+    FIELDS = (("accessType", "access_type"), ("stoppedDueToInactivity", "stopped_due_to_inactivity"))
+    INTERNED = ("access_type",)
+
+
+class AnalyticsReport(Resource):
+    __slots__ = ("name", "category")
+    TYPE = "analyticsReports"
+    FIELDS = (("name", "name"), ("category", "category"))
+    INTERNED = ("name", "category")
+
+
+class AnalyticsReportInstance(Resource):
+    __slots__ = ("granularity", "processing_date")
+    TYPE = "analyticsReportInstances"
+    FIELDS = (("granularity", "granularity"), ("processingDate", "processing_date"))
+    INTERNED = ("granularity", "processing_date")
+
+
+class AnalyticsReportSegment(Resource):
+    __slots__ = ("checksum", "size_in_bytes", "url")
+    TYPE = "analyticsReportSegments"
+    FIELDS = (("checksum", "checksum"), ("sizeInBytes", "size_in_bytes"), ("url", "url"))
+
+
+class SubscriptionGroup(Resource):
+    __slots__ = ("reference_name",)
+    TYPE = "subscriptionGroups"
+    FIELDS = (("referenceName", "reference_name"),)
+
+
+class Subscription(Resource):
+    __slots__ = ("name", "product_id", "state", "subscription_period", "group_level")
+    TYPE = "subscriptions"
+    FIELDS = (("name", "name"), ("productId", "product_id"), ("state", "state"),
+              ("subscriptionPeriod", "subscription_period"), ("groupLevel", "group_level"))
+    INTERNED = ("state", "subscription_period")
+
+
+RECORD_TYPES: Dict[str, Type[Resource]] = {
+    record_type.TYPE: record_type for record_type in (
+        App, AppStoreVersion, AnalyticsReportRequest, AnalyticsReport,
+        AnalyticsReportInstance, AnalyticsReportSegment, SubscriptionGroup, Subscription
+    )
+}
+
+
+def decode_relationships(relationships: Optional[Dict]) -> Optional[Dict[str, Linkage]]:
+    """Keep only resource linkage (interned ids); links and meta are dropped"""
+    if not relationships:
+        return None
+
+    decoded = {}
+    for name, relationship in relationships.items():
+        linkage = (relationship or {}).get("data")
+        if isinstance(linkage, list):
+            decoded[sys.intern(name)] = tuple(sys.intern(ref["id"]) for ref in linkage)
+        elif isinstance(linkage, dict):
+            decoded[sys.intern(name)] = sys.intern(linkage["id"])
+    return decoded or None
+
+
+def decode_resource(resource: Dict) -> Union[Resource, Dict]:
+    """Record for a known resource type; other resources are returned unchanged"""
+    record_type = RECORD_TYPES.get(resource.get("type")) if isinstance(resource, dict) else None
+    if record_type is None or "id" not in resource:
+        return resource
+    return record_type(resource["id"], resource.get("attributes"),
+                       decode_relationships(resource.get("relationships")))
+
+
+def decode_document(document: Dict) -> Dict:
+    """Decode a response document's data and included resources; error payloads pass through"""
+    if not isinstance(document, dict) or "error" in document:
+        return document
+
+    decoded = {}
+    data = document.get("data")
+    if isinstance(data, list):
+        decoded["data"] = [decode_resource(resource) for resource in data]
+    elif data is not None:
+        decoded["data"] = decode_resource(data)
+
+    if document.get("included"):
+        decoded["included"] = [decode_resource(resource) for resource in document["included"]]
+    if document.get("meta"):
+        decoded["meta"] = document["meta"]
+    return decoded
+
+
+def encode_record(value) -> Dict:
+    """json.dump default= hook that serializes records"""
+    if isinstance(value, Resource):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def records_of_type(document: Dict, record_type: Type[Resource]) -> List[Resource]:
+    """All records of one type in a decoded document's data and included arrays"""
+    resources = document.get("data")
+    resources = resources if isinstance(resources, list) else [resources]
+    return [resource for resource in resources + document.get("included", [])
+            if isinstance(resource, record_type)]
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+App Store Connect Retry and Circuit Breaker Policies
+Exponential backoff with jitter for idempotent requests, and a per-host
+breaker that fails fast while the API is down
+"""
+
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Optional, Union
+
+# Statuses worth retrying: throttling and transient server-side failures
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Transport failures that count towards a retry, as opposed to auth or quota errors
+RETRYABLE_ERRORS = ("request_failed",)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header given as seconds or an HTTP date"""
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+def is_outage(error: Union[int, str]) -> bool:
+    """Whether an error suggests the host is unhealthy (5xx or no response at all)"""
+    if isinstance(error, int):
+        return error >= 500
+    return error in RETRYABLE_ERRORS
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honoring Retry-After"""
+
+    def __init__(self, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 30.0, max_retry_after: float = 120.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+
+    def should_retry(self, method: str, attempt: int, error: Union[int, str]) -> bool:
+        """Retry idempotent requests that failed transiently, up to max_retries times"""
+        if method.upper() not in IDEMPOTENT_METHODS or attempt >= self.max_retries:
+            return False
+        if isinstance(error, int):
+            return error in RETRYABLE_STATUSES
+        return error in RETRYABLE_ERRORS
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to sleep before retry number attempt + 1"""
+        server_delay = parse_retry_after(retry_after)
+        if server_delay is not None:
+            return min(server_delay, self.max_retry_after)
+
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while a host's breaker is open"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive outage failures, then lets a single probe through after a cooldown"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, host: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_request(self):
+        """Raise CircuitOpenError unless a request to this host may be sent now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+
+            if self.state == self.OPEN:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(f"{self.host} circuit open, retrying in {remaining:.0f}s")
+                self.state = self.HALF_OPEN
+
+            if self._probe_in_flight:
+                raise CircuitOpenError(f"{self.host} circuit half-open, waiting for probe request")
+            self._probe_in_flight = True
+
+    def record_success(self):
+        """The host answered; close the breaker"""
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def release(self):
+        """Give back a half-open probe slot without judging the host"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """The host failed; open the breaker once the threshold is reached or a probe fails"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+App Store Connect Token Provider
+Loads the API private key once and reuses signed JWT tokens until they near expiry
+"""
+
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+# App Store Connect accepts tokens that live for at most 20 minutes
+TOKEN_LIFETIME_SECONDS = 1200
+
+# Refresh this long before expiry so in-flight requests never carry a stale token
+REFRESH_MARGIN_SECONDS = 120
+
+
+class AppStoreTokenProvider:
+    """Thread-safe cache of signed App Store Connect JWT tokens"""
+
+    def __init__(self, key_id: str, issuer_id: str, private_key_path: str,
+                 lifetime: int = TOKEN_LIFETIME_SECONDS,
+                 refresh_margin: int = REFRESH_MARGIN_SECONDS,
+                 background_refresh: bool = True):
+        self.key_id = key_id
+        self.issuer_id = issuer_id
+        self.private_key_path = private_key_path
+        self.lifetime = lifetime
+        self.refresh_margin = refresh_margin
+        self.background_refresh = background_refresh
+
+        self._lock = threading.Lock()
+        self._private_key = None
+        self._token: Optional[str] = None
+        self._expires_at = 0
+        self._refresh_timer: Optional[threading.Timer] = None
+        # Whether the current token was handed out; an unused one is not re-signed in the background
+        self._used = False
+
+        # Counters so callers can confirm the cache is doing its job
+        self.signatures_issued = 0
+        self.key_loads = 0
+
+    def get_token(self) -> str:
+        """Return a valid token, signing a new one only when the cached one nears expiry"""
+        with self._lock:
+            if not (self._token and time.time() < self._expires_at - self.refresh_margin):
+                self._refresh_locked()
+            self._used = True
+            return self._token
+
+    def invalidate(self):
+        """Drop the cached token so the next call signs a fresh one (e.g. after a 401)"""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0
+
+    def close(self):
+        """Stop the background refresh timer"""
+        with self._lock:
+            if self._refresh_timer:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+
+    def _load_private_key(self):
+        """Read and parse the .p8 key file once per provider"""
+        if self._private_key is None:
+            from cryptography.hazmat.primitives import serialization
+
+            with open(self.private_key_path, 'rb') as key_file:
+                self._private_key = serialization.load_pem_private_key(key_file.read(), password=None)
+            self.key_loads += 1
+
+        return self._private_key
+
+    def _refresh_locked(self) -> str:
+        """Sign a new token; caller must hold the lock"""
+        import jwt
+
+        private_key = self._load_private_key()
+
+        now = int(time.time())
+        exp = now + self.lifetime
+
+        payload = {
+            "iss": self.issuer_id,
+            "iat": now,
+            "exp": exp,
+            "aud": "appstoreconnect-v1"
+        }
+
+        headers = {"kid": self.key_id, "typ": "JWT"}
+        self._token = jwt.encode(payload, private_key, algorithm="ES256", headers=headers)
+        self._expires_at = exp
+        self._used = False
+        self.signatures_issued += 1
+
+        self._schedule_refresh_locked()
+        return self._token
+
+    def _schedule_refresh_locked(self):
+        """Re-sign in the background shortly before the current token expires"""
+        if not self.background_refresh:
+            return
+
+        if self._refresh_timer:
+            self._refresh_timer.cancel()
+
+        delay = max(self._expires_at - self.refresh_margin - time.time(), 1)
+        self._refresh_timer = threading.Timer(delay, self._background_refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _background_refresh(self):
+        """Timer callback; failures fall back to signing on the next get_token call
+
+        Nothing asked for the current token since it was signed, so the client
+        is idle (e.g. a daemon between jobs): let the timer lapse and sign on
+        demand instead of re-signing every few minutes forever.
+        """
+        with self._lock:
+            self._refresh_timer = None
+            if not self._used:
+                return
+            try:
+                self._refresh_locked()
+            except Exception:
+                self._token = None
+                self._expires_at = 0
+
+
+_providers: Dict[Tuple[str, str, str], AppStoreTokenProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_token_provider(key_id: str, issuer_id: str, private_key_path: str) -> AppStoreTokenProvider:
+    """Return the process-wide provider for a key, creating it on first use"""
+    cache_key = (key_id, issuer_id, private_key_path)
+
+    with _providers_lock:
+        provider = _providers.get(cache_key)
+        if provider is None:
+            provider = AppStoreTokenProvider(key_id, issuer_id, private_key_path)
+            _providers[cache_key] = provider
+        return provider
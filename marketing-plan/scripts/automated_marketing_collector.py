@@ -14,10 +14,22 @@ from datetime import datetime, timedelta
 from typing import Dict, List
 from pathlib import Path
 
+# Daily collection times, and how long before each one daemon mode re-opens connections
+COLLECTION_TIMES = ["06:00", "12:00", "18:00"]
+WEEKLY_ANALYSIS_TIME = "07:00"
+WARM_UP_LEAD_MINUTES = 2
+
 class AutomatedMarketingCollector:
     """Automated scheduler for marketing data collection"""
     
-    def __init__(self):
+    def __init__(self, daemon: bool = False, http2: bool = False, concurrent: bool = False):
+        # Daemon mode collects in-process with one long-lived App Store Connect client
+        self.daemon = daemon
+        self.http2 = http2
+        # Opt-in: run collection stages concurrently instead of one after another
+        self.concurrent = concurrent
+        self._analytics = None
+        
         self.script_dir = Path(__file__).parent
         self.data_dir = self.script_dir / "automated_data"
         self.data_dir.mkdir(exist_ok=True)
@@ -40,16 +52,60 @@ class AutomatedMarketingCollector:
         with open(self.log_file, 'a') as f:
             f.write(log_entry)
     
+    def get_analytics(self):
+        """Long-lived analytics collector whose shared client is reused by every daemon run"""
+        if self._analytics is None:
+            from comprehensive_marketing_analytics import ComprehensiveMarketingAnalytics
+            self._analytics = ComprehensiveMarketingAnalytics(http2=self.http2)
+        return self._analytics
+    
+    def warm_up_client(self):
+        """Re-sign the token and re-open pooled connections shortly before a daemon run"""
+        try:
+            client = self.get_analytics().client
+            warm = client.warm_up(client.pool_size)
+            self.log_message(f"🔥 Warmed up {warm['connections']} App Store Connect connection(s) in {warm['seconds']}s")
+        except Exception as e:
+            self.log_message(f"⚠️ Connection warm-up failed: {e}")
+    
+    def run_in_process_collection(self) -> bool:
+        """Collect with the daemon's warm client instead of a fresh interpreter"""
+        from comprehensive_marketing_analytics import save_collection_results
+        
+        analytics = self.get_analytics()
+        if self.concurrent:
+            raw_data, kpis, report = analytics.collect_all_marketing_data_concurrently()
+        else:
+            raw_data, kpis, report = analytics.collect_all_marketing_data()
+        save_collection_results(raw_data, kpis, report, self.script_dir)
+        
+        quota = raw_data.get("api_usage", {}).get("quota", {})
+        if quota:
+            self.log_message(f"📉 API quota used: {quota['quota_used']} "
+                             f"({quota['quota_remaining']}/{quota['quota_limit']} left this hour)")
+        
+        self.log_message("✅ Comprehensive analytics completed successfully")
+        self.organize_generated_files()
+        return True
+    
     def run_data_collection(self) -> bool:
         """Run comprehensive marketing data collection"""
         self.log_message("🚀 Starting automated marketing data collection")
         
         try:
+            if self.daemon:
+                return self.run_in_process_collection()
+            
             # Run comprehensive analytics
             comprehensive_script = self.script_dir / self.scripts['comprehensive']
             
             self.log_message(f"📊 Running {comprehensive_script}")
-            result = subprocess.run([sys.executable, str(comprehensive_script)], 
+            command = [sys.executable, str(comprehensive_script)]
+            if self.concurrent:
+                command.append("--concurrent")
+            if self.http2:
+                command.append("--http2")
+            result = subprocess.run(command, 
                                  capture_output=True, text=True, cwd=self.script_dir)
             
             if result.returncode == 0:
@@ -249,19 +305,30 @@ class AutomatedMarketingCollector:
         """Set up automated collection schedule"""
         self.log_message("⏰ Setting up automated collection schedule")
         
-        # Daily collection at 6 AM
-        schedule.every().day.at("06:00").do(self.daily_collection_job)
+        # Daily collections at 6 AM, noon and 6 PM for high-frequency monitoring
+        for collection_time in COLLECTION_TIMES:
+            schedule.every().day.at(collection_time).do(self.daily_collection_job)
         
         # Weekly full analysis on Mondays at 7 AM
-        schedule.every().monday.at("07:00").do(self.weekly_full_analysis_job)
+        schedule.every().monday.at(WEEKLY_ANALYSIS_TIME).do(self.weekly_full_analysis_job)
         
-        # Additional collections for high-frequency monitoring
-        schedule.every().day.at("12:00").do(self.daily_collection_job)  # Noon
-        schedule.every().day.at("18:00").do(self.daily_collection_job)  # 6 PM
+        if self.daemon:
+            # Idle keep-alive connections are closed by the server between runs,
+            # so re-open the pool just before each job rather than at its start
+            for collection_time in COLLECTION_TIMES:
+                schedule.every().day.at(self.warm_up_time(collection_time)).do(self.warm_up_client)
+            schedule.every().monday.at(self.warm_up_time(WEEKLY_ANALYSIS_TIME)).do(self.warm_up_client)
         
         self.log_message("✅ Automated schedule configured:")
         self.log_message("   📅 Daily collections: 6 AM, 12 PM, 6 PM")
         self.log_message("   📊 Weekly analysis: Mondays at 7 AM")
+        if self.daemon:
+            self.log_message(f"   🔥 Daemon mode: in-process runs, connections warmed {WARM_UP_LEAD_MINUTES} min ahead")
+    
+    def warm_up_time(self, collection_time: str) -> str:
+        """HH:MM a few minutes before a collection time"""
+        run_at = datetime.strptime(collection_time, "%H:%M") - timedelta(minutes=WARM_UP_LEAD_MINUTES)
+        return run_at.strftime("%H:%M")
     
     def run_scheduler(self):
         """Run the automated scheduler"""
@@ -271,6 +338,10 @@ class AutomatedMarketingCollector:
         
         self.setup_schedule()
         
+        if self.daemon:
+            # Load the key and sign the first token now instead of during the first job
+            self.warm_up_client()
+        
         try:
             while True:
                 schedule.run_pending()
@@ -280,6 +351,9 @@ class AutomatedMarketingCollector:
             self.log_message("⏹️ Automated collector stopped by user")
         except Exception as e:
             self.log_message(f"❌ Scheduler error: {e}")
+        finally:
+            if self._analytics is not None:
+                self._analytics.client.close()
     
     def run_manual_collection(self):
         """Run manual collection for testing"""
@@ -303,7 +377,8 @@ def main():
     print("=" * 65)
     
     try:
-        collector = AutomatedMarketingCollector()
+        collector = AutomatedMarketingCollector(daemon="--daemon" in sys.argv, http2="--http2" in sys.argv,
+                                                concurrent="--concurrent" in sys.argv)
         
         # Check command line arguments
         if len(sys.argv) > 1:
@@ -317,6 +392,9 @@ def main():
             elif sys.argv[1] == "--help":
                 print("Usage:")
                 print("  python automated_marketing_collector.py          # Run automated scheduler")
+                print("  python automated_marketing_collector.py --daemon # Run scheduler with one warm in-process client")
+                print("  python automated_marketing_collector.py --http2  # Use HTTP/2 for App Store Connect (with any mode)")
+                print("  python automated_marketing_collector.py --concurrent # Run collection stages concurrently (with any mode)")
                 print("  python automated_marketing_collector.py --manual # Run manual collection")
                 print("  python automated_marketing_collector.py --test   # Test collection scripts")
                 return
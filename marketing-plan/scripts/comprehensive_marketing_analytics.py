@@ -8,49 +8,91 @@ import os
 import sys
 import json
 import time
-import requests
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
 import subprocess
 
+from analytics_ingest import SegmentIngestor
+from analytics_reports import AnalyticsReportWalker
+from analytics_store import OVERVIEW_REPORTS, AnalyticsStore, instances_watermark_key
+from appstore_archive import ResponseArchive
+from appstore_client import get_shared_client
+from appstore_query import (
+    analytics_report_requests_query, app_info_query, app_store_versions_query
+)
+from appstore_records import decode_document, encode_record
+from appstore_rate_limit import PRIORITY_CRITICAL, PRIORITY_NORMAL, PRIORITY_OPTIONAL
+from finance_reports import FinanceIngestor, FinanceStore, fiscal_months
+from report_pipeline import REPORT_CATEGORIES, ReportIngestionPipeline, analytics_category, sales_category
+from report_request_registry import ACCESS_ONGOING, ReportRequestRegistry
+from sales_backfill import SalesReportBackfill
+from subscription_catalog import SubscriptionCatalog
+
+# Default number of App Store Connect fetches in flight in concurrent mode
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Days of daily sales reports fetched per run
+DEFAULT_SALES_DAYS = 30
+
 class ComprehensiveMarketingAnalytics:
     """Enhanced analytics client for complete marketing data collection"""
     
-    def __init__(self):
+    def __init__(self, http2: bool = False, record: bool = False, replay_run_id: Optional[str] = None,
+                 sales_days: int = DEFAULT_SALES_DAYS):
         # App Store Connect Configuration
-        self.key_id = "RHM24L7VXD"
-        self.issuer_id = "c419fd84-aa0b-4d05-9688-19d736cc2575" 
-        self.private_key_path = "/Users/quang.tranminh/Library/Mobile Documents/com~apple~CloudDocs/DevelopmentCertificates/AuthKey_RHM24L7VXD.p8"
-        self.base_url = "https://api.appstoreconnect.apple.com"
+        self.client = get_shared_client(http2=http2)
+        
+        # Date the collection is "as of"; a replay reuses the recorded run's date so
+        # date-based endpoints resolve to the same archived URLs
+        self.as_of: Optional[datetime] = None
+        if replay_run_id:
+            self.client.archive = ResponseArchive(replay_run_id, replay=True)
+            self.as_of = self.client.archive.recorded_at
+        elif record:
+            self.client.archive = ResponseArchive()
+        self.base_url = self.client.base_url
         self.app_id = "6747953770"
         self.bundle_id = "com.qtm.magicalstories"
-        self.session = requests.Session()
+        self.vendor_number = "90709074"
+        self.sales_days = sales_days
+        
+        # Report tree shared by the overview and instances stages, and the local report store
+        self._report_tree: Optional[Dict] = None
+        self._report_tree_lock = threading.Lock()
+        self._analytics_store: Optional[AnalyticsStore] = None
+        self._analytics_store_lock = threading.Lock()
+        
+        # Per-category ingestion results (APP_USAGE, APP_DOWNLOADS, SALES), run once per collection
+        self._pipeline_result: Optional[Dict] = None
+        self._pipeline_lock = threading.Lock()
+        
+        # Finance report partitions; one FinanceStore serializes its manifest writes
+        self._finance_store = FinanceStore()
+        
+        # Subscription groups, subscriptions and territory prices cached between runs
+        self._subscription_catalog: Optional[SubscriptionCatalog] = None
+        self._subscription_catalog_lock = threading.Lock()
+        
+        # Existing analytics report requests, so runs only POST one when it is missing
+        self.report_requests = ReportRequestRegistry(self.client, self.app_id)
+        
+        # GET responses decoded into appstore_records for the current run, by request
+        self._decoded_documents: Dict[Tuple[str, str], Dict] = {}
+        self._decoded_lock = threading.Lock()
         
         # Marketing Data
         self.app_store_url = f"https://apps.apple.com/app/id{self.app_id}"
         self.supported_languages = ["en", "es", "fr", "de", "it", "pt", "zh", "ja", "ko", "ar"]
         
     def generate_jwt_token(self) -> str:
-        """Generate JWT token for App Store Connect authentication"""
+        """Return a cached JWT token, signing a new one only when it nears expiry"""
         try:
-            import jwt
-            from cryptography.hazmat.primitives import serialization
-            
-            with open(self.private_key_path, 'rb') as key_file:
-                private_key = serialization.load_pem_private_key(key_file.read(), password=None)
-            
-            now = int(time.time())
-            exp = now + 1200  # 20 minutes
-            
-            payload = {
-                "iss": self.issuer_id,
-                "iat": now,
-                "exp": exp,
-                "aud": "appstoreconnect-v1"
-            }
-            
-            headers = {"kid": self.key_id, "typ": "JWT"}
-            return jwt.encode(payload, private_key, algorithm="ES256", headers=headers)
+            return self.client.generate_jwt_token()
             
         except ImportError:
             print("❌ Install dependencies: pip3 install PyJWT cryptography requests")
@@ -59,47 +101,59 @@ class ComprehensiveMarketingAnalytics:
             print(f"❌ JWT error: {e}")
             sys.exit(1)
     
-    def make_appstore_request(self, endpoint: str, method: str = "GET", data: Dict = None) -> Dict:
+    def make_appstore_request(self, endpoint: str, method: str = "GET", data: Dict = None,
+                              priority: str = PRIORITY_NORMAL) -> Dict:
         """Make authenticated App Store Connect API request"""
-        token = self.generate_jwt_token()
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
-        url = f"{self.base_url}{endpoint}"
-        
-        try:
-            if method == "GET":
-                response = self.session.get(url, headers=headers)
-            elif method == "POST":
-                response = self.session.post(url, headers=headers, json=data)
-            else:
-                response = self.session.request(method, url, headers=headers, json=data)
-            
-            if response.status_code in [200, 201, 202]:
-                return response.json()
-            else:
-                return {
-                    "error": response.status_code,
-                    "message": response.text,
-                    "endpoint": endpoint
-                }
-                
-        except Exception as e:
-            return {"error": "request_failed", "message": str(e), "endpoint": endpoint}
+        document = self.client.request(endpoint, method, data, priority=priority)
+        return self.decode_response(document, ("GET", endpoint) if method.upper() == "GET" else None)
+    
+    def get_all_appstore_resources(self, endpoint: str, priority: str = PRIORITY_NORMAL) -> Dict:
+        """Fetch every page of a list endpoint instead of just the first one"""
+        return self.decode_response(self.client.get_all(endpoint, priority=priority), ("ALL", endpoint))
+    
+    def decode_response(self, document: Dict, request: Optional[Tuple[str, str]] = None) -> Dict:
+        """Compact records for a response, decoded once per request however many callers share it
+
+        Only the records are kept, keyed by request, so the raw document can be
+        freed as soon as its callers are done with it. Errors are not kept.
+        """
+        if request is None:
+            return decode_document(document)
+        key = (request[0], self.client.url_for(request[1]))
+        with self._decoded_lock:
+            decoded = self._decoded_documents.get(key)
+            if decoded is None:
+                decoded = decode_document(document)
+                if "error" not in decoded:
+                    self._decoded_documents[key] = decoded
+            return decoded
+    
+    @property
+    def replaying(self) -> bool:
+        return self.client.archive is not None and self.client.archive.replaying
+    
+    def recorded_run_state(self, name: str, default=None):
+        """State saved with the replayed run (e.g. watermarks in effect), or None when running live"""
+        if not self.replaying:
+            return None
+        return self.client.archive.metadata.get(name, default)
+    
+    def record_run_state(self, name: str, value):
+        """Save state that decides which requests this run makes, so a replay makes the same ones"""
+        if self.client.archive is not None and not self.replaying:
+            self.client.archive.metadata[name] = value
     
     def get_app_info(self) -> Dict:
         """Get detailed app information from App Store Connect"""
         print("📱 Fetching comprehensive app info...")
-        endpoint = f"/v1/apps/{self.app_id}?include=appStoreVersions,prices"
+        endpoint = app_info_query(self.app_id)
         return self.make_appstore_request(endpoint)
     
     def get_app_analytics_reports(self) -> Dict:
         """Get existing analytics reports"""
         print("📊 Fetching analytics reports...")
-        endpoint = f"/v1/apps/{self.app_id}/analyticsReportRequests"
-        return self.make_appstore_request(endpoint)
+        endpoint = analytics_report_requests_query(self.app_id)
+        return self.get_all_appstore_resources(endpoint)
     
     def get_app_store_overview_metrics(self) -> Dict:
         """Get App Store Connect overview metrics matching dashboard"""
@@ -118,17 +172,23 @@ class ComprehensiveMarketingAnalytics:
         }
         
         # Try to get app usage reports
-        usage_endpoint = f"/v1/apps/{self.app_id}/analyticsReportRequests?filter[accessType]=ONGOING"
-        usage_data = self.make_appstore_request(usage_endpoint)
+        usage_endpoint = analytics_report_requests_query(self.app_id, access_type="ONGOING")
+        usage_data = self.get_all_appstore_resources(usage_endpoint, priority=PRIORITY_CRITICAL)
         
         # Try to get impressions and conversion data from App Analytics
-        analytics_endpoint = f"/v1/apps/{self.app_id}/appStoreVersions"
-        version_data = self.make_appstore_request(analytics_endpoint)
+        analytics_endpoint = app_store_versions_query(self.app_id)
+        version_data = self.make_appstore_request(analytics_endpoint, priority=PRIORITY_CRITICAL)
+        
+        # Fill impressions, page views, downloads and sessions from the downloaded report segments
+        ingestion = self.run_report_pipeline()
+        for name, values in self.get_analytics_store().overview_metrics().items():
+            metrics[name].update(values, source="App Store Connect Analytics Reports")
         
         return {
             "overview_metrics": metrics,
             "usage_reports": usage_data,
             "version_data": version_data,
+            "segment_ingestion": {category: ingestion[category] for category in ("APP_USAGE", "APP_DOWNLOADS")},
             "collection_timestamp": datetime.now().isoformat(),
             "note": "Metrics structure matches App Store Connect dashboard layout"
         }
@@ -137,25 +197,94 @@ class ComprehensiveMarketingAnalytics:
         """Get specific analytics report instances with data"""
         print("📈 Fetching analytics report instances...")
         
-        # Get all available report requests first
-        requests_endpoint = f"/v1/apps/{self.app_id}/analyticsReportRequests"
-        requests_data = self.make_appstore_request(requests_endpoint)
-        
-        instances_data = {"report_requests": requests_data, "instances": []}
-        
-        # If we have report requests, try to get their instances
-        if "data" in requests_data and requests_data["data"]:
-            for request in requests_data["data"]:
-                request_id = request.get("id")
-                if request_id:
-                    instances_endpoint = f"/v1/analyticsReportRequests/{request_id}/instances"
-                    instance_data = self.make_appstore_request(instances_endpoint)
-                    instances_data["instances"].append({
-                        "request_id": request_id,
-                        "instances": instance_data
-                    })
-        
-        return instances_data
+        tree = self.get_report_tree()
+        
+        totals = tree["totals"]
+        print(f"   {totals['reports']} reports, {totals['instances']} instances, "
+              f"{totals['segments']} segments in {tree['round_trips']} round trips")
+        return tree
+    
+    def get_report_tree(self) -> Dict:
+        """Analytics request → report → instance → segment tree, walked once per run"""
+        with self._report_tree_lock:
+            if self._report_tree is None:
+                # requests → reports in one include= listing, then instances and segments in concurrent waves
+                # Instances of ingested reports older than their watermark skip the segment lookup
+                processed_since = self.recorded_run_state("instances_processed_since", {})
+                if processed_since is None:
+                    resumes = self.get_analytics_store().resume_dates(
+                        instances_watermark_key(name) for name in OVERVIEW_REPORTS)
+                    processed_since = {name: resumes[instances_watermark_key(name)]
+                                       for name in OVERVIEW_REPORTS if instances_watermark_key(name) in resumes}
+                self.record_run_state("instances_processed_since", processed_since)
+                self._report_tree = AnalyticsReportWalker(self.client).walk(self.app_id,
+                                                                            processed_since=processed_since)
+            return self._report_tree
+    
+    def get_analytics_store(self) -> AnalyticsStore:
+        """Local SQLite store of parsed analytics report rows"""
+        with self._analytics_store_lock:
+            if self._analytics_store is None:
+                self._analytics_store = AnalyticsStore()
+            return self._analytics_store
+    
+    def run_report_pipeline(self) -> Dict:
+        """Ingest APP_USAGE, APP_DOWNLOADS and SALES concurrently, each with its own queue and workers"""
+        with self._pipeline_lock:
+            if self._pipeline_result is not None:
+                return self._pipeline_result
+            
+            print("📥 Ingesting report categories...")
+            store = self.get_analytics_store()
+            pipeline = ReportIngestionPipeline()
+            for category in ("APP_USAGE", "APP_DOWNLOADS"):
+                pipeline.add(analytics_category(category, SegmentIngestor(self.client, store), self.get_report_tree,
+                                                REPORT_CATEGORIES[category], report_names=OVERVIEW_REPORTS))
+            
+            resume_from = self.recorded_run_state("sales_resume_from", {})
+            sales = SalesReportBackfill(self.client, self.vendor_number)
+            if resume_from is None:
+                resume_from = sales.resume_points(store)
+            self.record_run_state("sales_resume_from", resume_from)
+            pipeline.add(sales_category(sales, store, (self.as_of or datetime.now()).date(), self.sales_days,
+                                        resume_from=resume_from, advance=not self.replaying))
+            
+            self._pipeline_result = pipeline.run()
+            for category, outcome in self._pipeline_result.items():
+                progress = outcome["progress"]
+                print(f"   {category}: {progress['done']} done, {progress['failed']} failed, "
+                      f"{progress['rows']} rows in {progress['seconds']}s ({progress['state']})")
+            return self._pipeline_result
+    
+    def reconcile_analytics_store(self) -> Dict:
+        """Fold this run's re-issued report days into the stored aggregates"""
+        print("🔁 Reconciling re-issued report data...")
+        # Ingestion replaces the affected day partitions; rebuild the aggregates they dirtied
+        self.run_report_pipeline()
+        store = self.get_analytics_store()
+        refreshed = store.refresh_aggregates()
+        result = dict(store.reconciliation(), refreshed_partitions=refreshed)
+        
+        print(f"   {result['reissued_days']} re-issued days replaced, {result['stale_days']} stale days ignored, "
+              f"{refreshed} daily aggregates rebuilt")
+        return result
+    
+    def get_finance_store(self) -> FinanceStore:
+        """Finance report rows partitioned by fiscal month"""
+        return self._finance_store
+    
+    def ingest_finance_reports(self) -> Dict:
+        """Fetch the finance reports of every region and recent fiscal month that are not stored yet"""
+        print("🧾 Ingesting finance reports...")
+        ingestor = FinanceIngestor(self.client, self.vendor_number, self.get_finance_store())
+        jobs = self.recorded_run_state("finance_jobs", [])
+        result = ingestor.ingest((self.as_of or datetime.now()).date(),
+                                 jobs=[tuple(job) for job in jobs] if jobs is not None else None)
+        self.record_run_state("finance_jobs", result["jobs"])
+        
+        print(f"   {result['ingested']} region reports ({result['rows']} rows), "
+              f"{result['no_data']} without sales, {len(result['errors'])} errors")
+        return result
     
     def create_comprehensive_analytics_requests(self) -> Dict:
         """Create comprehensive analytics report requests for all key metrics"""
@@ -182,38 +311,21 @@ class ComprehensiveMarketingAnalytics:
         
         results = {"created_requests": [], "errors": []}
         
+        # Every report category comes from the app's single ONGOING request; POST only if it is missing
+        ensured = self.report_requests.ensure(ACCESS_ONGOING)
+        if "error" in ensured:
+            results["errors"].append(ensured)
+            return results
+        
+        print(f"   ONGOING report request {ensured['request']['id']} ({ensured['status']})")
         for report_config in report_types:
-            try:
-                request_data = {
-                    "data": {
-                        "type": "analyticsReportRequests",
-                        "attributes": {
-                            "accessType": "ONGOING"
-                        },
-                        "relationships": {
-                            "app": {
-                                "data": {
-                                    "type": "apps",
-                                    "id": self.app_id
-                                }
-                            }
-                        }
-                    }
-                }
-                
-                result = self.make_appstore_request("/v1/analyticsReportRequests", "POST", request_data)
-                results["created_requests"].append({
-                    "report_type": report_config["type"],
-                    "name": report_config["name"],
-                    "captures": report_config["captures"],
-                    "result": result
-                })
-                
-            except Exception as e:
-                results["errors"].append({
-                    "report_type": report_config["type"],
-                    "error": str(e)
-                })
+            results["created_requests"].append({
+                "report_type": report_config["type"],
+                "name": report_config["name"],
+                "captures": report_config["captures"],
+                "status": ensured["status"],
+                "result": ensured["request"]
+            })
         
         return results
     
@@ -221,32 +333,59 @@ class ComprehensiveMarketingAnalytics:
         """Get comprehensive subscription and revenue analytics"""
         print("💰 Fetching subscription analytics...")
         
-        # Get subscription metrics
-        subscription_endpoint = f"/v1/apps/{self.app_id}/subscriptionGroups"
-        subscription_data = self.make_appstore_request(subscription_endpoint)
+        # Get subscription metrics from the local catalog, refreshing only its stale parts
+        catalog = self.get_subscription_catalog()
+        catalog_refresh = self.refresh_subscription_catalog()
+        subscription_data = catalog.groups(territories=("USA",))
         
-        # Get financial reports
-        financial_endpoint = f"/v1/financeReports"
-        financial_data = self.make_appstore_request(financial_endpoint)
+        # Get financial reports: every region and recent fiscal month, into monthly partitions
+        financial_data = self.ingest_finance_reports()
+        months = fiscal_months((self.as_of or datetime.now()).date())
+        finance_store = self.get_finance_store()
+        financial_data["proceeds_by_fiscal_month"] = finance_store.proceeds(months)
+        monthly_recurring_revenue = finance_store.monthly_recurring_revenue(months[0])
         
         # Get proceeds data
         proceeds_endpoint = f"/v1/apps/{self.app_id}/salesReports?filter[frequency]=DAILY&filter[reportType]=SALES"
-        proceeds_data = self.make_appstore_request(proceeds_endpoint)
+        proceeds_data = self.make_appstore_request(proceeds_endpoint, priority=PRIORITY_CRITICAL)
         
         return {
             "subscription_groups": subscription_data,
+            "subscription_catalog": catalog_refresh,
             "financial_reports": financial_data,
             "proceeds_data": proceeds_data,
             "collection_timestamp": datetime.now().isoformat(),
             "metrics_calculated": {
-                "monthly_recurring_revenue": "Requires subscription data processing",
+                "monthly_recurring_revenue": monthly_recurring_revenue or "No subscription proceeds in the latest fiscal month",
                 "active_subscribers": "Requires subscription analytics",
                 "churn_rate": "Requires cohort analysis",
                 "ltv_calculation": "Requires revenue + retention data",
-                "arpu": "Average revenue per user calculation needed"
+                "arpu": "Average revenue per user calculation needed",
+                "monthly_proceeds_per_subscriber_usa": {
+                    subscription["product_id"]: catalog.monthly_proceeds(subscription["product_id"], "USA")
+                    for group in subscription_data for subscription in group["subscriptions"]
+                    if subscription.get("product_id")
+                }
             }
         }
     
+    def get_subscription_catalog(self) -> SubscriptionCatalog:
+        """Cached subscription groups, subscriptions and price points with in-memory lookups"""
+        with self._subscription_catalog_lock:
+            if self._subscription_catalog is None:
+                self._subscription_catalog = SubscriptionCatalog(self.client, self.app_id)
+            return self._subscription_catalog
+    
+    def refresh_subscription_catalog(self) -> Dict:
+        """Re-fetch the catalog's stale groups and prices; a replay repeats the recorded fetches"""
+        result = self.get_subscription_catalog().refresh((self.as_of or datetime.now()).date(),
+                                                         replay=self.recorded_run_state("subscription_catalog", {}))
+        self.record_run_state("subscription_catalog", result["refreshed"])
+        
+        print(f"   Subscription catalog: {result['subscriptions']} subscriptions, {result['prices']} prices "
+              f"({result['prices_fetched']} refreshed, {len(result['errors'])} errors)")
+        return result
+    
     def get_retention_analytics(self) -> Dict:
         """Get user retention and cohort analysis"""
         print("📊 Fetching retention analytics...")
@@ -270,8 +409,8 @@ class ComprehensiveMarketingAnalytics:
         }
         
         # Get app usage patterns for retention calculation
-        usage_endpoint = f"/v1/apps/{self.app_id}/analyticsReportRequests"
-        usage_data = self.make_appstore_request(usage_endpoint)
+        usage_endpoint = analytics_report_requests_query(self.app_id)
+        usage_data = self.get_all_appstore_resources(usage_endpoint)
         
         return {
             "retention_reports": usage_data,
@@ -295,8 +434,8 @@ class ComprehensiveMarketingAnalytics:
         print("🔍 Fetching traffic source analytics...")
         
         # Get impressions by source
-        impressions_endpoint = f"/v1/apps/{self.app_id}/analyticsReportRequests"
-        impressions_data = self.make_appstore_request(impressions_endpoint)
+        impressions_endpoint = analytics_report_requests_query(self.app_id)
+        impressions_data = self.get_all_appstore_resources(impressions_endpoint, priority=PRIORITY_OPTIONAL)
         
         # Create request for detailed source analytics
         source_request_data = {
@@ -344,8 +483,8 @@ class ComprehensiveMarketingAnalytics:
         ]
         
         # Get search performance data
-        search_endpoint = f"/v1/apps/{self.app_id}/analyticsReportRequests"
-        search_data = self.make_appstore_request(search_endpoint)
+        search_endpoint = analytics_report_requests_query(self.app_id)
+        search_data = self.get_all_appstore_resources(search_endpoint, priority=PRIORITY_OPTIONAL)
         
         return {
             "target_keywords": target_keywords,
@@ -375,7 +514,7 @@ class ComprehensiveMarketingAnalytics:
         
         # Get sales by territory
         territory_endpoint = f"/v1/salesReports?filter[frequency]=DAILY&filter[reportType]=SALES"
-        territory_data = self.make_appstore_request(territory_endpoint)
+        territory_data = self.make_appstore_request(territory_endpoint, priority=PRIORITY_OPTIONAL)
         
         return {
             "supported_markets": {
@@ -403,8 +542,8 @@ class ComprehensiveMarketingAnalytics:
         print("👥 Fetching user segmentation analytics...")
         
         # Get app usage by demographics (where available)
-        demographics_endpoint = f"/v1/apps/{self.app_id}/analyticsReportRequests"
-        demographics_data = self.make_appstore_request(demographics_endpoint)
+        demographics_endpoint = analytics_report_requests_query(self.app_id)
+        demographics_data = self.get_all_appstore_resources(demographics_endpoint, priority=PRIORITY_OPTIONAL)
         
         return {
             "user_segments": {
@@ -534,37 +673,33 @@ class ComprehensiveMarketingAnalytics:
             return default_value
     
     def create_analytics_report_request(self, report_type: str = "APP_USAGE") -> Dict:
-        """Create new analytics report request"""
-        print(f"📈 Creating {report_type} analytics report...")
-        
-        request_data = {
-            "data": {
-                "type": "analyticsReportRequests",
-                "attributes": {
-                    "accessType": "ONGOING"
-                },
-                "relationships": {
-                    "app": {
-                        "data": {
-                            "type": "apps", 
-                            "id": self.app_id
-                        }
-                    }
-                }
-            }
-        }
-        
-        return self.make_appstore_request("/v1/analyticsReportRequests", "POST", request_data)
+        """Ensure the analytics report request covering report_type exists, creating it only if missing"""
+        print(f"📈 Ensuring {report_type} analytics report request...")
+        return self.report_requests.ensure(ACCESS_ONGOING)
     
-    def get_sales_reports(self, days_back: int = 30) -> Dict:
-        """Get sales and financial reports"""
+    def get_sales_reports(self, days_back: Optional[int] = None) -> Dict:
+        """Get daily sales reports for the backfill window, fetching only days after the stored watermark"""
+        days_back = days_back or self.sales_days
         print(f"💰 Fetching sales reports for last {days_back} days...")
         
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days_back)
-        
-        endpoint = f"/v1/salesReports?filter[frequency]=DAILY&filter[reportDate]={start_date.strftime('%Y-%m-%d')}&filter[reportType]=SALES&filter[vendorNumber]=90709074"
-        return self.make_appstore_request(endpoint)
+        if days_back == self.sales_days:
+            # The run's own window is ingested by the SALES category of the report pipeline
+            outcome = self.run_report_pipeline()["SALES"]
+            if outcome["result"] is None:
+                return {"error": "sales_ingestion_failed", "errors": outcome["errors"]}
+            result = outcome["result"]
+        else:
+            end_date = (self.as_of or datetime.now()).date()
+            backfill = SalesReportBackfill(self.client, self.vendor_number)
+            result = backfill.run_incremental(end_date, days_back, self.get_analytics_store(),
+                                              resume_from=self.recorded_run_state("sales_resume_from", {}),
+                                              advance=not self.replaying)
+            self.record_run_state("sales_resume_from", result["resume_from"])
+        
+        counters = result["counters"]
+        print(f"   {counters['reports']} new daily reports, {counters['no_data']} days without sales, "
+              f"{len(result['errors'])} errors ({result['seconds']}s)")
+        return result
     
     def get_app_store_rankings(self) -> Dict:
         """Get app store ranking data using third-party API or scraping"""
@@ -841,21 +976,31 @@ class ComprehensiveMarketingAnalytics:
     
     def collect_all_marketing_data(self) -> Tuple[Dict, Dict, Dict]:
         """Collect all available marketing data"""
+        with self.client.run_scope() as run_cache:
+            all_data = self._collect_sequentially()
+        
+        all_data["api_usage"] = self._api_usage(run_cache)
+        return self._finalize_collection(all_data)
+    
+    def _api_usage(self, run_cache) -> Dict:
+        """Request coalescing and rate-limit quota usage for the finished run"""
+        usage = run_cache.stats()
+        usage["quota"] = self.client.rate_limiter.run_usage()
+        if self.client.http_cache is not None:
+            usage["http_cache"] = self.client.http_cache.stats()
+        if self.client.archive is not None:
+            # The run is over, so the recorded index is complete
+            self.client.archive.save()
+            usage["archive"] = self.client.archive.stats()
+        return usage
+    
+    def _collect_sequentially(self) -> Dict:
+        """Run every collection stage one after another"""
         print("🚀 Starting Comprehensive Marketing Data Collection")
         print("=" * 60)
         
         # Initialize data collection
-        all_data = {
-            "collection_started": datetime.now().isoformat(),
-            "app_info": {},
-            "analytics": {},
-            "competitors": {},
-            "aso": {},
-            "social_media": {},
-            "website": {},
-            "campaigns": {},
-            "rankings": {}
-        }
+        all_data = self._new_collection()
         
         # Collect App Store Connect data
         print("\n📱 APP STORE CONNECT DATA")
@@ -881,6 +1026,9 @@ class ComprehensiveMarketingAnalytics:
         sales_data = self.get_sales_reports()
         all_data["analytics"]["sales"] = sales_data
         
+        reconciliation = self.reconcile_analytics_store()
+        all_data["analytics"]["reconciliation"] = reconciliation
+        
         # Collect subscription and revenue analytics
         print("\n💰 SUBSCRIPTION & REVENUE ANALYTICS")
         print("-" * 40)
@@ -959,6 +1107,29 @@ class ComprehensiveMarketingAnalytics:
         campaign_data = self.collect_marketing_campaign_data()
         all_data["campaigns"] = campaign_data
         
+        return all_data
+    
+    def _new_collection(self) -> Dict:
+        """Empty all_data skeleton shared by the sequential and concurrent collectors"""
+        self._decoded_documents.clear()
+        self._report_tree = None
+        self._pipeline_result = None
+        # A long-lived daemon must notice requests stopped or deleted on Apple's side since the last run
+        self.report_requests.reset()
+        return {
+            "collection_started": datetime.now().isoformat(),
+            "app_info": {},
+            "analytics": {},
+            "competitors": {},
+            "aso": {},
+            "social_media": {},
+            "website": {},
+            "campaigns": {},
+            "rankings": {}
+        }
+    
+    def _finalize_collection(self, all_data: Dict) -> Tuple[Dict, Dict, Dict]:
+        """Calculate KPIs and build the report once all data has been collected"""
         # Calculate KPIs
         print("\n📊 CALCULATING KPIS")
         print("-" * 30)
@@ -978,42 +1149,137 @@ class ComprehensiveMarketingAnalytics:
         all_data["collection_completed"] = datetime.now().isoformat()
         
         return all_data, kpis, report
+    
+    def _collection_stages(self) -> List[Tuple[Tuple[str, ...], Callable[[], Dict]]]:
+        """Independent collection steps and the all_data path each result is stored under"""
+        return [
+            (("app_info",), self.get_app_info),
+            (("analytics", "overview"), self.get_app_store_overview_metrics),
+            (("analytics", "reports"), self.get_app_analytics_reports),
+            (("analytics", "instances"), self.get_analytics_report_instances),
+            (("analytics", "created_requests"), self.create_comprehensive_analytics_requests),
+            (("analytics", "sales"), self.get_sales_reports),
+            (("analytics", "reconciliation"), self.reconcile_analytics_store),
+            (("subscription_analytics",), self.get_subscription_analytics),
+            (("retention_analytics",), self.get_retention_analytics),
+            (("traffic_source_analytics",), self.get_traffic_source_analytics),
+            (("aso_analytics",), self.get_aso_performance_metrics),
+            (("geographic_analytics",), self.get_geographic_analytics),
+            (("segmentation_analytics",), self.get_user_segmentation_analytics),
+            (("content_analytics",), self.get_content_engagement_analytics),
+            (("competitors",), self.get_competitor_analysis),
+            (("aso",), self.collect_aso_data),
+            (("rankings",), self.get_app_store_rankings),
+            (("social_media",), self.collect_social_media_metrics),
+            (("website",), self.collect_website_analytics),
+            (("campaigns",), self.collect_marketing_campaign_data)
+        ]
+    
+    async def collect_all_marketing_data_async(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> Tuple[Dict, Dict, Dict]:
+        """Collect all marketing data, running independent stages concurrently
+
+        max_concurrency bounds both the stages running at once and the App
+        Store Connect requests in flight across all of them, including those
+        sent by the stages' own worker pools.
+        """
+        print(f"🚀 Starting Concurrent Marketing Data Collection (max {max_concurrency} in flight)")
+        print("=" * 60)
+        
+        all_data = self._new_collection()
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run_stage(fetch: Callable[[], Dict]) -> Dict:
+            async with semaphore:
+                return await loop.run_in_executor(executor, fetch)
+        
+        stages = self._collection_stages()
+        # The stage pool bounds stages; the client bounds requests from every stage's own worker pools
+        with self.client.run_scope(max_in_flight=max_concurrency) as run_cache, \
+                ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            results = await asyncio.gather(
+                *(run_stage(fetch) for _, fetch in stages),
+                return_exceptions=True
+            )
+        
+        for (path, fetch), result in zip(stages, results):
+            if isinstance(result, Exception):
+                result = {"error": "collection_failed", "message": str(result), "stage": fetch.__name__}
+            
+            target = all_data
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = result
+        
+        all_data["api_usage"] = self._api_usage(run_cache)
+        return self._finalize_collection(all_data)
+    
+    def collect_all_marketing_data_concurrently(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> Tuple[Dict, Dict, Dict]:
+        """Synchronous entry point for the concurrent collector"""
+        return asyncio.run(self.collect_all_marketing_data_async(max_concurrency))
+
+def save_collection_results(raw_data: Dict, kpis: Dict, report: Dict, output_dir: Path = Path(".")) -> Dict[str, Path]:
+    """Save one run's raw data, KPIs and report as timestamped JSON files"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
+    paths = {name: Path(output_dir) / f"{prefix}_{timestamp}.json"
+             for name, prefix in (("raw_data", "marketing_raw_data"),
+                                  ("kpis", "marketing_kpis"),
+                                  ("report", "marketing_report"))}
+    
+    # The report embeds the same raw data; point at the raw data file instead of writing it twice
+    if report.get("raw_data") is raw_data:
+        report = dict(report, raw_data={"file": paths["raw_data"].name})
+    
+    for name, payload in (("raw_data", raw_data), ("kpis", kpis), ("report", report)):
+        with open(paths[name], 'w') as f:
+            json.dump(payload, f, indent=2, default=encode_record)
+    
+    return paths
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Magical Stories comprehensive marketing analytics")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="Run independent App Store Connect fetches concurrently")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help=f"Maximum stages running and App Store Connect requests in flight with --concurrent (default {DEFAULT_MAX_CONCURRENCY})")
+    parser.add_argument("--http2", action="store_true",
+                        help="Multiplex App Store Connect requests over one HTTP/2 connection (needs httpx[http2])")
+    parser.add_argument("--sales-days", type=int, default=DEFAULT_SALES_DAYS,
+                        help=f"Days of daily sales reports to fetch, e.g. 365 for a backfill (default {DEFAULT_SALES_DAYS})")
+    archive = parser.add_mutually_exclusive_group()
+    archive.add_argument("--record", action="store_true",
+                         help="Archive every App Store Connect response for later offline replay")
+    archive.add_argument("--replay", metavar="RUN_ID",
+                         help="Re-run the pipeline offline from a recorded run")
+    return parser.parse_args(argv)
 
 def main():
     """Main execution function"""
+    args = parse_args()
+    
     print("🎯 Magical Stories - Comprehensive Marketing Analytics")
     print("📊 Collecting ALL marketing data for optimization")
     print("=" * 65)
     
     try:
         # Initialize analytics client
-        analytics = ComprehensiveMarketingAnalytics()
+        analytics = ComprehensiveMarketingAnalytics(http2=args.http2, record=args.record, replay_run_id=args.replay,
+                                                    sales_days=args.sales_days)
         
         # Collect all data
-        raw_data, kpis, report = analytics.collect_all_marketing_data()
-        
-        # Save results with timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # Save comprehensive raw data
-        raw_filename = f"marketing_raw_data_{timestamp}.json"
-        with open(raw_filename, 'w') as f:
-            json.dump(raw_data, f, indent=2)
+        if args.concurrent:
+            raw_data, kpis, report = analytics.collect_all_marketing_data_concurrently(args.concurrency)
+        else:
+            raw_data, kpis, report = analytics.collect_all_marketing_data()
         
-        # Save KPIs
-        kpi_filename = f"marketing_kpis_{timestamp}.json"
-        with open(kpi_filename, 'w') as f:
-            json.dump(kpis, f, indent=2)
-        
-        # Save report
-        report_filename = f"marketing_report_{timestamp}.json"
-        with open(report_filename, 'w') as f:
-            json.dump(report, f, indent=2)
+        saved = save_collection_results(raw_data, kpis, report)
         
         print(f"\n💾 COMPREHENSIVE DATA SAVED:")
-        print(f"   📊 Raw Data: {raw_filename}")
-        print(f"   📈 KPIs: {kpi_filename}")
-        print(f"   📄 Report: {report_filename}")
+        print(f"   📊 Raw Data: {saved['raw_data']}")
+        print(f"   📈 KPIs: {saved['kpis']}")
+        print(f"   📄 Report: {saved['report']}")
         
         # Display summary
         print(f"\n📊 MARKETING DATA COLLECTION SUMMARY:")
@@ -1023,6 +1289,17 @@ def main():
         print(f"   🔗 App Store: {analytics.app_store_url}")
         print(f"   📅 Collection: {raw_data.get('collection_started', 'N/A')}")
         
+        archive = raw_data.get("api_usage", {}).get("archive")
+        if archive and archive["mode"] == "record":
+            print(f"   🗄️ Recorded run: {archive['run_id']} (replay with --replay {archive['run_id']})")
+        elif archive:
+            print(f"   🗄️ Replayed run {archive['run_id']}: {archive['replayed']} responses, {archive['missing']} not archived")
+        
+        quota = raw_data.get("api_usage", {}).get("quota", {})
+        if quota:
+            print(f"   📉 API quota used: {quota['quota_used']} "
+                  f"({quota['quota_remaining']}/{quota['quota_limit']} left this hour)")
+        
         print(f"\n✅ COMPREHENSIVE MARKETING ANALYTICS COMPLETED!")
         print(f"🎯 Next: Use data for marketing optimization and KPI tracking")
         
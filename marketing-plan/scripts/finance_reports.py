@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Finance Report Ingestion
+Walks financeReports by region code and fiscal month, stream-parses each
+gzipped TSV payload and stores the rows in one partition per fiscal month
+"""
+
+import os
+import csv
+import json
+import gzip
+import zlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from appstore_client import STREAM_CHUNK_SIZE, AppStoreConnectClient, AppStoreConnectError
+from appstore_http_cache import APPSTORE_DATA_DIR
+from appstore_query import QueryBuilder
+from appstore_rate_limit import PRIORITY_NORMAL
+
+DEFAULT_FINANCE_DIR = APPSTORE_DATA_DIR / "finance"
+
+# Fiscal months fetched per run, newest first
+DEFAULT_FINANCE_MONTHS = 3
+
+# Region codes of the FINANCIAL report (one report per region and fiscal month)
+FINANCE_REGION_CODES = (
+    "AE", "AU", "BR", "CA", "CH", "CL", "CN", "CO", "EG", "EU", "GB", "HK", "ID", "IL", "IN",
+    "JP", "KR", "KZ", "MX", "MY", "NG", "NO", "NZ", "PE", "PH", "PK", "PL", "QA", "RO", "RU",
+    "SA", "SE", "SG", "TH", "TR", "TW", "TZ", "US", "VN", "WW", "ZA"
+)
+
+# Report header → partition column
+FINANCE_COLUMNS = {
+    "Start Date": "start_date",
+    "End Date": "end_date",
+    "Vendor Identifier": "vendor_identifier",
+    "Quantity": "quantity",
+    "Partner Share": "partner_share",
+    "Extended Partner Share": "extended_partner_share",
+    "Partner Share Currency": "currency",
+    "Sales or Return": "sales_or_return",
+    "Apple Identifier": "apple_identifier",
+    "Product Type Identifier": "product_type",
+    "Country Of Sale": "country_of_sale",
+    "Customer Price": "customer_price",
+    "Customer Currency": "customer_currency"
+}
+PARTITION_COLUMNS = ("region",) + tuple(FINANCE_COLUMNS.values())
+
+# Product types counted as recurring subscription revenue (auto-renewable subscriptions)
+SUBSCRIPTION_PRODUCT_TYPES = ("IAY",)
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def fiscal_months(end: date, months: int = DEFAULT_FINANCE_MONTHS) -> List[str]:
+    """The `months` fiscal months before end's month, newest first, as YYYY-MM"""
+    year, month = end.year, end.month
+    result = []
+    for _ in range(months):
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+        result.append(f"{year}-{month:02d}")
+    return result
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Text lines of a body arriving in chunks, gunzipping on the fly when it is gzipped"""
+    decompressor = None
+    pending = b""
+    for chunk in chunks:
+        if decompressor is None:
+            # 16 + MAX_WBITS tells zlib to expect the gzip header; a plain body is passed through
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == GZIP_MAGIC else False
+        data = decompressor.decompress(chunk) if decompressor else chunk
+
+        pending += data
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r").decode("utf-8-sig")
+
+    if decompressor:
+        pending += decompressor.flush()
+    if pending:
+        yield pending.rstrip(b"\r").decode("utf-8-sig")
+
+
+def parse_finance_rows(lines: Iterable[str], region: str) -> Iterator[Dict]:
+    """Partition rows from report lines; stops at the blank line before the Total_ footer"""
+    reader = csv.reader(lines, delimiter="\t", quoting=csv.QUOTE_NONE)
+    header = next(reader, None)
+    if not header:
+        return
+    mapping = [(index, FINANCE_COLUMNS[name.strip()]) for index, name in enumerate(header)
+               if name.strip() in FINANCE_COLUMNS]
+
+    for cells in reader:
+        if not cells or not cells[0] or cells[0].startswith("Total_"):
+            break
+        row = {"region": region}
+        for index, column in mapping:
+            row[column] = cells[index] if index < len(cells) else ""
+        yield row
+
+
+def _amount(value: str) -> float:
+    try:
+        return float(value.replace(",", "")) if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+class FinanceStore:
+    """Finance rows partitioned by fiscal month: <root>/fiscal_month=YYYY-MM/region=XX.tsv.gz plus a manifest"""
+
+    def __init__(self, root: Path = DEFAULT_FINANCE_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def partition_dir(self, fiscal_month: str) -> Path:
+        return self.root / f"fiscal_month={fiscal_month}"
+
+    def _manifest_path(self, fiscal_month: str) -> Path:
+        return self.partition_dir(fiscal_month) / "_manifest.json"
+
+    def manifest(self, fiscal_month: str) -> Dict[str, Dict]:
+        """Region → {"status", "rows", "ingested_at"} for one fiscal month"""
+        try:
+            with open(self._manifest_path(fiscal_month), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def has(self, fiscal_month: str, region: str) -> bool:
+        return region in self.manifest(fiscal_month)
+
+    def mark(self, fiscal_month: str, region: str, status: str, rows: int = 0):
+        """Record a region as ingested ("ok") or as having no report ("no_data")"""
+        with self._lock:
+            manifest = self.manifest(fiscal_month)
+            manifest[region] = {"status": status, "rows": rows, "ingested_at": datetime.now().isoformat()}
+            path = self._manifest_path(fiscal_month)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, path)
+
+    def write_partition(self, fiscal_month: str, region: str, rows: Iterable[Dict]) -> int:
+        """Write one region's rows for a fiscal month, replacing any earlier file atomically"""
+        path = self.partition_dir(fiscal_month) / f"region={region}.tsv.gz"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+
+        count = 0
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+                writer.writerow(PARTITION_COLUMNS)
+                for row in rows:
+                    writer.writerow([row.get(column, "") for column in PARTITION_COLUMNS])
+                    count += 1
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        os.replace(tmp_path, path)
+        return count
+
+    def iter_rows(self, fiscal_months: Iterable[str], regions: Optional[Iterable[str]] = None) -> Iterator[Dict]:
+        """Rows of the requested partitions only; other months are never opened"""
+        wanted = set(regions) if regions else None
+        for fiscal_month in fiscal_months:
+            for path in sorted(self.partition_dir(fiscal_month).glob("region=*.tsv.gz")):
+                region = path.name[len("region="):-len(".tsv.gz")]
+                if wanted is not None and region not in wanted:
+                    continue
+                with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+                    yield from csv.DictReader(f, delimiter="\t")
+
+    def proceeds(self, fiscal_months: Iterable[str],
+                 product_types: Optional[Tuple[str, ...]] = None) -> Dict[str, Dict[str, float]]:
+        """Extended partner share per fiscal month and currency, optionally for some product types"""
+        totals: Dict[str, Dict[str, float]] = {}
+        for fiscal_month in fiscal_months:
+            month_totals = totals.setdefault(fiscal_month, {})
+            for row in self.iter_rows([fiscal_month]):
+                if product_types and row["product_type"] not in product_types:
+                    continue
+                currency = row["currency"]
+                month_totals[currency] = round(month_totals.get(currency, 0.0)
+                                               + _amount(row["extended_partner_share"]), 2)
+        return totals
+
+    def monthly_recurring_revenue(self, fiscal_month: str) -> Dict[str, float]:
+        """Auto-renewable subscription proceeds for one fiscal month, per currency"""
+        return self.proceeds([fiscal_month], SUBSCRIPTION_PRODUCT_TYPES)[fiscal_month]
+
+
+class FinanceIngestor:
+    """Fetches FINANCIAL reports for every region and fiscal month not yet in the store"""
+
+    def __init__(self, client: AppStoreConnectClient, vendor_number: str, store: FinanceStore,
+                 max_workers: int = 4):
+        self.client = client
+        self.vendor_number = vendor_number
+        self.store = store
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "ingested": 0, "no_data": 0, "rows": 0, "bytes": 0}
+        self.errors: List[Dict] = []
+
+    def endpoint(self, fiscal_month: str, region: str) -> str:
+        return (QueryBuilder("/v1/financeReports")
+                .filter("regionCode", region)
+                .filter("reportDate", fiscal_month)
+                .filter("reportType", "FINANCIAL")
+                .filter("vendorNumber", self.vendor_number)
+                .build())
+
+    def plan(self, end: date, months: int = DEFAULT_FINANCE_MONTHS,
+             regions: Iterable[str] = FINANCE_REGION_CODES) -> List[Tuple[str, str]]:
+        """(fiscal month, region) pairs not yet in the store"""
+        regions = list(regions)
+        return [(fiscal_month, region) for fiscal_month in fiscal_months(end, months)
+                for region in regions if not self.store.has(fiscal_month, region)]
+
+    def ingest_report(self, job: Tuple[str, str], newest_month: str):
+        """Stream one region's report for a fiscal month into its partition"""
+        fiscal_month, region = job
+        endpoint = self.endpoint(fiscal_month, region)
+        with self._lock:
+            self.counters["requests"] += 1
+
+        try:
+            response = self.client.send("GET", endpoint, headers={"Accept": "application/a-gzip"},
+                                        stream=True, priority=PRIORITY_NORMAL)
+        except AppStoreConnectError as e:
+            if e.status_code == 404:
+                with self._lock:
+                    self.counters["no_data"] += 1
+                # The newest month may just not be published yet; older months have no sales in region
+                if fiscal_month != newest_month:
+                    self.store.mark(fiscal_month, region, "no_data")
+                return
+            with self._lock:
+                self.errors.append(dict(e.to_dict(), fiscal_month=fiscal_month, region=region))
+            return
+
+        received = 0
+
+        def chunks() -> Iterator[bytes]:
+            nonlocal received
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                received += len(chunk)
+                yield chunk
+
+        try:
+            rows = self.store.write_partition(fiscal_month, region,
+                                              parse_finance_rows(iter_lines(chunks()), region))
+        except (OSError, ValueError, zlib.error, csv.Error) as e:
+            with self._lock:
+                self.errors.append({"error": "finance_parse_failed", "message": str(e),
+                                    "fiscal_month": fiscal_month, "region": region})
+            return
+        finally:
+            response.close()
+
+        self.store.mark(fiscal_month, region, "ok", rows)
+        with self._lock:
+            self.counters["ingested"] += 1
+            self.counters["rows"] += rows
+            self.counters["bytes"] += received
+
+    def ingest(self, end: date, months: int = DEFAULT_FINANCE_MONTHS,
+               regions: Iterable[str] = FINANCE_REGION_CODES,
+               jobs: Optional[List[Tuple[str, str]]] = None) -> Dict:
+        """Ingest every missing (fiscal month, region) report; jobs overrides the plan (e.g. for replay)"""
+        if jobs is None:
+            jobs = self.plan(end, months, regions)
+        newest_month = fiscal_months(end, 1)[0]
+
+        if jobs:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as executor:
+                list(executor.map(lambda job: self.ingest_report(job, newest_month), jobs))
+
+        with self._lock:
+            return dict(self.counters, jobs=[list(job) for job in jobs], errors=list(self.errors))
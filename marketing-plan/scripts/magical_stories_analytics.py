@@ -8,47 +8,27 @@ import os
 import sys
 import json
 import time
-import requests
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+from appstore_client import get_shared_client
+from appstore_query import QueryBuilder, analytics_report_requests_query
+from report_request_registry import ACCESS_ONGOING, ReportRequestRegistry
+
 class WorkingAnalyticsClient:
     """Fully working client for App Store Connect Analytics API"""
     
     def __init__(self):
         # Configuration for Magical Stories
-        self.key_id = "RHM24L7VXD"
-        self.issuer_id = "c419fd84-aa0b-4d05-9688-19d736cc2575"
-        self.private_key_path = "/Users/quang.tranminh/Library/Mobile Documents/com~apple~CloudDocs/DevelopmentCertificates/AuthKey_RHM24L7VXD.p8"
-        self.base_url = "https://api.appstoreconnect.apple.com"
-        self.session = requests.Session()
+        self.client = get_shared_client()
+        self.base_url = self.client.base_url
         self.app_id = "6747953770"  # Magical Stories: Family Tales
+        self.report_requests = ReportRequestRegistry(self.client, self.app_id)
         
     def generate_jwt_token(self) -> str:
-        """Generate JWT token for authentication - WORKING VERSION"""
+        """Return a cached JWT token, signing a new one only when it nears expiry"""
         try:
-            import jwt
-            from cryptography.hazmat.primitives import serialization
-            
-            # Read private key
-            with open(self.private_key_path, 'rb') as key_file:
-                private_key = serialization.load_pem_private_key(key_file.read(), password=None)
-            
-            # Generate timestamps
-            now = int(time.time())
-            exp = now + 1200  # 20 minutes
-            
-            # Create JWT
-            payload = {
-                "iss": self.issuer_id,
-                "iat": now,
-                "exp": exp,
-                "aud": "appstoreconnect-v1"
-            }
-            
-            headers = {"kid": self.key_id, "typ": "JWT"}
-            
-            return jwt.encode(payload, private_key, algorithm="ES256", headers=headers)
+            return self.client.generate_jwt_token()
             
         except ImportError:
             print("❌ Install dependencies: pip3 install PyJWT cryptography requests")
@@ -59,68 +39,25 @@ class WorkingAnalyticsClient:
     
     def make_request(self, endpoint: str, method: str = "GET", data: Dict = None) -> Dict:
         """Make authenticated API request"""
-        token = self.generate_jwt_token()
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
-        url = f"{self.base_url}{endpoint}"
-        
-        try:
-            if method == "GET":
-                response = self.session.get(url, headers=headers)
-            elif method == "POST":
-                response = self.session.post(url, headers=headers, json=data)
-            else:
-                response = self.session.request(method, url, headers=headers, json=data)
-            
-            if response.status_code in [200, 201, 202]:
-                return response.json()
-            else:
-                return {
-                    "error": response.status_code, 
-                    "message": response.text,
-                    "endpoint": endpoint
-                }
-                
-        except Exception as e:
-            return {"error": "request_failed", "message": str(e), "endpoint": endpoint}
+        return self.client.request(endpoint, method, data)
     
     def get_app_info(self) -> Dict:
         """Get Magical Stories app information"""
         print("📱 Fetching Magical Stories app info...")
-        return self.make_request(f"/v1/apps/{self.app_id}")
+        return self.make_request(
+            QueryBuilder(f"/v1/apps/{self.app_id}").fields("apps", "name", "bundleId", "sku", "primaryLocale").build()
+        )
     
     def create_sales_report_request(self) -> Dict:
-        """Create a sales analytics report request"""
-        print("📈 Creating sales analytics report request...")
-        
-        # Request data for sales report
-        request_data = {
-            "data": {
-                "type": "analyticsReportRequests",
-                "attributes": {
-                    "accessType": "ONGOING"
-                },
-                "relationships": {
-                    "app": {
-                        "data": {
-                            "type": "apps",
-                            "id": self.app_id
-                        }
-                    }
-                }
-            }
-        }
-        
-        return self.make_request("/v1/analyticsReportRequests", "POST", request_data)
+        """Ensure an ongoing analytics report request exists, creating it only if missing"""
+        print("📈 Ensuring analytics report request...")
+        return self.report_requests.ensure(ACCESS_ONGOING)
     
     def get_app_analytics_reports(self) -> Dict:
         """Get analytics reports for the app"""
         print("📊 Fetching app analytics reports...")
-        endpoint = f"/v1/apps/{self.app_id}/analyticsReportRequests"
-        return self.make_request(endpoint)
+        endpoint = analytics_report_requests_query(self.app_id)
+        return self.client.get_all(endpoint)
     
     def collect_marketing_data(self) -> Dict:
         """Collect comprehensive marketing data for Magical Stories"""
@@ -157,7 +94,7 @@ class WorkingAnalyticsClient:
         report_request = self.create_sales_report_request()
         if "error" not in report_request:
             results["data"]["new_report_request"] = report_request
-            print("✅ New analytics report request created")
+            print(f"✅ Analytics report request {report_request['status']}")
         else:
             print(f"❌ Create report request failed: {report_request.get('message', 'Unknown error')}")
             results["data"]["report_request_error"] = report_request
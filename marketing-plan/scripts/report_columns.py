@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Columnar Report Parser
+Reads Apple's TSV report files in large blocks into NumPy column arrays,
+dictionary-encoding text dimensions and converting measures in one pass per
+block; requires `pip3 install numpy` (callers fall back to csv without it)
+"""
+
+import io
+import gzip
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple, Union
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Bytes decoded and split per block
+DEFAULT_BLOCK_SIZE = 8 << 20
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+TAB = 9
+NEWLINE = 10
+
+
+def open_report(source: Union[Path, str, bytes]) -> BinaryIO:
+    """Binary stream over a report file or body, gunzipping on the fly when it is gzipped"""
+    if isinstance(source, (bytes, bytearray)):
+        raw = io.BytesIO(source)
+    else:
+        raw = open(source, "rb")
+    magic = raw.read(2)
+    raw.seek(0)
+    return gzip.GzipFile(fileobj=raw, mode="rb") if magic == GZIP_MAGIC else raw
+
+
+def _blocks(stream: BinaryIO, block_size: int) -> Iterator[bytes]:
+    """Runs of whole lines, about block_size bytes each, without their final newline"""
+    pending = b""
+    while True:
+        data = stream.read(block_size)
+        if not data:
+            break
+        data = pending + data
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            pending = data
+            continue
+        pending = data[cut + 1:]
+        yield data[:cut]
+    if pending:
+        yield pending
+
+
+def _fields(block: bytes, width: int):
+    """Byte buffer of a block plus (rows, width) start and end offsets of every cell
+
+    Found with array operations over the raw bytes, so no Python object is
+    created per cell. Lines with another field count (the blank lines and
+    "Total" footers at the end of a report) are dropped.
+    """
+    if b"\r" in block:
+        # The block's last line was cut before its "\n", so its "\r" has no newline to pair with
+        block = block.replace(b"\r\n", b"\n")
+        if block.endswith(b"\r"):
+            block = block[:-1]
+    data = np.frombuffer(block, dtype=np.uint8)
+
+    # Every tab or newline ends a field; the block's last line ends at its end
+    separators = np.append(np.flatnonzero((data == TAB) | (data == NEWLINE)), len(data))
+    line_ends = np.append(data[separators[:-1]] == NEWLINE, True)
+    starts = np.append(0, separators[:-1] + 1)
+    line_of_field = np.cumsum(line_ends) - line_ends
+
+    complete = np.bincount(line_of_field) == width
+    if not complete.all():
+        keep = complete[line_of_field]
+        starts, separators = starts[keep], separators[keep]
+    return data, starts.reshape(-1, width), separators.reshape(-1, width)
+
+
+def _column(data, starts, ends) -> "np.ndarray":
+    """Fixed-width bytes array of one column, gathered from the block buffer in one indexing step"""
+    lengths = ends - starts
+    width = max(int(lengths.max()), 1) if len(lengths) else 1
+    offsets = np.arange(width)
+    index = np.minimum(starts[:, None] + offsets, max(len(data) - 1, 0))
+    chars = np.where(offsets < lengths[:, None], data[index] if len(data) else 0, 0).astype(np.uint8)
+    return np.ascontiguousarray(chars).view(f"S{width}").reshape(-1)
+
+
+def to_numbers(column) -> "np.ndarray":
+    """float64 array of a bytes column; thousands separators are dropped, blank or bad cells become NaN"""
+    try:
+        return column.astype(np.float64)
+    except ValueError:
+        pass
+
+    column = np.char.strip(np.char.replace(column, b",", b""))
+    column[column == b""] = b"nan"
+    try:
+        return column.astype(np.float64)
+    except ValueError:
+        # Stray text in a measure column; only this column of this block pays for the slow path
+        values = np.empty(len(column), dtype=np.float64)
+        for position, value in enumerate(column.tolist()):
+            try:
+                values[position] = float(value)
+            except ValueError:
+                values[position] = np.nan
+        return values
+
+
+class ColumnBlock:
+    """One block of report rows: dictionary-encoded text columns and float64 measure columns"""
+
+    def __init__(self, rows: int):
+        self.rows = rows
+        # name → (codes, distinct values); values[codes] is the column
+        self.dictionaries: Dict[str, Tuple["np.ndarray", List[str]]] = {}
+        self.numbers: Dict[str, "np.ndarray"] = {}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.dictionaries or name in self.numbers
+
+    def codes(self, name: str) -> Tuple["np.ndarray", List[str]]:
+        return self.dictionaries[name]
+
+    def text(self, name: str) -> List[str]:
+        """A text column decoded back into one string per row"""
+        codes, values = self.dictionaries[name]
+        return np.asarray(values, dtype=object)[codes].tolist()
+
+    def number(self, name: str) -> "np.ndarray":
+        return self.numbers[name]
+
+
+class ColumnReader:
+    """Iterates a report as ColumnBlocks of the requested columns, selected by header name
+
+    The header is read from the first line; requested columns missing from
+    it are left out of every block. Cells are located and gathered with
+    array operations, text columns are encoded with np.unique and measures
+    converted with a single astype, so there is no per-row Python work.
+    """
+
+    def __init__(self, stream: BinaryIO, text_columns: Iterable[str] = (), number_columns: Iterable[str] = (),
+                 block_size: int = DEFAULT_BLOCK_SIZE):
+        self._blocks = _blocks(stream, block_size)
+        first = next(self._blocks, b"")
+        header_line, _, self._first = first.partition(b"\n")
+        self.header = ([name.strip() for name in header_line.rstrip(b"\r").decode("utf-8-sig").split("\t")]
+                       if header_line else [])
+
+        positions = {name: index for index, name in enumerate(self.header)}
+        self._texts = [(name, positions[name]) for name in text_columns if name in positions]
+        self._numbers = [(name, positions[name]) for name in number_columns if name in positions]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.header
+
+    def _pending(self) -> Iterator[bytes]:
+        if self._first:
+            yield self._first
+        yield from self._blocks
+
+    def __iter__(self) -> Iterator[ColumnBlock]:
+        if not self.header:
+            return
+        for block in self._pending():
+            data, starts, ends = _fields(block, len(self.header))
+            if not len(starts):
+                continue
+
+            columns = ColumnBlock(len(starts))
+            for name, index in self._texts:
+                values, codes = np.unique(_column(data, starts[:, index], ends[:, index]), return_inverse=True)
+                columns.dictionaries[name] = (codes.reshape(-1),
+                                              [value.decode("utf-8") for value in values.tolist()])
+            for name, index in self._numbers:
+                columns.numbers[name] = to_numbers(_column(data, starts[:, index], ends[:, index]))
+            yield columns
+
+
+def group_sum(codes: "np.ndarray", values: List[str], weights: "np.ndarray") -> Dict[str, float]:
+    """Sum of weights per distinct value of a dictionary-encoded column"""
+    sums = np.bincount(codes, weights=weights, minlength=len(values))
+    return {value: float(total) for value, total in zip(values, sums.tolist())}
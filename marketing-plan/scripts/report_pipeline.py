@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Per-Category Report Ingestion Pipeline
+Gives each report category its own producer, bounded queue and workers so
+categories download, parse and load concurrently and fail independently
+"""
+
+import time
+import queue
+import threading
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional
+
+from analytics_ingest import SegmentIngestor
+from analytics_store import AnalyticsStore
+from sales_backfill import SalesReportBackfill
+
+# Report types the collectors request, mapped to the analytics report categories that carry
+# their metrics; SALES comes from salesReports instead of analytics reports
+REPORT_CATEGORIES = {
+    "APP_USAGE": ("APP_USAGE",),
+    "APP_DOWNLOADS": ("APP_STORE_COMMERCE", "APP_STORE_ENGAGEMENT"),
+    "SALES": ()
+}
+
+DEFAULT_WORKERS_PER_CATEGORY = 2
+DEFAULT_QUEUE_SIZE = 64
+
+_DONE = object()
+
+
+class CategoryPipeline:
+    """One category: a producer thread fills a bounded queue that the category's own workers drain
+
+    produce() yields work items, handle(item) processes one and returns the
+    rows it loaded (raising on failure) and finish() runs once the queue is
+    drained. Errors in any of them are recorded here and never reach other
+    categories.
+    """
+
+    def __init__(self, name: str, produce: Callable[[], Iterable], handle: Callable[[object], int],
+                 finish: Optional[Callable[[], Dict]] = None,
+                 workers: int = DEFAULT_WORKERS_PER_CATEGORY, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.name = name
+        self.produce = produce
+        self.handle = handle
+        self.finish = finish
+        self.workers = workers
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self.progress = {"state": "pending", "queued": 0, "done": 0, "failed": 0, "rows": 0, "seconds": 0.0}
+        self.errors: List[Dict] = []
+        self.result: Optional[Dict] = None
+        self._started = 0.0
+
+    def _set(self, **values):
+        with self._lock:
+            self.progress.update(values)
+
+    def _error(self, stage: str, error: Exception):
+        with self._lock:
+            self.errors.append({"error": f"{stage}_failed", "message": str(error),
+                                "type": type(error).__name__})
+
+    def _producer(self):
+        self._set(state="listing")
+        try:
+            for item in self.produce():
+                # Blocks while the workers are behind, bounding memory per category
+                self._queue.put(item)
+                with self._lock:
+                    self.progress["queued"] += 1
+                    self.progress["state"] = "downloading"
+        except Exception as e:
+            self._error("produce", e)
+        finally:
+            for _ in range(self.workers):
+                self._queue.put(_DONE)
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            try:
+                rows = self.handle(item)
+            except Exception as e:
+                self._error("item", e)
+                with self._lock:
+                    self.progress["failed"] += 1
+                continue
+            with self._lock:
+                self.progress["done"] += 1
+                self.progress["rows"] += rows or 0
+
+    def start(self):
+        self._started = time.monotonic()
+        self._threads = [threading.Thread(target=self._producer, name=f"{self.name}-producer", daemon=True)]
+        self._threads += [threading.Thread(target=self._worker, name=f"{self.name}-worker-{index}", daemon=True)
+                          for index in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def join(self) -> Dict:
+        """Wait for this category only, then run its finish step"""
+        for thread in self._threads:
+            thread.join()
+
+        if self.finish is not None:
+            self._set(state="finishing")
+            try:
+                self.result = self.finish()
+            except Exception as e:
+                self._error("finish", e)
+
+        with self._lock:
+            failed = bool(self.errors)
+            self.progress["state"] = "failed" if failed else "finished"
+            self.progress["seconds"] = round(time.monotonic() - self._started, 2)
+            return {"progress": dict(self.progress), "errors": list(self.errors), "result": self.result}
+
+
+class ReportIngestionPipeline:
+    """Runs every category pipeline at once and reports progress and outcome per category"""
+
+    def __init__(self):
+        self.categories: Dict[str, CategoryPipeline] = {}
+
+    def add(self, category: CategoryPipeline) -> CategoryPipeline:
+        self.categories[category.name] = category
+        return category
+
+    def progress(self) -> Dict[str, Dict]:
+        """Live snapshot of every category's progress"""
+        return {name: dict(category.progress) for name, category in self.categories.items()}
+
+    def run(self) -> Dict[str, Dict]:
+        for category in self.categories.values():
+            category.start()
+
+        results = {}
+        for name, category in self.categories.items():
+            # Each category finishes (and runs its finish step) as soon as its own queue is drained
+            results[name] = category.join()
+        return results
+
+
+def analytics_category(name: str, ingestor: SegmentIngestor, report_tree: Callable[[], Dict],
+                       report_categories: Iterable[str], report_names: Optional[Iterable[str]] = None,
+                       advance: bool = True, workers: int = DEFAULT_WORKERS_PER_CATEGORY) -> CategoryPipeline:
+    """Pipeline for the analytics report segments of some report categories, optionally some reports only
+
+    report_tree returns the walked report tree; it is called from the
+    category's producer, so a slow walk delays only the analytics categories.
+    """
+    report_categories = tuple(report_categories)
+    report_names = tuple(report_names) if report_names else None
+    replaying = ingestor.client.archive is not None and ingestor.client.archive.replaying
+
+    def instances() -> List[Dict]:
+        return [instance for instance in report_tree()["instances"]
+                if instance.get("category") in report_categories
+                and (report_names is None or instance.get("report_name") in report_names)]
+
+    def produce() -> Iterable[Dict]:
+        if replaying:
+            # Offline replay: use only what earlier live runs already stored
+            return []
+        return ingestor.segments_for(instances())
+
+    def handle(segment: Dict) -> int:
+        return ingestor.ingest_segment(segment, raise_errors=True)
+
+    def finish() -> Dict:
+        watermarks = {}
+        # A failed segment listing looks like an instance without segments; don't move past it
+        if advance and not replaying and not report_tree()["errors"]:
+            watermarks = ingestor.advance_watermarks(instances(), report_names)
+        return dict(ingestor.stats(), watermarks=watermarks)
+
+    return CategoryPipeline(name, produce, handle, finish, workers)
+
+
+def sales_category(backfill: SalesReportBackfill, store: AnalyticsStore, end: date, days_back: int,
+                   resume_from: Optional[Dict[str, str]] = None, advance: bool = True,
+                   workers: Optional[int] = None, name: str = "SALES") -> CategoryPipeline:
+    """Pipeline for incremental daily salesReports: one queue item per report day
+
+    Runs backfill.fetch_workers downloads at once (unless workers says
+    otherwise) and parses every body in one process pool shared for the
+    whole run, like SalesReportBackfill.run().
+    """
+    started = time.monotonic()
+    if resume_from is None:
+        resume_from = backfill.resume_points(store)
+    jobs = backfill.plan(end, days_back, resume_from=resume_from)
+    parse_pool = backfill.parse_pool(len(jobs))
+
+    def handle(job) -> int:
+        return backfill.ingest_job(job, store, parse_pool)
+
+    def finish() -> Dict:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+        return backfill.finish_incremental(end, days_back, store, jobs, resume_from=resume_from,
+                                           advance=advance, started=started)
+
+    workers = workers or max(1, min(backfill.fetch_workers, len(jobs)))
+    return CategoryPipeline(name, lambda: jobs, handle, finish, workers)
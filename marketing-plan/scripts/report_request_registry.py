@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Analytics Report Request Registry
+Keeps the app's existing analyticsReportRequests, synced from one listing, so
+a request is only POSTed when no active one of that access type exists
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+from appstore_client import AppStoreConnectClient, AppStoreConnectError, MAX_PAGE_SIZE, with_query_param
+from appstore_query import analytics_report_requests_query
+
+ACCESS_ONGOING = "ONGOING"
+ACCESS_ONE_TIME_SNAPSHOT = "ONE_TIME_SNAPSHOT"
+
+
+def report_request_body(app_id: str, access_type: str = ACCESS_ONGOING) -> Dict:
+    """POST /v1/analyticsReportRequests body"""
+    return {
+        "data": {
+            "type": "analyticsReportRequests",
+            "attributes": {
+                "accessType": access_type
+            },
+            "relationships": {
+                "app": {
+                    "data": {
+                        "type": "apps",
+                        "id": app_id
+                    }
+                }
+            }
+        }
+    }
+
+
+class ReportRequestRegistry:
+    """Existing report requests for one app; ensure() creates one only when it is really missing
+
+    App Store Connect allows one active request per access type, and every
+    report category is generated from it, so a steady-state run issues no POST.
+    """
+
+    def __init__(self, client: AppStoreConnectClient, app_id: str):
+        self.client = client
+        self.app_id = app_id
+        # Same query as the report listing collectors, so the sync GET is coalesced and HTTP-cached with it
+        self.endpoint = analytics_report_requests_query(app_id)
+
+        self._lock = threading.RLock()
+        self._requests: Optional[List[Dict]] = None
+        self.counters = {"syncs": 0, "created": 0, "reused": 0}
+
+    def _node(self, resource: Dict) -> Dict:
+        attributes = resource.get("attributes") or {}
+        return {
+            "id": resource["id"],
+            "access_type": attributes.get("accessType"),
+            "stopped_due_to_inactivity": bool(attributes.get("stoppedDueToInactivity"))
+        }
+
+    def sync(self, force: bool = False) -> List[Dict]:
+        """Load the app's report requests with one listing; force bypasses the run and HTTP caches"""
+        with self._lock:
+            if self._requests is not None and not force:
+                return self._requests
+
+            self.counters["syncs"] += 1
+            if force:
+                self._invalidate_listing()
+                resources = list(self.client.paginate(self.endpoint))
+            else:
+                listing = self.client.get_all(self.endpoint)
+                if "error" in listing:
+                    raise AppStoreConnectError(listing["error"], listing.get("message", ""), self.endpoint)
+                resources = listing.get("data", [])
+
+            self._requests = [self._node(resource) for resource in resources]
+            return self._requests
+
+    def reset(self):
+        """Drop the loaded requests so the next lookup lists them again, e.g. at the start of each run"""
+        with self._lock:
+            self._requests = None
+
+    def _invalidate_listing(self):
+        """Forget the cached listing after a write, so the next run sees the new request"""
+        if self.client.http_cache is not None:
+            self.client.http_cache.invalidate(
+                self.client.url_for(with_query_param(self.endpoint, "limit", MAX_PAGE_SIZE)))
+
+    def find(self, access_type: str = ACCESS_ONGOING) -> Optional[Dict]:
+        """Active request of an access type, or None; requests stopped for inactivity don't count"""
+        for request in self.sync():
+            if request["access_type"] == access_type and not request["stopped_due_to_inactivity"]:
+                return request
+        return None
+
+    def ensure(self, access_type: str = ACCESS_ONGOING) -> Dict:
+        """{"status": "existing" | "created", "request": {...}} or an error payload"""
+        with self._lock:
+            try:
+                existing = self.find(access_type)
+                if existing is not None:
+                    self.counters["reused"] += 1
+                    return {"status": "existing", "request": existing}
+
+                created = self.client.request("/v1/analyticsReportRequests", "POST",
+                                              report_request_body(self.app_id, access_type))
+                if "error" not in created:
+                    node = self._node(created["data"])
+                    self._requests.append(node)
+                    self._invalidate_listing()
+                    self.counters["created"] += 1
+                    return {"status": "created", "request": node}
+
+                if created.get("error") != 409:
+                    return created
+
+                # Created elsewhere since the listing was cached; re-read it from the API
+                existing = next((request for request in self.sync(force=True)
+                                 if request["access_type"] == access_type
+                                 and not request["stopped_due_to_inactivity"]), None)
+                if existing is None:
+                    return created
+                self.counters["reused"] += 1
+                return {"status": "existing", "request": existing}
+            except AppStoreConnectError as e:
+                return e.to_dict()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.counters, known_requests=len(self._requests or []))
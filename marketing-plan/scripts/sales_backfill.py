@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Sales Report Backfill
+Fetches one salesReports file per period and report type under bounded
+concurrency and parses the gzipped TSV bodies in a process pool
+"""
+
+import os
+import csv
+import gzip
+import time
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from analytics_store import DEFAULT_LATE_DAYS, AnalyticsStore, sales_watermark_key
+from appstore_client import AppStoreConnectClient, AppStoreConnectError
+from appstore_query import sales_reports_query
+from appstore_rate_limit import PRIORITY_CRITICAL
+from report_columns import NUMPY_AVAILABLE, ColumnReader, group_sum, np, open_report
+
+# reportType → (reportSubType, version) accepted by /v1/salesReports
+SALES_REPORT_TYPES = {
+    "SALES": ("SUMMARY", "1_0"),
+    "SUBSCRIPTION": ("SUMMARY", "1_3"),
+    "SUBSCRIPTION_EVENT": ("SUMMARY", "1_3"),
+    "SUBSCRIBER": ("DETAILED", "1_3")
+}
+
+# Columns summed per report type
+REPORT_MEASURES = {
+    "SALES": ("Units",),
+    "SUBSCRIPTION": ("Active Standard Price Subscriptions",
+                     "Active Free Trial Introductory Offer Subscriptions",
+                     "Active Pay Up Front Introductory Offer Subscriptions",
+                     "Active Pay As You Go Introductory Offer Subscriptions"),
+    "SUBSCRIPTION_EVENT": ("Quantity",),
+    "SUBSCRIBER": ("Units",)
+}
+
+PROCEEDS_COLUMN = "Developer Proceeds"
+PROCEEDS_CURRENCY_COLUMNS = ("Currency of Proceeds", "Proceeds Currency")
+TERRITORY_COLUMNS = ("Country Code", "Country")
+PRODUCT_TYPE_COLUMN = "Product Type Identifier"
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Concurrent salesReports requests; the rate limiter still paces them
+DEFAULT_FETCH_WORKERS = 8
+
+
+def report_dates(frequency: str, end: date, days_back: int) -> List[str]:
+    """filter[reportDate] values covering the days_back days before end, newest first"""
+    days = [end - timedelta(days=offset) for offset in range(1, days_back + 1)]
+
+    if frequency == "DAILY":
+        return [day.isoformat() for day in days]
+
+    if frequency == "WEEKLY":
+        # Weekly reports are identified by the Sunday that ends the week
+        sundays = {day + timedelta(days=6 - day.weekday()) for day in days}
+        return [sunday.isoformat() for sunday in sorted(sundays, reverse=True) if sunday < end]
+
+    if frequency == "MONTHLY":
+        months = sorted({(day.year, day.month) for day in days}, reverse=True)
+        return [f"{year}-{month:02d}" for year, month in months
+                if (year, month) != (end.year, end.month)]
+
+    if frequency == "YEARLY":
+        return [str(year) for year in sorted({day.year for day in days}, reverse=True)
+                if year != end.year]
+
+    raise ValueError(f"Unknown sales report frequency {frequency!r}")
+
+
+def _number(value: str) -> float:
+    value = value.strip().replace(",", "")
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def _first_column(index: Dict[str, int], names: Tuple[str, ...]) -> Optional[int]:
+    for name in names:
+        if name in index:
+            return index[name]
+    return None
+
+
+def parse_sales_report(body: bytes, report_type: str = "SALES") -> Dict:
+    """Summary of one report body: row count, measure totals, proceeds per currency and units per territory
+
+    Runs in a worker process, so it takes and returns only plain data.
+    """
+    if NUMPY_AVAILABLE:
+        return _parse_sales_columns(body, report_type)
+    return _parse_sales_rows(body, report_type)
+
+
+def _add(target: Dict[str, float], sums: Dict[str, float]):
+    for key, value in sums.items():
+        target[key] = target.get(key, 0.0) + value
+
+
+def _parse_sales_columns(body: bytes, report_type: str) -> Dict:
+    """parse_sales_report over NumPy column blocks: one vectorized sum or bincount per measure and block"""
+    measure_names = REPORT_MEASURES.get(report_type, ())
+    with open_report(body) as f:
+        reader = ColumnReader(f, PROCEEDS_CURRENCY_COLUMNS + TERRITORY_COLUMNS + (PRODUCT_TYPE_COLUMN,),
+                              measure_names + ("Units", PROCEEDS_COLUMN))
+        currency_column = next((name for name in PROCEEDS_CURRENCY_COLUMNS if name in reader), None)
+        territory_column = next((name for name in TERRITORY_COLUMNS if name in reader), None)
+
+        summary = {"rows": 0, "totals": {}, "proceeds": {}, "units_by_territory": {}, "units_by_product_type": {}}
+        totals = {name: 0.0 for name in measure_names if name in reader}
+        proceeds: Dict[str, float] = {}
+        by_territory: Dict[str, float] = {}
+        by_product_type: Dict[str, float] = {}
+
+        for block in reader:
+            summary["rows"] += len(block)
+            for name in totals:
+                totals[name] += float(np.nansum(block.number(name)))
+
+            units = np.nan_to_num(block.number("Units")) if "Units" in block else np.ones(len(block))
+            if PROCEEDS_COLUMN in block:
+                amounts = units * np.nan_to_num(block.number(PROCEEDS_COLUMN))
+                if currency_column is not None:
+                    _add(proceeds, group_sum(*block.codes(currency_column), amounts))
+                else:
+                    _add(proceeds, {"USD": float(amounts.sum())})
+            if territory_column is not None:
+                _add(by_territory, group_sum(*block.codes(territory_column), units))
+            if PRODUCT_TYPE_COLUMN in block:
+                _add(by_product_type, group_sum(*block.codes(PRODUCT_TYPE_COLUMN), units))
+
+    summary["totals"] = {name: round(value, 2) for name, value in totals.items()}
+    summary["proceeds"] = {currency: round(value, 2) for currency, value in proceeds.items()}
+    summary["units_by_territory"] = {key: round(value, 2) for key, value in by_territory.items()}
+    summary["units_by_product_type"] = {key: round(value, 2) for key, value in by_product_type.items()}
+    return summary
+
+
+def _parse_sales_rows(body: bytes, report_type: str) -> Dict:
+    """parse_sales_report with the csv module, one row at a time"""
+    if body[:2] == GZIP_MAGIC:
+        body = gzip.decompress(body)
+    lines = body.decode("utf-8-sig").splitlines()
+
+    summary = {"rows": 0, "totals": {}, "proceeds": {}, "units_by_territory": {}, "units_by_product_type": {}}
+    reader = csv.reader(lines, delimiter="\t", quoting=csv.QUOTE_NONE)
+    header = next(reader, None)
+    if not header:
+        return summary
+
+    index = {name.strip(): position for position, name in enumerate(header)}
+    measures = [(name, index[name]) for name in REPORT_MEASURES.get(report_type, ()) if name in index]
+    units_column = index.get("Units")
+    proceeds_column = index.get(PROCEEDS_COLUMN)
+    currency_column = _first_column(index, PROCEEDS_CURRENCY_COLUMNS)
+    territory_column = _first_column(index, TERRITORY_COLUMNS)
+    product_type_column = index.get(PRODUCT_TYPE_COLUMN)
+
+    totals = {name: 0.0 for name, _ in measures}
+    proceeds: Dict[str, float] = {}
+    by_territory: Dict[str, float] = {}
+    by_product_type: Dict[str, float] = {}
+
+    for cells in reader:
+        if len(cells) < len(header):
+            # Trailing "Total_Rows" style footers and blank lines
+            continue
+        summary["rows"] += 1
+
+        for name, position in measures:
+            totals[name] += _number(cells[position])
+
+        units = _number(cells[units_column]) if units_column is not None else 1.0
+        if proceeds_column is not None:
+            currency = cells[currency_column] if currency_column is not None else "USD"
+            proceeds[currency] = proceeds.get(currency, 0.0) + units * _number(cells[proceeds_column])
+        if territory_column is not None:
+            territory = cells[territory_column]
+            by_territory[territory] = by_territory.get(territory, 0.0) + units
+        if product_type_column is not None:
+            product_type = cells[product_type_column]
+            by_product_type[product_type] = by_product_type.get(product_type, 0.0) + units
+
+    summary["totals"] = {name: round(value, 2) for name, value in totals.items()}
+    summary["proceeds"] = {currency: round(value, 2) for currency, value in proceeds.items()}
+    summary["units_by_territory"] = {key: round(value, 2) for key, value in by_territory.items()}
+    summary["units_by_product_type"] = {key: round(value, 2) for key, value in by_product_type.items()}
+    return summary
+
+
+def merge_summaries(summaries: Iterable[Dict]) -> Dict:
+    """Add up per-period summaries of one report type"""
+    merged = {"rows": 0, "totals": {}, "proceeds": {}, "units_by_territory": {}, "units_by_product_type": {}}
+    for summary in summaries:
+        merged["rows"] += summary["rows"]
+        for key in ("totals", "proceeds", "units_by_territory", "units_by_product_type"):
+            target = merged[key]
+            for name, value in summary[key].items():
+                target[name] = round(target.get(name, 0.0) + value, 2)
+    return merged
+
+
+class SalesReportBackfill:
+    """Fans out one salesReports request per (report type, frequency, period) and parses the bodies in parallel"""
+
+    def __init__(self, client: AppStoreConnectClient, vendor_number: str,
+                 fetch_workers: int = DEFAULT_FETCH_WORKERS, parse_processes: Optional[int] = None):
+        self.client = client
+        self.vendor_number = vendor_number
+        self.fetch_workers = fetch_workers
+        # 0 parses in the fetching threads instead of a process pool
+        self.parse_processes = (os.cpu_count() or 1) if parse_processes is None else parse_processes
+
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "reports": 0, "no_data": 0, "bytes": 0}
+        self.errors: List[Dict] = []
+        self.reports: List[Dict] = []
+        self._failed = set()
+
+    def plan(self, end: date, days_back: int, report_types: Iterable[str] = ("SALES",),
+             frequencies: Iterable[str] = ("DAILY",),
+             resume_from: Optional[Dict[str, str]] = None) -> List[Tuple[str, str, str]]:
+        """(report type, frequency, report date) for every report the backfill requests
+
+        resume_from maps sales_watermark_key() to the first report date to
+        fetch; earlier periods of that report type and frequency are skipped.
+        """
+        resume_from = resume_from or {}
+        jobs = []
+        frequencies = list(frequencies)
+        for report_type in report_types:
+            if report_type not in SALES_REPORT_TYPES:
+                raise ValueError(f"Unknown sales report type {report_type!r}")
+            for frequency in frequencies:
+                # Subscriber reports only exist per day
+                if report_type == "SUBSCRIBER" and frequency != "DAILY":
+                    continue
+                resume = resume_from.get(sales_watermark_key(report_type, frequency))
+                jobs.extend((report_type, frequency, report_date)
+                            for report_date in report_dates(frequency, end, days_back)
+                            if resume is None or report_date >= resume)
+        return jobs
+
+    def fetch(self, report_type: str, frequency: str, report_date: str) -> Optional[bytes]:
+        """Raw body of one report, or None when Apple has no report for that period
+
+        Raises AppStoreConnectError for any other failure.
+        """
+        report_subtype, version = SALES_REPORT_TYPES[report_type]
+        endpoint = sales_reports_query(self.vendor_number, report_date, frequency,
+                                       report_type, report_subtype, version)
+        with self._lock:
+            self.counters["requests"] += 1
+
+        try:
+            response = self.client.send("GET", endpoint, headers={"Accept": "application/a-gzip"},
+                                        priority=PRIORITY_CRITICAL)
+        except AppStoreConnectError as e:
+            if e.status_code != 404:
+                raise
+            # No sales that day, or the report is not published yet
+            with self._lock:
+                self.counters["no_data"] += 1
+            return None
+
+        body = response.content
+        with self._lock:
+            self.counters["bytes"] += len(body)
+        return body
+
+    def _record_failure(self, job: Tuple[str, str, str], error: Dict):
+        report_type, _, report_date = job
+        with self._lock:
+            self.errors.append(dict(error, report_type=report_type, report_date=report_date))
+            self._failed.add(job)
+
+    def _record_report(self, job: Tuple[str, str, str], summary: Dict) -> Dict:
+        report_type, frequency, report_date = job
+        report = dict(summary, report_type=report_type, frequency=frequency, report_date=report_date)
+        with self._lock:
+            self.reports.append(report)
+            self.counters["reports"] += 1
+        return report
+
+    def parse_pool(self, jobs: int) -> Optional[ProcessPoolExecutor]:
+        """Process pool for parsing up to jobs report bodies, or None to parse in the calling thread"""
+        if self.parse_processes <= 0 or not jobs:
+            return None
+        # spawn: forking a process that is running fetch threads is unsafe
+        return ProcessPoolExecutor(max_workers=min(self.parse_processes, jobs),
+                                   mp_context=multiprocessing.get_context("spawn"))
+
+    def ingest_job(self, job: Tuple[str, str, str], store: AnalyticsStore,
+                   parse_pool: Optional[ProcessPoolExecutor] = None) -> int:
+        """Fetch, parse and store one period; returns the parsed row count
+
+        Used by the per-category ingestion pipeline. The body is parsed in
+        parse_pool when one is given, otherwise in the calling thread.
+        Failures are recorded for the watermark and re-raised.
+        """
+        try:
+            body = self.fetch(*job)
+            if body is None:
+                return 0
+            if parse_pool is not None:
+                summary = parse_pool.submit(parse_sales_report, body, job[0]).result()
+            else:
+                summary = parse_sales_report(body, job[0])
+        except AppStoreConnectError as e:
+            self._record_failure(job, e.to_dict())
+            raise
+        except (OSError, ValueError, EOFError, csv.Error, BrokenProcessPool) as e:
+            self._record_failure(job, {"error": "report_parse_failed", "message": str(e)})
+            raise
+
+        store.write_sales_reports([self._record_report(job, summary)])
+        return summary["rows"]
+
+    def complete_through(self, jobs: List[Tuple[str, str, str]], reports: List[Dict]) -> Dict[str, str]:
+        """Newest report date per watermark key with no failed period before it"""
+        fetched = {(report["report_type"], report["frequency"], report["report_date"]) for report in reports}
+        marks: Dict[str, str] = {}
+        blocked = set()
+        for report_type, frequency, report_date in sorted(jobs):
+            key = sales_watermark_key(report_type, frequency)
+            if key in blocked:
+                continue
+            if (report_type, frequency, report_date) in self._failed:
+                # Never move past a period that has to be fetched again
+                blocked.add(key)
+            elif (report_type, frequency, report_date) in fetched:
+                marks[key] = report_date
+        return marks
+
+    def run(self, end: date, days_back: int, report_types: Iterable[str] = ("SALES",),
+            frequencies: Iterable[str] = ("DAILY",),
+            resume_from: Optional[Dict[str, str]] = None) -> Dict:
+        """Fetch and parse every planned report, returning per-period summaries and totals"""
+        started = time.monotonic()
+        jobs = self.plan(end, days_back, report_types, frequencies, resume_from)
+        parsed: Dict[Tuple[str, str, str], Future] = {}
+
+        parse_pool = self.parse_pool(len(jobs))
+
+        def fetch_and_submit(job: Tuple[str, str, str]):
+            try:
+                body = self.fetch(*job)
+            except AppStoreConnectError as e:
+                self._record_failure(job, e.to_dict())
+                return
+            if body is None:
+                return
+            if parse_pool is not None:
+                # Hand the body to a worker process and move on to the next download
+                parsed[job] = parse_pool.submit(parse_sales_report, body, job[0])
+            else:
+                future = Future()
+                future.set_result(parse_sales_report(body, job[0]))
+                parsed[job] = future
+
+        try:
+            if jobs:
+                with ThreadPoolExecutor(max_workers=min(self.fetch_workers, len(jobs))) as fetchers:
+                    list(fetchers.map(fetch_and_submit, jobs))
+
+            reports = []
+            for job in jobs:
+                if job not in parsed:
+                    continue
+                try:
+                    summary = parsed[job].result()
+                except (OSError, ValueError, EOFError, csv.Error, BrokenProcessPool) as e:
+                    self._record_failure(job, {"error": "report_parse_failed", "message": str(e)})
+                    continue
+                reports.append(self._record_report(job, summary))
+        finally:
+            if parse_pool is not None:
+                parse_pool.shutdown()
+
+        totals = {
+            (report_type, frequency): merge_summaries(report for report in reports
+                                                      if report["report_type"] == report_type
+                                                      and report["frequency"] == frequency)
+            for report_type, frequency, _ in jobs
+        }
+        return self._result(end, days_back, reports,
+                            [dict(summary, report_type=report_type, frequency=frequency)
+                             for (report_type, frequency), summary in totals.items()],
+                            jobs, resume_from, started)
+
+    def _result(self, end: date, days_back: int, reports: List[Dict], totals: List[Dict],
+                jobs: List[Tuple[str, str, str]], resume_from: Optional[Dict[str, str]],
+                started: float) -> Dict:
+        with self._lock:
+            return {
+                "start_date": (end - timedelta(days=days_back)).isoformat(),
+                "end_date": (end - timedelta(days=1)).isoformat(),
+                "reports": reports,
+                "totals": totals,
+                "resume_from": dict(resume_from or {}),
+                "complete_through": self.complete_through(jobs, self.reports),
+                "counters": dict(self.counters),
+                "errors": list(self.errors),
+                "seconds": round(time.monotonic() - started, 2),
+                "collection_timestamp": datetime.now().isoformat()
+            }
+
+    def resume_points(self, store: AnalyticsStore, report_types: Iterable[str] = ("SALES",),
+                      frequencies: Iterable[str] = ("DAILY",),
+                      late_days: int = DEFAULT_LATE_DAYS) -> Dict[str, str]:
+        """Stored watermarks, minus the late-data window, as a plan() resume_from"""
+        frequencies = list(frequencies)
+        return store.resume_dates((sales_watermark_key(report_type, frequency)
+                                   for report_type in report_types for frequency in frequencies), late_days)
+
+    def finish_incremental(self, end: date, days_back: int, store: AnalyticsStore,
+                           jobs: List[Tuple[str, str, str]],
+                           report_types: Iterable[str] = ("SALES",),
+                           frequencies: Iterable[str] = ("DAILY",),
+                           resume_from: Optional[Dict[str, str]] = None,
+                           advance: bool = True, started: Optional[float] = None) -> Dict:
+        """Advance watermarks past the fetched periods and answer for the whole window from the store"""
+        report_types = list(report_types)
+        frequencies = list(frequencies)
+        if advance:
+            for key, report_date in self.complete_through(jobs, self.reports).items():
+                store.advance_watermark(key, report_date)
+
+        reports, totals = [], []
+        windows = {(report_type, frequency) for report_type, frequency, _ in
+                   self.plan(end, days_back, report_types, frequencies)}
+        for report_type, frequency in sorted(windows):
+            dates = report_dates(frequency, end, days_back)
+            stored = store.sales_reports(report_type, frequency, min(dates), max(dates))
+            reports.extend(stored)
+            totals.append(dict(merge_summaries(stored), report_type=report_type, frequency=frequency))
+
+        result = self._result(end, days_back, reports, totals, jobs, resume_from,
+                              started if started is not None else time.monotonic())
+        result["fetched_reports"] = len(self.reports)
+        return result
+
+    def run_incremental(self, end: date, days_back: int, store: AnalyticsStore,
+                        report_types: Iterable[str] = ("SALES",),
+                        frequencies: Iterable[str] = ("DAILY",),
+                        late_days: int = DEFAULT_LATE_DAYS,
+                        resume_from: Optional[Dict[str, str]] = None,
+                        advance: bool = True) -> Dict:
+        """Fetch only periods after each stored watermark (minus the late-data window)
+
+        Summaries are saved to the store and the returned reports and totals
+        cover the whole window, including periods fetched by earlier runs.
+        Pass resume_from to override the stored watermarks (e.g. when
+        replaying a recorded run) and advance=False to leave them unchanged.
+        """
+        started = time.monotonic()
+        report_types = list(report_types)
+        frequencies = list(frequencies)
+        if resume_from is None:
+            resume_from = self.resume_points(store, report_types, frequencies, late_days)
+
+        result = self.run(end, days_back, report_types, frequencies, resume_from)
+        store.write_sales_reports(result["reports"])
+        jobs = self.plan(end, days_back, report_types, frequencies, resume_from)
+        return self.finish_incremental(end, days_back, store, jobs, report_types, frequencies,
+                                       resume_from, advance, started)
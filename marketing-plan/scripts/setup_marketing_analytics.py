@@ -42,7 +42,9 @@ class MarketingAnalyticsSetup:
             'marketing_dashboard.py', 
             'automated_marketing_collector.py',
             'magical_stories_analytics.py',
-            'appstore_auth_test.py'
+            'appstore_auth_test.py',
+            'appstore_client.py',
+            'appstore_token.py'
         ]
         
     def log_message(self, message: str, level: str = "INFO"):
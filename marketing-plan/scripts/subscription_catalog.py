@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Subscription Catalog Cache
+Subscription groups, subscriptions and their price points per territory,
+kept on disk between runs, refreshed only when stale and indexed in memory
+so revenue code looks prices up without API calls
+"""
+
+import os
+import json
+import time
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from appstore_client import AppStoreConnectClient, AppStoreConnectError
+from appstore_http_cache import APPSTORE_DATA_DIR
+from appstore_query import subscription_groups_query, subscription_prices_query
+
+DEFAULT_CATALOG_PATH = APPSTORE_DATA_DIR / "subscription_catalog.json"
+
+# Seconds before the group listing, and each subscription's prices, are fetched again
+DEFAULT_GROUPS_TTL = 6 * 3600
+DEFAULT_PRICE_TTL = 24 * 3600
+
+# subscriptionPeriod → months, to normalize proceeds to a monthly amount
+SUBSCRIPTION_PERIOD_MONTHS = {
+    "ONE_WEEK": 12 / 52,
+    "ONE_MONTH": 1,
+    "TWO_MONTHS": 2,
+    "THREE_MONTHS": 3,
+    "SIX_MONTHS": 6,
+    "ONE_YEAR": 12
+}
+
+
+def _amount(value) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _linkage(resource: Dict, name: str):
+    data = ((resource.get("relationships") or {}).get(name) or {}).get("data")
+    if isinstance(data, list):
+        return [ref["id"] for ref in data]
+    return data["id"] if isinstance(data, dict) else None
+
+
+class SubscriptionCatalog:
+    """On-disk catalog of an app's subscriptions with O(1) price lookups by (product id, territory)
+
+    refresh() re-lists the groups once their TTL has passed and re-fetches
+    prices only for subscriptions that are new or whose prices are older
+    than price_ttl. Scheduled price changes are already in the cached price
+    history, so they take effect by re-indexing, without an API call.
+    """
+
+    def __init__(self, client: AppStoreConnectClient, app_id: str, path: Path = DEFAULT_CATALOG_PATH,
+                 groups_ttl: int = DEFAULT_GROUPS_TTL, price_ttl: int = DEFAULT_PRICE_TTL, max_workers: int = 4):
+        self.client = client
+        self.app_id = app_id
+        self.path = Path(path)
+        self.groups_ttl = groups_ttl
+        self.price_ttl = price_ttl
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+        self._data = self._load()
+        self._index(date.today())
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"groups_refreshed_at": 0, "groups": {}, "subscriptions": {}}
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def _index(self, today: date):
+        """Rebuild the lookup tables as of today; readers keep using the old ones until they are swapped in"""
+        by_product: Dict[str, Dict] = {}
+        history: Dict[Tuple[str, str], Tuple[List[str], List[Dict]]] = {}
+        current: Dict[Tuple[str, str], Dict] = {}
+        territories: Dict[str, List[str]] = {}
+        as_of = today.isoformat()
+
+        for subscription in self._data["subscriptions"].values():
+            product_id = subscription.get("product_id")
+            if not product_id:
+                continue
+            by_product[product_id] = subscription
+
+            by_territory: Dict[str, List[Dict]] = {}
+            for price in subscription.get("prices", []):
+                # Preserved prices only apply to existing subscribers; index the list price
+                if not price.get("preserved"):
+                    by_territory.setdefault(price["territory"], []).append(price)
+            for territory, prices in by_territory.items():
+                # A price without a start date has applied since the subscription went on sale
+                prices.sort(key=lambda price: price.get("start_date") or "")
+                starts = [price.get("start_date") or "" for price in prices]
+                history[(product_id, territory)] = (starts, prices)
+                position = bisect_right(starts, as_of) - 1
+                if position >= 0:
+                    current[(product_id, territory)] = prices[position]
+                    territories.setdefault(product_id, []).append(territory)
+
+        self._by_product, self._history, self._current = by_product, history, current
+        self._territories = {product_id: sorted(codes) for product_id, codes in territories.items()}
+
+    def _fetch_groups(self) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+        groups, subscriptions = {}, {}
+        for page in self.client.iter_pages(subscription_groups_query(self.app_id)):
+            for resource in page.get("included") or []:
+                if resource.get("type") == "subscriptions":
+                    attributes = resource.get("attributes") or {}
+                    subscriptions[resource["id"]] = {
+                        "id": resource["id"],
+                        "name": attributes.get("name"),
+                        "product_id": attributes.get("productId"),
+                        "state": attributes.get("state"),
+                        "subscription_period": attributes.get("subscriptionPeriod"),
+                        "group_level": attributes.get("groupLevel")
+                    }
+            for resource in page.get("data") or []:
+                groups[resource["id"]] = {
+                    "id": resource["id"],
+                    "reference_name": (resource.get("attributes") or {}).get("referenceName"),
+                    "subscriptions": _linkage(resource, "subscriptions") or []
+                }
+
+        for group in groups.values():
+            for subscription_id in group["subscriptions"]:
+                if subscription_id in subscriptions:
+                    subscriptions[subscription_id]["group_id"] = group["id"]
+        return groups, subscriptions
+
+    def _fetch_prices(self, subscription_id: str) -> List[Dict]:
+        prices = []
+        for page in self.client.iter_pages(subscription_prices_query(subscription_id)):
+            included = {(resource.get("type"), resource["id"]): resource.get("attributes") or {}
+                        for resource in page.get("included") or []}
+            for resource in page.get("data") or []:
+                attributes = resource.get("attributes") or {}
+                territory = _linkage(resource, "territory")
+                point = included.get(("subscriptionPricePoints", _linkage(resource, "subscriptionPricePoint")), {})
+                prices.append({
+                    "territory": territory,
+                    "currency": included.get(("territories", territory), {}).get("currency"),
+                    "customer_price": _amount(point.get("customerPrice")),
+                    "proceeds": _amount(point.get("proceeds")),
+                    "proceeds_year2": _amount(point.get("proceedsYear2")),
+                    "start_date": attributes.get("startDate"),
+                    "preserved": attributes.get("preserved")
+                })
+        return prices
+
+    def stale_subscriptions(self, force: bool = False) -> List[str]:
+        """Subscriptions whose prices were never fetched or are older than price_ttl"""
+        now = time.time()
+        return sorted(subscription_id for subscription_id, subscription in self._data["subscriptions"].items()
+                      if force or now - subscription.get("prices_refreshed_at", 0) >= self.price_ttl)
+
+    def refresh(self, today: Optional[date] = None, force: bool = False, replay: Optional[Dict] = None) -> Dict:
+        """Bring stale parts of the catalog up to date and re-index it as of today
+
+        replay is the "refreshed" entry of an earlier result; it repeats
+        exactly those fetches instead of deciding from the cache's age.
+        """
+        today = today or date.today()
+        counters = {"groups_fetched": 0, "prices_fetched": 0}
+        errors: List[Dict] = []
+
+        with self._lock:
+            if replay is not None:
+                refresh_groups = bool(replay.get("groups"))
+            else:
+                refresh_groups = (force or not self._data["groups"]
+                                  or time.time() - self._data.get("groups_refreshed_at", 0) >= self.groups_ttl)
+
+            if refresh_groups:
+                try:
+                    groups, subscriptions = self._fetch_groups()
+                except (AppStoreConnectError, ValueError) as e:
+                    errors.append(e.to_dict() if isinstance(e, AppStoreConnectError)
+                                  else {"error": "invalid_json", "message": str(e)})
+                    refresh_groups = False
+                else:
+                    # Keep the cached prices of subscriptions that still exist
+                    for subscription_id, subscription in subscriptions.items():
+                        cached = self._data["subscriptions"].get(subscription_id, {})
+                        subscription["prices"] = cached.get("prices", [])
+                        subscription["prices_refreshed_at"] = cached.get("prices_refreshed_at", 0)
+                    self._data.update(groups=groups, subscriptions=subscriptions, groups_refreshed_at=time.time())
+                    counters["groups_fetched"] = len(groups)
+
+            if replay is not None:
+                targets = [subscription_id for subscription_id in replay.get("subscriptions", [])
+                           if subscription_id in self._data["subscriptions"]]
+            else:
+                targets = self.stale_subscriptions(force)
+
+            def fetch(subscription_id: str):
+                try:
+                    return subscription_id, self._fetch_prices(subscription_id), None
+                except AppStoreConnectError as e:
+                    return subscription_id, None, dict(e.to_dict(), subscription=subscription_id)
+                except ValueError as e:
+                    return subscription_id, None, {"error": "invalid_json", "message": str(e),
+                                                   "subscription": subscription_id}
+
+            fetched = []
+            if targets:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(targets))) as executor:
+                    for subscription_id, prices, error in executor.map(fetch, targets):
+                        if error is not None:
+                            errors.append(error)
+                            continue
+                        subscription = self._data["subscriptions"][subscription_id]
+                        subscription["prices"] = prices
+                        subscription["prices_refreshed_at"] = time.time()
+                        fetched.append(subscription_id)
+                counters["prices_fetched"] = len(fetched)
+
+            if refresh_groups or fetched:
+                self._save()
+            self._index(today)
+
+            return dict(counters, subscriptions=len(self._data["subscriptions"]), prices=len(self._current),
+                        errors=errors, refreshed={"groups": refresh_groups, "subscriptions": fetched})
+
+    def subscription(self, product_id: str) -> Optional[Dict]:
+        return self._by_product.get(product_id)
+
+    def price(self, product_id: str, territory: str, on: Optional[str] = None) -> Optional[Dict]:
+        """Price in effect for a product in a territory (e.g. "USA"), today or on an ISO date"""
+        if on is None:
+            return self._current.get((product_id, territory))
+        history = self._history.get((product_id, territory))
+        if history is None:
+            return None
+        starts, prices = history
+        position = bisect_right(starts, on) - 1
+        return prices[position] if position >= 0 else None
+
+    def monthly_proceeds(self, product_id: str, territory: str, on: Optional[str] = None) -> Optional[float]:
+        """Developer proceeds of one subscriber per month, from the price and subscription period"""
+        price = self.price(product_id, territory, on)
+        subscription = self._by_product.get(product_id)
+        months = SUBSCRIPTION_PERIOD_MONTHS.get((subscription or {}).get("subscription_period"))
+        if price is None or price["proceeds"] is None or not months:
+            return None
+        return round(price["proceeds"] / months, 2)
+
+    def territories(self, product_id: str) -> List[str]:
+        """Territories where the product currently has a price"""
+        return self._territories.get(product_id, [])
+
+    def groups(self, territories: Iterable[str] = ()) -> List[Dict]:
+        """Groups with their subscriptions and, for the given territories, current prices"""
+        territories = list(territories)
+        result = []
+        for group in self._data["groups"].values():
+            subscriptions = []
+            for subscription_id in group["subscriptions"]:
+                subscription = self._data["subscriptions"].get(subscription_id)
+                if subscription is None:
+                    continue
+                product_id = subscription.get("product_id")
+                summary = {key: value for key, value in subscription.items()
+                           if key not in ("prices", "prices_refreshed_at")}
+                summary["territories"] = len(self.territories(product_id))
+                summary["prices"] = {territory: self._current[(product_id, territory)] for territory in territories
+                                     if (product_id, territory) in self._current}
+                subscriptions.append(summary)
+            result.append(dict(group, subscriptions=subscriptions))
+        return result
@@ -0,0 +1,46 @@
+import unittest
+
+from analytics_ingest import SegmentIngestor
+
+
+def instance(instance_id: str, report_name: str, processing_date: str) -> dict:
+    return {"id": instance_id, "report_name": report_name, "processing_date": processing_date, "segments": []}
+
+
+class CompleteThroughTest(unittest.TestCase):
+    def setUp(self):
+        # complete_through only reads the instances and the ingestor's failures
+        self.ingestor = SegmentIngestor(client=None, store=None)
+        self.instances = [
+            instance("d3", "App Downloads Standard", "2026-10-03"),
+            instance("d1", "App Downloads Standard", "2026-10-01"),
+            instance("d2", "App Downloads Standard", "2026-10-02"),
+            instance("s1", "App Sessions Standard", "2026-10-01"),
+            instance("s2", "App Sessions Standard", "2026-10-02")
+        ]
+
+    def marks(self, report_names=None) -> dict:
+        return {name: marked["id"] for name, marked in
+                self.ingestor.complete_through(self.instances, report_names).items()}
+
+    def test_newest_instance_per_report(self):
+        self.assertEqual(self.marks(), {"App Downloads Standard": "d3", "App Sessions Standard": "s2"})
+
+    def test_stops_before_the_first_failed_instance(self):
+        self.ingestor._failed_instances.add("d2")
+        self.assertEqual(self.marks(), {"App Downloads Standard": "d1", "App Sessions Standard": "s2"})
+
+    def test_failed_oldest_instance_leaves_no_mark(self):
+        self.ingestor._failed_instances.add("s1")
+        self.assertEqual(self.marks(), {"App Downloads Standard": "d3"})
+
+    def test_report_names_filter(self):
+        self.assertEqual(self.marks(["App Sessions Standard"]), {"App Sessions Standard": "s2"})
+
+    def test_instances_without_processing_date_are_ignored(self):
+        self.instances.append(instance("d4", "App Downloads Standard", None))
+        self.assertEqual(self.marks()["App Downloads Standard"], "d3")
+
+
+if __name__ == "__main__":
+    unittest.main()
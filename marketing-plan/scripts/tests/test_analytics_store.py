@@ -0,0 +1,130 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from analytics_store import ENGAGEMENT_REPORT, AnalyticsStore, sales_watermark_key
+
+
+def segment(segment_id: str, instance_id: str, processing_date: str, checksum: str = "c1") -> dict:
+    return {"id": segment_id, "instance_id": instance_id, "report_name": ENGAGEMENT_REPORT,
+            "processing_date": processing_date, "checksum": checksum}
+
+
+def impressions(*days_and_counts) -> list:
+    return [{"date": day, "event": "Impression", "counts": count, "unique_counts": count}
+            for day, count in days_and_counts]
+
+
+class StoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = AnalyticsStore(Path(self.directory.name) / "analytics.sqlite")
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+
+class WatermarkTest(StoreTestCase):
+    def test_no_watermark_fetches_everything(self):
+        self.assertIsNone(self.store.resume_date("salesReports/SALES/DAILY"))
+        self.assertEqual(self.store.resume_dates(["salesReports/SALES/DAILY"]), {})
+
+    def test_daily_watermark_steps_back_late_days(self):
+        key = sales_watermark_key("SALES", "DAILY")
+        self.store.advance_watermark(key, "2026-10-14")
+        self.assertEqual(self.store.resume_date(key), "2026-10-11")
+        self.assertEqual(self.store.resume_date(key, late_days=0), "2026-10-14")
+        self.assertEqual(self.store.resume_date(key, late_days=20), "2026-09-24")
+
+    def test_month_and_year_periods_recheck_the_watermark_period(self):
+        self.store.advance_watermark("salesReports/SALES/MONTHLY", "2026-09")
+        self.store.advance_watermark("salesReports/SALES/YEARLY", "2025")
+        self.assertEqual(self.store.resume_date("salesReports/SALES/MONTHLY"), "2026-09")
+        self.assertEqual(self.store.resume_date("salesReports/SALES/YEARLY"), "2025")
+
+    def test_watermarks_never_move_back(self):
+        key = sales_watermark_key("SALES", "DAILY")
+        self.store.advance_watermark(key, "2026-10-14")
+        self.store.advance_watermark(key, "2026-10-01")
+        self.assertEqual(self.store.watermark(key)["report_date"], "2026-10-14")
+        self.store.advance_watermark(key, "2026-10-15", "instance-2")
+        self.assertEqual(self.store.watermark(key)["report_date"], "2026-10-15")
+        self.assertEqual(self.store.watermark(key)["instance_id"], "instance-2")
+
+    def test_resume_dates_only_lists_known_keys(self):
+        self.store.advance_watermark("a", "2026-10-10")
+        self.assertEqual(self.store.resume_dates(["a", "b"], late_days=1), {"a": "2026-10-09"})
+
+
+class ReconcileDaysTest(StoreTestCase):
+    def totals(self, start: str = "2026-10-01", end: str = "2026-10-02") -> int:
+        return self.store.period_totals(start, end)["impressions"]
+
+    def test_first_instance_owns_its_days(self):
+        self.assertEqual(self.store.write_segment(segment("a1", "A", "2026-10-03"),
+                                                  impressions(("2026-10-01", 10), ("2026-10-02", 20))), 2)
+        self.assertEqual(self.totals(), 30)
+        self.assertEqual(self.store.reconciliation()["reissued_days"], 0)
+
+    def test_newer_instance_replaces_only_the_days_it_covers(self):
+        self.store.write_segment(segment("a1", "A", "2026-10-03"), impressions(("2026-10-01", 10), ("2026-10-02", 20)))
+        self.store.write_segment(segment("b1", "B", "2026-10-05"), impressions(("2026-10-02", 25)))
+        self.assertEqual(self.totals("2026-10-01", "2026-10-01"), 10)
+        self.assertEqual(self.totals("2026-10-02", "2026-10-02"), 25)
+        self.assertEqual(self.store.reconciliation()["reissued_days"], 1)
+
+    def test_displaced_segments_keep_their_row_counts_in_step(self):
+        self.store.write_segment(segment("a1", "A", "2026-10-03"), impressions(("2026-10-01", 10), ("2026-10-02", 20)))
+        self.store.write_segment(segment("b1", "B", "2026-10-05"), impressions(("2026-10-02", 25)))
+        counts = dict(self.store._connection.execute("SELECT segment_id, row_count FROM segments"))
+        self.assertEqual(counts, {"a1": 1, "b1": 1})
+
+    def test_late_segment_of_an_older_instance_is_dropped(self):
+        self.store.write_segment(segment("b1", "B", "2026-10-05"), impressions(("2026-10-02", 25)))
+        rows = self.store.write_segment(segment("a1", "A", "2026-10-03"),
+                                        impressions(("2026-10-01", 10), ("2026-10-02", 20)))
+        # 2026-10-02 was already restated by B; only A's 2026-10-01 row is kept
+        self.assertEqual(rows, 1)
+        self.assertEqual(self.totals(), 35)
+        self.assertEqual(self.store.reconciliation()["stale_days"], 1)
+
+    def test_segments_of_the_same_instance_add_up(self):
+        self.store.write_segment(segment("a1", "A", "2026-10-03"), impressions(("2026-10-01", 10)))
+        self.store.write_segment(segment("a2", "A", "2026-10-03"), impressions(("2026-10-01", 5)))
+        self.assertEqual(self.totals(), 15)
+        self.assertEqual(self.store.reconciliation()["reissued_days"], 0)
+
+    def test_rewritten_segment_replaces_its_rows(self):
+        self.store.write_segment(segment("a1", "A", "2026-10-03"), impressions(("2026-10-01", 10)))
+        self.store.write_segment(segment("a1", "A", "2026-10-03", checksum="c2"), impressions(("2026-10-01", 12)))
+        self.assertEqual(self.totals(), 12)
+        self.assertTrue(self.store.has_segment("a1", "c2"))
+        self.assertFalse(self.store.has_segment("a1", "c1"))
+        self.assertTrue(self.store.has_segment("a1"))
+        self.assertFalse(self.store.has_segment("zz"))
+
+    def test_only_dirty_days_are_refreshed(self):
+        self.store.write_segment(segment("a1", "A", "2026-10-03"), impressions(("2026-10-01", 10), ("2026-10-02", 20)))
+        self.assertEqual(self.store.refresh_aggregates(), 2)
+        self.assertEqual(self.store.refresh_aggregates(), 0)
+        self.store.write_segment(segment("b1", "B", "2026-10-05"), impressions(("2026-10-02", 25)))
+        self.assertEqual(self.store.reconciliation()["dirty_partitions"], 1)
+        self.assertEqual(self.store.refresh_aggregates(), 1)
+        self.assertEqual(self.totals(), 35)
+
+    def test_existing_rows_are_migrated(self):
+        self.store.write_segment(segment("a1", "A", "2026-10-03"), impressions(("2026-10-01", 10)))
+        with self.store._connection:
+            for table in ("day_partitions", "daily_totals", "dirty_partitions"):
+                self.store._connection.execute(f"DELETE FROM {table}")
+        self.store.close()
+
+        self.store = AnalyticsStore(self.store.path)
+        self.assertEqual(self.totals(), 10)
+        self.store.write_segment(segment("b1", "B", "2026-10-05"), impressions(("2026-10-01", 11)))
+        self.assertEqual(self.totals(), 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
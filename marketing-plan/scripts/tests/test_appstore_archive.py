@@ -0,0 +1,119 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import requests
+
+from appstore_archive import ResponseArchive, list_runs, request_key
+from appstore_client import AppStoreConnectError
+
+URL = "https://api.appstoreconnect.apple.com/v1/apps"
+BODY = b'{"data": [' + b",".join(b'{"id": "%d"}' % i for i in range(100)) + b"]}"
+
+
+def response(body: bytes = BODY, fail_after: int = None) -> requests.Response:
+    """200 response whose iter_content yields 16-byte chunks, optionally failing part way"""
+    result = requests.models.Response()
+    result.status_code = 200
+    result.url = URL
+    result.headers.update({"Content-Type": "application/json", "ETag": '"v1"', "X-Request-Id": "abc"})
+
+    def iter_content(chunk_size: int = 1):
+        for position in range(0, len(body), 16):
+            if fail_after is not None and position >= fail_after:
+                raise requests.exceptions.ConnectionError("connection reset")
+            yield body[position:position + 16]
+
+    result._content = body
+    result.iter_content = iter_content
+    return result
+
+
+class ResponseArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        self.archive = ResponseArchive("run1", root=self.root)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def replay(self, run_id: str = "run1") -> ResponseArchive:
+        self.archive.save()
+        return ResponseArchive(run_id, root=self.root, replay=True)
+
+    def blobs(self):
+        return sorted(path.name for path in (self.root / "blobs").rglob("*") if path.is_file())
+
+    def test_request_key(self):
+        self.assertEqual(request_key("get", URL), f"GET {URL}")
+        self.assertEqual(request_key("POST", URL, {"b": 1, "a": 2}), request_key("POST", URL, {"a": 2, "b": 1}))
+        self.assertNotEqual(request_key("POST", URL, {"a": 1}), request_key("POST", URL, {"a": 2}))
+
+    def test_buffered_response_round_trip(self):
+        self.archive.record("GET", URL, None, response())
+        replayed = self.replay().replay("GET", URL, None, "/v1/apps")
+        self.assertEqual(replayed.content, BODY)
+        self.assertEqual(replayed.headers["ETag"], '"v1"')
+        self.assertNotIn("X-Request-Id", replayed.headers)
+        self.assertEqual(replayed.headers["X-Archive-Run"], "run1")
+
+    def test_streamed_response_is_recorded_as_it_is_read(self):
+        live = response()
+        self.archive.record("GET", URL, None, live, stream=True)
+        self.assertEqual(self.archive.stats()["recorded"], 0)
+        self.assertEqual(b"".join(live.iter_content(chunk_size=16)), BODY)
+        self.assertEqual(self.archive.stats()["recorded"], 1)
+
+        replayed = self.replay().replay("GET", URL, None, "/v1/apps")
+        self.assertEqual(b"".join(replayed.iter_content(chunk_size=7)), BODY)
+
+    def test_streamed_and_buffered_bodies_share_a_blob(self):
+        self.archive.record("GET", URL, None, response())
+        live = response()
+        self.archive.record("GET", URL + "?limit=200", None, live, stream=True)
+        list(live.iter_content())
+        self.assertEqual(len(self.blobs()), 1)
+        self.assertEqual(self.archive.stats()["blobs_written"], 1)
+
+    def test_interrupted_stream_is_not_recorded(self):
+        live = response(fail_after=64)
+        self.archive.record("GET", URL, None, live, stream=True)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            list(live.iter_content())
+        self.assertEqual(self.archive.stats()["recorded"], 0)
+        self.assertEqual(self.blobs(), [])
+
+    def test_abandoned_stream_is_not_recorded(self):
+        live = response()
+        self.archive.record("GET", URL, None, live, stream=True)
+        chunks = live.iter_content()
+        next(chunks)
+        chunks.close()
+        self.assertEqual(self.archive.stats()["recorded"], 0)
+        self.assertEqual(self.blobs(), [])
+
+    def test_errors_replay_the_same_way(self):
+        self.archive.record_error("GET", URL, None, AppStoreConnectError(404, "Not found", "/v1/apps"))
+        with self.assertRaises(AppStoreConnectError) as raised:
+            self.replay().replay("GET", URL, None, "/v1/apps")
+        self.assertEqual(raised.exception.error, 404)
+
+    def test_unrecorded_request(self):
+        archive = self.replay()
+        with self.assertRaises(AppStoreConnectError) as raised:
+            archive.replay("GET", URL, None, "/v1/apps")
+        self.assertEqual(raised.exception.error, "not_archived")
+        self.assertEqual(archive.stats()["missing"], 1)
+
+    def test_runs_and_metadata(self):
+        self.archive.metadata["watermarks"] = {"SALES": "2026-10-14"}
+        self.archive.record("GET", URL, None, response())
+        self.assertEqual(self.replay().metadata, {"watermarks": {"SALES": "2026-10-14"}})
+        self.assertEqual([(run["run_id"], run["responses"]) for run in list_runs(self.root)], [("run1", 1)])
+        with self.assertRaises(ValueError):
+            ResponseArchive("run2", root=self.root, replay=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from appstore_client import RequestCoalescer
+
+URL = "https://api.appstoreconnect.apple.com/v1/apps/123"
+
+
+class SlowFetch:
+    """Fetch that blocks until released, counting how often it was really called"""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class RequestCoalescerTest(unittest.TestCase):
+    def setUp(self):
+        self.coalescer = RequestCoalescer()
+
+    def concurrently(self, fetch: SlowFetch, callers: int = 4):
+        """Start one owner, then callers - 1 followers while the owner's fetch is in flight"""
+        with ThreadPoolExecutor(max_workers=callers) as executor:
+            owner = executor.submit(self.coalescer.fetch, URL, fetch)
+            fetch.started.wait(5)
+            followers = [executor.submit(self.coalescer.fetch, URL, fetch) for _ in range(callers - 1)]
+            while self.coalescer.coalesced < callers - 1:
+                time.sleep(0.001)
+            fetch.release.set()
+            return owner, followers
+
+    def test_followers_share_the_in_flight_result(self):
+        fetch = SlowFetch({"data": {"id": "123"}})
+        owner, followers = self.concurrently(fetch)
+        self.assertEqual(fetch.calls, 1)
+        self.assertTrue(all(follower.result() is owner.result() for follower in followers))
+        self.assertEqual(self.coalescer.stats(), {"unique_gets": 1, "coalesced_gets": 3})
+
+    def test_result_is_cached_for_the_run(self):
+        first = self.coalescer.fetch(URL, lambda: {"data": []})
+        self.assertIs(self.coalescer.fetch(URL, lambda: {"data": ["other"]}), first)
+        self.assertEqual(self.coalescer.fetch(URL + "/other", lambda: {"data": ["other"]}), {"data": ["other"]})
+        self.assertEqual(self.coalescer.stats(), {"unique_gets": 2, "coalesced_gets": 1})
+
+    def test_error_payload_is_shared_but_not_cached(self):
+        fetch = SlowFetch({"error": 503, "message": "unavailable"})
+        owner, followers = self.concurrently(fetch)
+        self.assertTrue(all(follower.result()["error"] == 503 for follower in followers))
+        self.assertEqual(self.coalescer.fetch(URL, lambda: {"data": []}), {"data": []})
+        self.assertEqual(self.coalescer.stats()["unique_gets"], 2)
+
+    def test_exception_reaches_followers_and_is_not_cached(self):
+        fetch = SlowFetch(ValueError("bad JSON"))
+        owner, followers = self.concurrently(fetch, callers=2)
+        for future in [owner] + followers:
+            with self.assertRaises(ValueError):
+                future.result()
+        self.assertEqual(self.coalescer.fetch(URL, lambda: {"data": []}), {"data": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
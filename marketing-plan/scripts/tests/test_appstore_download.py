@@ -0,0 +1,135 @@
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+
+import requests
+
+from appstore_client import PART_SUFFIX, AppStoreConnectClient, AppStoreConnectError
+from appstore_resilience import RetryPolicy
+
+URL = "https://example.com/segment.tsv.gz"
+BODY = bytes(range(256)) * 40
+
+
+def response(status: int, body: bytes = b"", headers=None) -> requests.Response:
+    result = requests.models.Response()
+    result.status_code = status
+    result.url = URL
+    result._content = body
+    result._content_consumed = True
+    result.headers.update(headers or {})
+    return result
+
+
+class FileServer:
+    """Serves BODY with byte-range support, or scripted responses first when given"""
+
+    def __init__(self, *scripted: requests.Response):
+        self.scripted = list(scripted)
+        self.ranges = []
+
+    def request(self, method, url, headers=None, timeout=None, stream=False):
+        requested = (headers or {}).get("Range")
+        self.ranges.append(requested)
+        if self.scripted:
+            return self.scripted.pop(0)
+        if requested is None:
+            return response(200, BODY)
+        start = int(requested[len("bytes="):-1])
+        if start >= len(BODY):
+            return response(416, headers={"Content-Range": f"bytes */{len(BODY)}"})
+        return response(206, BODY[start:], {"Content-Range": f"bytes {start}-{len(BODY) - 1}/{len(BODY)}"})
+
+
+class DownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.destination = Path(self.directory.name) / "segment.tsv.gz"
+        self.part = self.destination.with_name(self.destination.name + PART_SUFFIX)
+        self.client = AppStoreConnectClient(key_id="KEY", issuer_id="ISSUER", private_key_path="/nonexistent.p8",
+                                            retry_policy=RetryPolicy(max_retries=2, backoff_base=0))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def download(self, server: FileServer, checksum=None) -> int:
+        self.client.session = server
+        return self.client.download(URL, self.destination, checksum=checksum)
+
+    def assertDownloaded(self):
+        self.assertEqual(self.destination.read_bytes(), BODY)
+        self.assertFalse(self.part.exists())
+
+    def test_whole_file(self):
+        server = FileServer()
+        self.assertEqual(self.download(server, hashlib.md5(BODY).hexdigest()), len(BODY))
+        self.assertDownloaded()
+        self.assertEqual(server.ranges, [None])
+
+    def test_resumes_a_part_file(self):
+        self.part.write_bytes(BODY[:1000])
+        server = FileServer()
+        self.assertEqual(self.download(server), len(BODY))
+        self.assertDownloaded()
+        self.assertEqual(server.ranges, ["bytes=1000-"])
+
+    def test_server_ignoring_the_range_restarts_the_file(self):
+        self.part.write_bytes(BODY[:1000])
+        server = FileServer(response(200, BODY))
+        self.download(server)
+        self.assertDownloaded()
+
+    def test_416_for_a_complete_part_file(self):
+        self.part.write_bytes(BODY)
+        server = FileServer()
+        self.assertEqual(self.download(server), len(BODY))
+        self.assertDownloaded()
+        self.assertEqual(server.ranges, [f"bytes={len(BODY)}-"])
+
+    def test_416_for_an_oversized_part_file_restarts(self):
+        self.part.write_bytes(BODY + b"stale")
+        server = FileServer()
+        self.download(server)
+        self.assertDownloaded()
+        self.assertEqual(server.ranges, [f"bytes={len(BODY) + 5}-", None])
+
+    def test_416_without_a_size_restarts(self):
+        self.part.write_bytes(BODY)
+        server = FileServer(response(416))
+        self.download(server)
+        self.assertDownloaded()
+        self.assertEqual(server.ranges, [f"bytes={len(BODY)}-", None])
+
+    def test_unexpected_content_range_restarts(self):
+        self.part.write_bytes(BODY[:1000])
+        server = FileServer(response(206, BODY[500:], {"Content-Range": f"bytes 500-{len(BODY) - 1}/{len(BODY)}"}))
+        self.download(server)
+        self.assertDownloaded()
+        self.assertEqual(server.ranges, ["bytes=1000-", None])
+
+    def test_stale_part_file_fails_the_checksum_and_restarts_once(self):
+        self.part.write_bytes(b"x" * 1000)
+        server = FileServer()
+        self.download(server, hashlib.md5(BODY).hexdigest())
+        self.assertDownloaded()
+        self.assertEqual(server.ranges, ["bytes=1000-", None])
+
+    def test_persistent_checksum_mismatch_is_raised(self):
+        server = FileServer()
+        with self.assertRaises(AppStoreConnectError) as raised:
+            self.download(server, "0" * 32)
+        self.assertEqual(raised.exception.error, "checksum_mismatch")
+        self.assertEqual(server.ranges, [None, None])
+        self.assertFalse(self.destination.exists())
+        self.assertFalse(self.part.exists())
+
+    def test_error_status_is_raised_after_retries(self):
+        server = FileServer(*[response(403, b'{"errors": []}') for _ in range(3)])
+        with self.assertRaises(AppStoreConnectError):
+            self.download(server)
+        self.assertFalse(self.destination.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+import requests
+
+from appstore_http2 import HTTP2_AVAILABLE, Http2Session, httpx
+
+URL = "https://api.appstoreconnect.apple.com/v1/apps"
+
+
+def session(handler) -> Http2Session:
+    result = Http2Session(1, {"Accept": "application/json"})
+    result._client.close()
+    result._client = httpx.Client(transport=httpx.MockTransport(handler))
+    return result
+
+
+def dropped_after(first: bytes, error: Exception):
+    class Body(httpx.SyncByteStream):
+        def __iter__(self):
+            yield first
+            raise error
+
+    return lambda request: httpx.Response(200, stream=Body())
+
+
+@unittest.skipUnless(HTTP2_AVAILABLE, "needs httpx[http2]")
+class Http2SessionTest(unittest.TestCase):
+    def test_streamed_body(self):
+        response = session(lambda request: httpx.Response(200, content=b'{"data": []}')).request(
+            "GET", URL, stream=True)
+        self.assertEqual(b"".join(response.iter_content(chunk_size=4)), b'{"data": []}')
+
+    def test_request_errors_become_requests_exceptions(self):
+        def refuse(request):
+            raise httpx.ConnectError("refused")
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            session(refuse).request("GET", URL)
+
+    def test_dropped_stream_becomes_a_connection_error(self):
+        for error in (httpx.ReadError("reset"), httpx.RemoteProtocolError("stream reset")):
+            with self.subTest(error=type(error).__name__):
+                response = session(dropped_after(b'{"data": [', error)).request("GET", URL, stream=True)
+                chunks = response.iter_content(chunk_size=4)
+                self.assertEqual(next(chunks), b'{"da')
+                with self.assertRaises(requests.exceptions.ConnectionError):
+                    list(chunks)
+
+    def test_stalled_stream_becomes_a_timeout(self):
+        response = session(dropped_after(b"{", httpx.ReadTimeout("stalled"))).request("GET", URL, stream=True)
+        with self.assertRaises(requests.exceptions.Timeout):
+            list(response.iter_content(chunk_size=4))
+
+
+if __name__ == "__main__":
+    unittest.main()
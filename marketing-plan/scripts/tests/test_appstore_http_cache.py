@@ -0,0 +1,110 @@
+import time
+import tempfile
+import unittest
+
+import requests
+
+from appstore_http_cache import HttpResponseCache
+
+BASE = "https://api.appstoreconnect.apple.com"
+
+
+def json_response(body: str, **headers) -> requests.Response:
+    response = requests.models.Response()
+    response.status_code = 200
+    response.encoding = "utf-8"
+    response._content = body.encode("utf-8")
+    response.headers["Content-Type"] = "application/json"
+    response.headers.update(headers)
+    return response
+
+
+class TtlForTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = HttpResponseCache(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_default_rules(self):
+        expectations = {
+            "/v1/apps/6747953770": 6 * 3600,
+            "/v1/apps/6747953770?include=appStoreVersions&fields[apps]=name": 6 * 3600,
+            "/v1/apps/6747953770/appStoreVersions?fields[appStoreVersions]=platform": 6 * 3600,
+            "/v1/apps/6747953770/subscriptionGroups?include=subscriptions": 6 * 3600,
+            "/v1/subscriptions/6748/prices?include=territory": 6 * 3600,
+            "/v1/apps/6747953770/analyticsReportRequests": 3600,
+            "/v1/apps/6747953770/analyticsReportRequests?filter[accessType]=ONGOING": 3600,
+            "/v1/salesReports?filter[reportDate]=2026-10-15": 0,
+            "/v1/financeReports?filter[regionCode]=US": 0
+        }
+        for path, ttl in expectations.items():
+            with self.subTest(path=path):
+                self.assertEqual(self.cache.ttl_for(BASE + path), ttl)
+
+    def test_child_listings_are_not_app_info(self):
+        # Only the app resource itself is cached for hours, not every /v1/apps/{id}/... listing
+        self.assertEqual(self.cache.ttl_for(BASE + "/v1/apps/6747953770/customerReviews"), 0)
+        self.assertEqual(self.cache.ttl_for(BASE + "/v1/analyticsReportRequests/r1/reports"), 0)
+
+    def test_first_matching_rule_wins(self):
+        cache = HttpResponseCache(self.directory.name, ttl_rules=[(r"/reports", 10), (r"/v1/", 99)],
+                                  default_ttl=5)
+        self.assertEqual(cache.ttl_for(BASE + "/v1/reports"), 10)
+        self.assertEqual(cache.ttl_for(BASE + "/v1/apps"), 99)
+        self.assertEqual(cache.ttl_for(BASE + "/v2/apps"), 5)
+
+
+class FreshnessTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = HttpResponseCache(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_is_fresh_within_ttl(self):
+        url = BASE + "/v1/apps/6747953770/analyticsReportRequests"
+        self.assertTrue(self.cache.is_fresh({"url": url, "stored_at": time.time() - 3599}))
+        self.assertFalse(self.cache.is_fresh({"url": url, "stored_at": time.time() - 3601}))
+
+    def test_zero_ttl_is_never_fresh(self):
+        url = BASE + "/v1/salesReports?filter[reportDate]=2026-10-15"
+        self.assertFalse(self.cache.is_fresh({"url": url, "stored_at": time.time()}))
+
+    def test_missing_timestamp_is_stale(self):
+        self.assertFalse(self.cache.is_fresh({"url": BASE + "/v1/apps/6747953770"}))
+
+    def test_store_lookup_and_touch(self):
+        url = BASE + "/v1/apps/6747953770"
+        self.cache.store(url, json_response('{"data": {}}', ETag='"v1"'))
+        entry = self.cache.lookup(url)
+        self.assertEqual(entry["etag"], '"v1"')
+        self.assertEqual(self.cache.validators(entry), {"If-None-Match": '"v1"'})
+        self.assertTrue(self.cache.is_fresh(entry))
+
+        entry["stored_at"] = 0
+        self.assertFalse(self.cache.is_fresh(entry))
+        self.cache.touch(entry, json_response("", ETag='"v2"'))
+        entry = self.cache.lookup(url)
+        self.assertTrue(self.cache.is_fresh(entry))
+        self.assertEqual(entry["etag"], '"v2"')
+        self.assertEqual(self.cache.to_response(entry, "REVALIDATED").json(), {"data": {}})
+
+    def test_unreusable_responses_are_not_stored(self):
+        # No validators and a zero TTL: a stored copy could never be served
+        url = BASE + "/v1/salesReports?filter[reportDate]=2026-10-15"
+        self.cache.store(url, json_response("{}"))
+        self.assertIsNone(self.cache.lookup(url))
+
+    def test_invalidate(self):
+        url = BASE + "/v1/apps/6747953770"
+        self.cache.store(url, json_response("{}"))
+        self.cache.invalidate(url)
+        self.assertIsNone(self.cache.lookup(url))
+        self.cache.invalidate(url)
+
+
+if __name__ == "__main__":
+    unittest.main()
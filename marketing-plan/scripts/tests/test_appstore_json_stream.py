@@ -0,0 +1,85 @@
+import json
+import random
+import unittest
+
+from appstore_json_stream import JsonDocumentStream
+
+DOCUMENTS = [
+    {"data": [], "links": {"self": "https://api.appstoreconnect.apple.com/v1/apps"}},
+    {"data": {"type": "apps", "id": "123", "attributes": {"name": "Magical Stories"}}},
+    {"meta": 123.45, "data": [{"id": "1"}]},
+    {"data": [{"id": str(i), "attributes": {"proceeds": i * 1.25, "units": -i, "ratio": 1.5e-7 * i,
+                                            "big": 12345678901234567890, "sent": i % 2 == 0, "note": None,
+                                            "name": f"Geschichte é {i} ✨"}}
+              for i in range(40)],
+     "included": [{"type": "territories", "id": "USA", "attributes": {"currency": "USD"}}],
+     "links": {"next": "https://api.appstoreconnect.apple.com/v1/apps?cursor=abc"},
+     "meta": {"paging": {"total": 40, "limit": 200}, "scale": 1E+3, "offset": -0.5}}
+]
+
+
+def parse(body: bytes, chunks):
+    stream = JsonDocumentStream(chunks)
+    items = list(stream)
+    return items, stream.document
+
+
+def split(body: bytes, rng: random.Random):
+    """Body in chunks of random sizes, from single bytes upwards"""
+    chunks, position = [], 0
+    while position < len(body):
+        size = rng.randint(1, 16)
+        chunks.append(body[position:position + size])
+        position += size
+    return chunks
+
+
+def expected(document):
+    data = document["data"]
+    items = data if isinstance(data, list) else [data]
+    return items, {key: value for key, value in document.items() if key != "data"}
+
+
+class JsonDocumentStreamTest(unittest.TestCase):
+    def test_whole_body(self):
+        for document in DOCUMENTS:
+            body = json.dumps(document).encode("utf-8")
+            self.assertEqual(parse(body, [body]), expected(document))
+
+    def test_every_split_point(self):
+        for document in DOCUMENTS[:3]:
+            body = json.dumps(document, indent=1).encode("utf-8")
+            for position in range(1, len(body)):
+                with self.subTest(position=position):
+                    self.assertEqual(parse(body, [body[:position], body[position:]]), expected(document))
+
+    def test_random_chunking(self):
+        rng = random.Random(15)
+        for document in DOCUMENTS:
+            for separators in ((",", ":"), (", ", ": ")):
+                body = json.dumps(document, ensure_ascii=False, separators=separators).encode("utf-8")
+                for _ in range(50):
+                    self.assertEqual(parse(body, split(body, rng)), expected(document))
+
+    def test_numbers_cut_mid_literal(self):
+        for text in ("123.45", "-0.5", "1e5", "1E+3", "2.5e-7", "-12"):
+            body = ('{"meta": ' + text + '}').encode("utf-8")
+            for position in range(len(b'{"meta": '), len(body)):
+                with self.subTest(text=text, position=position):
+                    self.assertEqual(parse(body, [body[:position], body[position:]]),
+                                     ([], {"meta": json.loads(text)}))
+
+    def test_items_are_counted(self):
+        body = json.dumps(DOCUMENTS[3]).encode("utf-8")
+        stream = JsonDocumentStream(split(body, random.Random(1)))
+        self.assertEqual(sum(1 for _ in stream), 40)
+        self.assertEqual(stream.items_parsed, 40)
+
+    def test_malformed_documents(self):
+        for body in (b'{"data": [1, 2', b'{"data": [1 2]}', b'{"data": []} trailing', b'[1, 2]', b'{1: 2}', b''):
+            with self.subTest(body=body), self.assertRaises(ValueError):
+                parse(body, [body[:3], body[3:]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+from appstore_query import (MAX_INCLUDED_LIMIT, QueryBuilder, analytics_report_requests_query,
+                            sales_reports_query)
+
+
+class QueryBuilderTest(unittest.TestCase):
+    def test_bare_path(self):
+        self.assertEqual(QueryBuilder("/v1/apps/1").build(), "/v1/apps/1")
+
+    def test_parameter_order_is_stable(self):
+        # Filters, include, fields, limits, sort, whatever order the calls were made in
+        query = (QueryBuilder("/v1/apps/1/analyticsReportRequests")
+                 .sort("-createdDate")
+                 .limit(MAX_INCLUDED_LIMIT, "reports")
+                 .fields("analyticsReports", "name", "category")
+                 .include("reports")
+                 .fields("analyticsReportRequests", "accessType")
+                 .filter("accessType", "ONGOING"))
+        self.assertEqual(query.build(),
+                         "/v1/apps/1/analyticsReportRequests?filter[accessType]=ONGOING&include=reports"
+                         "&fields[analyticsReports]=name,category&fields[analyticsReportRequests]=accessType"
+                         "&limit[reports]=50&sort=-createdDate")
+
+    def test_repeated_names_are_not_duplicated(self):
+        query = (QueryBuilder("/v1/apps/1")
+                 .include("prices", "appStoreVersions")
+                 .include("prices")
+                 .fields("apps", "name", "sku")
+                 .fields("apps", "name", "bundleId"))
+        self.assertEqual(query.build(), "/v1/apps/1?include=prices,appStoreVersions&fields[apps]=name,sku,bundleId")
+
+    def test_values_are_quoted(self):
+        query = QueryBuilder("/v1/things").filter("name", "a b&c", "d/e")
+        self.assertEqual(query.build(), "/v1/things?filter[name]=a%20b%26c,d%2Fe")
+
+    def test_existing_query_string_is_extended(self):
+        self.assertEqual(QueryBuilder("/v1/apps?cursor=abc").limit(10).build(), "/v1/apps?cursor=abc&limit=10")
+
+    def test_unknown_fields_are_rejected(self):
+        with self.assertRaises(ValueError):
+            QueryBuilder("/v1/apps/1").fields("apps", "name", "nmae")
+
+    def test_unlisted_resource_types_are_not_checked(self):
+        self.assertEqual(QueryBuilder("/v1/x").fields("customerReviews", "rating").build(),
+                         "/v1/x?fields[customerReviews]=rating")
+
+    def test_limit_bounds(self):
+        QueryBuilder("/v1/apps").limit(200)
+        QueryBuilder("/v1/apps").limit(50, "reports")
+        for count, relationship in ((0, None), (201, None), (51, "reports")):
+            with self.subTest(count=count, relationship=relationship):
+                with self.assertRaises(ValueError):
+                    QueryBuilder("/v1/apps").limit(count, relationship)
+
+    def test_str_is_build(self):
+        query = QueryBuilder("/v1/apps").limit(5)
+        self.assertEqual(str(query), query.build())
+
+
+class SharedQueriesTest(unittest.TestCase):
+    def test_report_requests_query(self):
+        self.assertEqual(analytics_report_requests_query("1", access_type="ONGOING"),
+                         "/v1/apps/1/analyticsReportRequests?filter[accessType]=ONGOING"
+                         "&fields[analyticsReportRequests]=accessType,stoppedDueToInactivity")
+
+    def test_sales_reports_query(self):
+        self.assertEqual(sales_reports_query("90709074", "2026-10-15", version="1_0"),
+                         "/v1/salesReports?filter[frequency]=DAILY&filter[reportDate]=2026-10-15"
+                         "&filter[reportSubType]=SUMMARY&filter[reportType]=SALES"
+                         "&filter[vendorNumber]=90709074&filter[version]=1_0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+from appstore_rate_limit import (PRIORITY_CRITICAL, PRIORITY_NORMAL, PRIORITY_OPTIONAL, RateLimitExceeded,
+                                 RateLimitScheduler, parse_rate_limit_header)
+
+
+def quota_header(remaining: int, limit: int = 3600) -> dict:
+    return {"X-Rate-Limit": f"user-hour-lim:{limit};user-hour-rem:{remaining};"}
+
+
+class ParseRateLimitHeaderTest(unittest.TestCase):
+    def test_limit_and_remaining(self):
+        self.assertEqual(parse_rate_limit_header("user-hour-lim:3600;user-hour-rem:3599;"),
+                         {"limit": 3600, "remaining": 3599})
+
+    def test_missing_or_malformed(self):
+        self.assertEqual(parse_rate_limit_header(None), {})
+        self.assertEqual(parse_rate_limit_header("user-hour-lim:abc;user-hour-rem:12"), {"remaining": 12})
+
+
+class RateLimitSchedulerReserveTest(unittest.TestCase):
+    def setUp(self):
+        # Never actually waits: the bucket starts with burst tokens and max_wait fails fast
+        self.scheduler = RateLimitScheduler(hourly_limit=3600, burst=10, max_wait=0.1)
+
+    def test_all_priorities_pass_with_plenty_of_quota(self):
+        self.scheduler.record_response(200, quota_header(3000))
+        for priority in (PRIORITY_CRITICAL, PRIORITY_NORMAL, PRIORITY_OPTIONAL):
+            self.scheduler.acquire(priority)
+        self.assertEqual(self.scheduler.run_usage()["requests_sent"], 3)
+
+    def test_optional_requests_leave_the_last_20_percent(self):
+        # 600 of 3600 left is under the 720 kept back from optional requests
+        self.scheduler.record_response(200, quota_header(600))
+        with self.assertRaises(RateLimitExceeded):
+            self.scheduler.acquire(PRIORITY_OPTIONAL)
+        self.scheduler.acquire(PRIORITY_NORMAL)
+        self.scheduler.acquire(PRIORITY_CRITICAL)
+
+    def test_normal_requests_leave_the_last_5_percent(self):
+        self.scheduler.record_response(200, quota_header(180))
+        with self.assertRaises(RateLimitExceeded):
+            self.scheduler.acquire(PRIORITY_NORMAL)
+        self.scheduler.acquire(PRIORITY_CRITICAL)
+
+    def test_reserve_boundary_is_inclusive(self):
+        self.scheduler.record_response(200, quota_header(720))
+        with self.assertRaises(RateLimitExceeded):
+            self.scheduler.acquire(PRIORITY_OPTIONAL)
+        self.scheduler.record_response(200, quota_header(721))
+        self.scheduler.acquire(PRIORITY_OPTIONAL)
+
+    def test_reserves_follow_the_reported_limit(self):
+        # A 1000/hour key keeps back 200 from optional requests, not 720
+        self.scheduler.record_response(200, quota_header(300, limit=1000))
+        self.scheduler.acquire(PRIORITY_OPTIONAL)
+
+    def test_unknown_priority_is_treated_as_normal(self):
+        self.scheduler.record_response(200, quota_header(180))
+        with self.assertRaises(RateLimitExceeded):
+            self.scheduler.acquire("bulk")
+
+    def test_rejections_are_counted_per_priority(self):
+        self.scheduler.record_response(200, quota_header(100))
+        for priority in (PRIORITY_OPTIONAL, PRIORITY_OPTIONAL, PRIORITY_NORMAL):
+            with self.assertRaises(RateLimitExceeded):
+                self.scheduler.acquire(priority)
+        usage = self.scheduler.run_usage()
+        self.assertEqual(usage["requests_rejected"],
+                         {PRIORITY_CRITICAL: 0, PRIORITY_NORMAL: 1, PRIORITY_OPTIONAL: 2})
+        self.assertEqual(usage["requests_sent"], 0)
+
+
+class RateLimitSchedulerBucketTest(unittest.TestCase):
+    def test_burst_then_wait_times_out(self):
+        scheduler = RateLimitScheduler(burst=2, max_wait=0.05)
+        scheduler.acquire(PRIORITY_CRITICAL)
+        scheduler.acquire(PRIORITY_CRITICAL)
+        # Refill at 3600/hour is one token a second, so the third request has to wait
+        with self.assertRaises(RateLimitExceeded):
+            scheduler.acquire(PRIORITY_CRITICAL)
+
+    def test_429_drains_the_bucket(self):
+        scheduler = RateLimitScheduler(burst=10, max_wait=0.05)
+        scheduler.record_response(429, quota_header(3000))
+        with self.assertRaises(RateLimitExceeded):
+            scheduler.acquire(PRIORITY_CRITICAL)
+        self.assertEqual(scheduler.run_usage()["rate_limited_responses"], 1)
+
+    def test_quota_used_counts_from_the_first_header(self):
+        scheduler = RateLimitScheduler(burst=10)
+        scheduler.acquire(PRIORITY_NORMAL)
+        scheduler.record_response(200, quota_header(3500))
+        scheduler.acquire(PRIORITY_NORMAL)
+        scheduler.record_response(200, quota_header(3499))
+        usage = scheduler.run_usage()
+        self.assertEqual(usage["quota_remaining_at_start"], 3501)
+        self.assertEqual(usage["quota_used"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
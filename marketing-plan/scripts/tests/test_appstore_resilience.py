@@ -0,0 +1,107 @@
+import time
+import unittest
+from email.utils import formatdate
+from unittest import mock
+
+from appstore_resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, is_outage, parse_retry_after
+
+
+class ParseRetryAfterTest(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after("30"), 30.0)
+        self.assertEqual(parse_retry_after(" 5 "), 5.0)
+
+    def test_http_date(self):
+        delay = parse_retry_after(formatdate(time.time() + 60, usegmt=True))
+        self.assertAlmostEqual(delay, 60, delta=2)
+
+    def test_past_date_is_zero(self):
+        self.assertEqual(parse_retry_after(formatdate(time.time() - 60, usegmt=True)), 0.0)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after(""))
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_retry_after_is_honored(self):
+        self.assertEqual(RetryPolicy().delay(0, "7"), 7.0)
+
+    def test_retry_after_is_capped(self):
+        policy = RetryPolicy(max_retry_after=120.0)
+        self.assertEqual(policy.delay(0, "3600"), 120.0)
+        self.assertEqual(policy.delay(0, formatdate(time.time() + 86400, usegmt=True)), 120.0)
+
+    def test_backoff_without_retry_after(self):
+        policy = RetryPolicy(backoff_base=0.5, backoff_max=3.0)
+        with mock.patch("appstore_resilience.random.uniform", side_effect=lambda low, high: high):
+            self.assertEqual([policy.delay(attempt) for attempt in range(5)], [0.5, 1.0, 2.0, 3.0, 3.0])
+
+    def test_unparseable_retry_after_falls_back_to_backoff(self):
+        delay = RetryPolicy(backoff_base=0.5).delay(0, "later")
+        self.assertTrue(0 <= delay <= 0.5)
+
+    def test_should_retry(self):
+        policy = RetryPolicy(max_retries=3)
+        self.assertTrue(policy.should_retry("get", 0, 429))
+        self.assertTrue(policy.should_retry("GET", 2, 503))
+        self.assertTrue(policy.should_retry("GET", 0, "request_failed"))
+        self.assertFalse(policy.should_retry("GET", 3, 503))
+        self.assertFalse(policy.should_retry("POST", 0, 503))
+        self.assertFalse(policy.should_retry("GET", 0, 404))
+        self.assertFalse(policy.should_retry("GET", 0, "rate_limited"))
+
+    def test_is_outage(self):
+        self.assertTrue(is_outage(502))
+        self.assertTrue(is_outage("request_failed"))
+        self.assertFalse(is_outage(429))
+        self.assertFalse(is_outage("circuit_open"))
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_after_threshold_and_fails_fast(self):
+        breaker = CircuitBreaker("api", failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.before_request()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+
+    def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker("api", failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_lets_one_probe_through(self):
+        breaker = CircuitBreaker("api", failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.before_request()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.before_request()
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker("api", failure_threshold=3, reset_timeout=0)
+        for _ in range(3):
+            breaker.record_failure()
+        breaker.before_request()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_release_frees_the_probe_slot(self):
+        breaker = CircuitBreaker("api", failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.before_request()
+        breaker.release()
+        breaker.before_request()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+import gzip
+import random
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+import requests
+
+from appstore_client import AppStoreConnectError
+from finance_reports import FinanceIngestor, FinanceStore, fiscal_months, iter_lines, parse_finance_rows
+
+REPORT = (
+    "\ufeffStart Date\tEnd Date\tVendor Identifier\tQuantity\tPartner Share\tExtended Partner Share\t"
+    "Partner Share Currency\tSales or Return\tApple Identifier\tProduct Type Identifier\tCountry Of Sale\r\n"
+    "09/01/2026\t09/30/2026\tpremium.monthly\t3\t4.90\t14.70\tUSD\tS\t111\tIAY\tUS\r\n"
+    "09/01/2026\t09/30/2026\tstory.pack\t2\t1,000.50\t2,001.00\tUSD\tS\t222\tIA1\tUS\r\n"
+    "09/01/2026\t09/30/2026\tpremium.monthly\t1\t4.20\t4.20\tEUR\tS\t111\tIAY\tDE\r\n"
+    "\r\n"
+    "Total_Rows\t3\r\n"
+    "Total_Amount\t2020.90\r\n"
+)
+
+
+def chunked(body: bytes, rng: random.Random):
+    position, chunks = 0, []
+    while position < len(body):
+        size = rng.randint(1, 32)
+        chunks.append(body[position:position + size])
+        position += size
+    return chunks
+
+
+class FiscalMonthsTest(unittest.TestCase):
+    def test_months_before_end_newest_first(self):
+        self.assertEqual(fiscal_months(date(2026, 10, 16)), ["2026-09", "2026-08", "2026-07"])
+
+    def test_year_boundary(self):
+        self.assertEqual(fiscal_months(date(2026, 2, 1), 3), ["2026-01", "2025-12", "2025-11"])
+
+
+class IterLinesTest(unittest.TestCase):
+    def test_plain_and_gzipped_bodies_in_random_chunks(self):
+        rng = random.Random(20)
+        expected = REPORT.lstrip("\ufeff").split("\r\n")[:-1]
+        for body in (REPORT.encode("utf-8"), gzip.compress(REPORT.encode("utf-8"))):
+            for _ in range(20):
+                lines = list(iter_lines(chunked(body, rng)))
+                self.assertEqual(lines, expected)
+
+    def test_last_line_without_newline(self):
+        self.assertEqual(list(iter_lines([b"a\tb\n", b"c\td"])), ["a\tb", "c\td"])
+
+    def test_multibyte_characters_split_across_chunks(self):
+        body = "Land\nÖsterreich\n".encode("utf-8")
+        split = body.index("Ö".encode("utf-8")) + 1
+        self.assertEqual(list(iter_lines([body[:split], body[split:]])), ["Land", "Österreich"])
+
+    def test_empty_body(self):
+        self.assertEqual(list(iter_lines([])), [])
+
+
+class ParseFinanceRowsTest(unittest.TestCase):
+    def test_rows_stop_at_the_footer(self):
+        rows = list(parse_finance_rows(iter_lines([REPORT.encode("utf-8")]), "US"))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]["region"], "US")
+        self.assertEqual(rows[0]["vendor_identifier"], "premium.monthly")
+        self.assertEqual(rows[1]["extended_partner_share"], "2,001.00")
+        self.assertEqual(rows[2]["currency"], "EUR")
+
+    def test_unknown_columns_are_ignored_and_missing_cells_are_blank(self):
+        lines = ["Vendor Identifier\tSomething New\tQuantity\tCustomer Price", "premium.monthly\tx\t2"]
+        self.assertEqual(list(parse_finance_rows(lines, "EU")),
+                         [{"region": "EU", "vendor_identifier": "premium.monthly", "quantity": "2",
+                           "customer_price": ""}])
+
+    def test_empty_report(self):
+        self.assertEqual(list(parse_finance_rows([], "US")), [])
+
+
+class FinanceStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = FinanceStore(Path(self.directory.name))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, fiscal_month: str = "2026-09", region: str = "US") -> int:
+        return self.store.write_partition(fiscal_month, region,
+                                          parse_finance_rows(iter_lines([REPORT.encode("utf-8")]), region))
+
+    def test_partition_round_trip(self):
+        self.assertEqual(self.write(), 3)
+        rows = list(self.store.iter_rows(["2026-09"]))
+        self.assertEqual([row["vendor_identifier"] for row in rows],
+                         ["premium.monthly", "story.pack", "premium.monthly"])
+        self.assertEqual(list(self.store.iter_rows(["2026-08"])), [])
+
+    def test_rewrite_replaces_the_partition(self):
+        self.write()
+        self.write()
+        self.assertEqual(len(list(self.store.iter_rows(["2026-09"]))), 3)
+
+    def test_region_filter(self):
+        self.write(region="US")
+        self.write(region="EU")
+        self.assertEqual({row["region"] for row in self.store.iter_rows(["2026-09"], ["EU"])}, {"EU"})
+
+    def test_proceeds_and_monthly_recurring_revenue(self):
+        self.write()
+        self.assertEqual(self.store.proceeds(["2026-09", "2026-08"]),
+                         {"2026-09": {"USD": 2015.7, "EUR": 4.2}, "2026-08": {}})
+        self.assertEqual(self.store.monthly_recurring_revenue("2026-09"), {"USD": 14.7, "EUR": 4.2})
+
+    def test_manifest(self):
+        self.assertFalse(self.store.has("2026-09", "US"))
+        self.store.mark("2026-09", "US", "ok", 3)
+        self.store.mark("2026-09", "JP", "no_data")
+        self.assertTrue(self.store.has("2026-09", "US"))
+        self.assertEqual(self.store.manifest("2026-09")["US"]["rows"], 3)
+        self.assertEqual(self.store.manifest("2026-09")["JP"]["status"], "no_data")
+
+
+class FakeFinanceClient:
+    """Serves REPORT for regions in ok, raises the given status for the rest"""
+
+    def __init__(self, ok, status: int = 404, body: bytes = None):
+        self.ok = set(ok)
+        self.status = status
+        self.body = body if body is not None else gzip.compress(REPORT.encode("utf-8"))
+
+    def send(self, method, endpoint, headers=None, stream=False, priority=None):
+        region = endpoint.split("filter[regionCode]=")[1].split("&")[0]
+        if region not in self.ok:
+            raise AppStoreConnectError(self.status, "no report", endpoint)
+        response = requests.models.Response()
+        response.status_code = 200
+        response._content = self.body
+        response._content_consumed = True
+        return response
+
+
+class FinanceIngestorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = FinanceStore(Path(self.directory.name))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def ingest(self, client: FakeFinanceClient, regions=("US", "JP"), months: int = 2) -> dict:
+        ingestor = FinanceIngestor(client, "12345", self.store, max_workers=2)
+        return ingestor.ingest(date(2026, 10, 16), months, regions)
+
+    def test_reports_are_stored_and_marked(self):
+        result = self.ingest(FakeFinanceClient(ok=["US", "JP"]))
+        self.assertEqual(result["ingested"], 4)
+        self.assertEqual(result["rows"], 12)
+        self.assertEqual(self.store.manifest("2026-09")["US"]["status"], "ok")
+
+    def test_missing_newest_month_is_retried_next_run(self):
+        result = self.ingest(FakeFinanceClient(ok=["US"]))
+        self.assertEqual(result["no_data"], 2)
+        # 2026-09 may not be published yet, so JP stays planned; 2026-08 really had no sales
+        self.assertFalse(self.store.has("2026-09", "JP"))
+        self.assertEqual(self.store.manifest("2026-08")["JP"]["status"], "no_data")
+
+        ingestor = FinanceIngestor(FakeFinanceClient(ok=["US"]), "12345", self.store)
+        self.assertEqual(ingestor.plan(date(2026, 10, 16), 2, ("US", "JP")), [("2026-09", "JP")])
+
+    def test_other_errors_are_reported_and_not_marked(self):
+        result = self.ingest(FakeFinanceClient(ok=["US"], status=500), regions=("US", "JP"), months=1)
+        self.assertEqual([error["error"] for error in result["errors"]], [500])
+        self.assertEqual(result["errors"][0]["region"], "JP")
+        self.assertFalse(self.store.has("2026-09", "JP"))
+
+    def test_corrupt_body_leaves_no_partition(self):
+        result = self.ingest(FakeFinanceClient(ok=["US"], body=b"\x1f\x8bnot gzip"), regions=("US",), months=1)
+        self.assertEqual(result["errors"][0]["error"], "finance_parse_failed")
+        self.assertFalse(self.store.has("2026-09", "US"))
+        self.assertEqual(list(self.store.partition_dir("2026-09").glob("*")), [])
+
+    def test_endpoint(self):
+        ingestor = FinanceIngestor(None, "12345", self.store)
+        self.assertIn("filter[reportType]=FINANCIAL", ingestor.endpoint("2026-09", "US"))
+        self.assertIn("filter[reportDate]=2026-09", ingestor.endpoint("2026-09", "US"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import gzip
+import unittest
+
+from report_columns import NUMPY_AVAILABLE, ColumnReader, group_sum, np, open_report, to_numbers
+
+REPORT = (
+    b"Date\tTerritory\tUnits\tDeveloper Proceeds\t\tCurrency of Proceeds\n"
+    b"2026-10-15\tUS\t2\t4.99\t\tUSD\n"
+    b"2026-10-15\tDE\t1\t4,50\t\tEUR\n"
+    b"2026-10-15\tUS\t3\t1,234.5\t\tUSD\n"
+    b"2026-10-15\tFR\t\tn/a\t\tEUR\n"
+    b"\n"
+    b"Total_Rows\t4\n"
+)
+
+
+def read(body: bytes, text_columns=(), number_columns=(), block_size: int = 1 << 20):
+    return ColumnReader(open_report(body), text_columns, number_columns, block_size=block_size)
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "needs numpy")
+class GroupSumTest(unittest.TestCase):
+    def test_sums_per_distinct_value(self):
+        codes = np.array([0, 1, 0, 2, 0])
+        weights = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(group_sum(codes, ["US", "DE", "FR"], weights), {"US": 9.0, "DE": 2.0, "FR": 4.0})
+
+    def test_values_without_rows_sum_to_zero(self):
+        self.assertEqual(group_sum(np.array([1]), ["US", "DE"], np.array([2.5])), {"US": 0.0, "DE": 2.5})
+
+    def test_empty_block(self):
+        self.assertEqual(group_sum(np.array([], dtype=np.int64), [], np.array([])), {})
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "needs numpy")
+class ColumnReaderTest(unittest.TestCase):
+    def test_header_and_missing_columns(self):
+        reader = read(REPORT, ("Territory", "Device"), ("Units", "Sessions"))
+        self.assertEqual(reader.header[:4], ["Date", "Territory", "Units", "Developer Proceeds"])
+        self.assertIn("Territory", reader)
+        self.assertNotIn("Device", reader)
+        block, = list(reader)
+        self.assertIn("Territory", block)
+        self.assertNotIn("Device", block)
+        self.assertNotIn("Sessions", block)
+
+    def test_footer_and_blank_lines_are_dropped(self):
+        block, = list(read(REPORT, ("Territory",)))
+        self.assertEqual(len(block), 4)
+        self.assertEqual(block.text("Territory"), ["US", "DE", "US", "FR"])
+
+    def test_columns_after_an_empty_header_keep_their_position(self):
+        block, = list(read(REPORT, ("Currency of Proceeds",)))
+        self.assertEqual(block.text("Currency of Proceeds"), ["USD", "EUR", "USD", "EUR"])
+
+    def test_numbers_drop_thousands_separators_and_mark_bad_cells(self):
+        block, = list(read(REPORT, (), ("Units", "Developer Proceeds")))
+        units = block.number("Units")
+        proceeds = block.number("Developer Proceeds")
+        self.assertEqual(units[:3].tolist(), [2.0, 1.0, 3.0])
+        self.assertTrue(np.isnan(units[3]))
+        self.assertEqual(proceeds[:3].tolist(), [4.99, 450.0, 1234.5])
+        self.assertTrue(np.isnan(proceeds[3]))
+
+    def test_group_sum_over_a_block(self):
+        block, = list(read(REPORT, ("Territory",), ("Units",)))
+        totals = group_sum(*block.codes("Territory"), np.nan_to_num(block.number("Units")))
+        self.assertEqual(totals, {"DE": 1.0, "FR": 0.0, "US": 5.0})
+
+    def test_small_blocks_split_on_line_boundaries(self):
+        blocks = list(read(REPORT, ("Territory",), ("Units",), block_size=16))
+        self.assertGreater(len(blocks), 1)
+        self.assertEqual(sum(len(block) for block in blocks), 4)
+        self.assertEqual([value for block in blocks for value in block.text("Territory")], ["US", "DE", "US", "FR"])
+
+    def test_gzip_crlf_and_bom(self):
+        body = gzip.compress(b"\xef\xbb\xbfTerritory\tUnits\r\nUS\t1\r\nJP\t2\r\n")
+        block, = list(read(body, ("Territory",), ("Units",)))
+        self.assertEqual(block.text("Territory"), ["US", "JP"])
+        self.assertEqual(block.number("Units").tolist(), [1.0, 2.0])
+
+    def test_crlf_across_small_blocks_with_text_last(self):
+        body = b"Units\tTerritory\r\n" + b"".join(b"%d\t%s\r\n" % (units, territory)
+                                                    for units, territory in enumerate([b"US", b"DE", b"US"] * 10))
+        blocks = list(read(body, ("Territory",), ("Units",), block_size=20))
+        self.assertGreater(len(blocks), 1)
+        territories = [value for block in blocks for value in block.text("Territory")]
+        self.assertEqual(set(territories), {"US", "DE"})
+        totals = {}
+        for block in blocks:
+            for territory, units in group_sum(*block.codes("Territory"), block.number("Units")).items():
+                totals[territory] = totals.get(territory, 0) + units
+        self.assertEqual(totals, {"US": 290.0, "DE": 145.0})
+
+    def test_empty_report(self):
+        self.assertEqual(list(read(b"")), [])
+        self.assertEqual(list(read(b"Territory\tUnits\n", ("Territory",))), [])
+
+    def test_to_numbers(self):
+        column = np.array([b"1", b" 2,000 ", b"", b"x"])
+        values = to_numbers(column)
+        self.assertEqual(values[:2].tolist(), [1.0, 2000.0])
+        self.assertTrue(np.isnan(values[2]) and np.isnan(values[3]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+import threading
+import time
+import unittest
+
+from report_pipeline import CategoryPipeline, ReportIngestionPipeline, analytics_category
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+class CategoryPipelineTest(unittest.TestCase):
+    def run_category(self, category: CategoryPipeline) -> dict:
+        category.start()
+        return category.join()
+
+    def test_items_rows_and_finish(self):
+        handled = []
+        lock = threading.Lock()
+
+        def handle(item):
+            with lock:
+                handled.append(item)
+            return item
+
+        result = self.run_category(CategoryPipeline("APP_USAGE", lambda: range(1, 21), handle,
+                                                    finish=lambda: {"watermarks": {}}, queue_size=4))
+        self.assertEqual(sorted(handled), list(range(1, 21)))
+        self.assertEqual(result["progress"]["state"], "finished")
+        self.assertEqual(result["progress"]["done"], 20)
+        self.assertEqual(result["progress"]["rows"], 210)
+        self.assertEqual(result["result"], {"watermarks": {}})
+        self.assertEqual(result["errors"], [])
+
+    def test_failed_items_do_not_stop_the_rest(self):
+        def handle(item):
+            if item % 5 == 0:
+                raise ValueError(f"segment {item} is corrupt")
+            return 1
+
+        result = self.run_category(CategoryPipeline("APP_USAGE", lambda: range(1, 21), handle))
+        self.assertEqual(result["progress"]["done"], 16)
+        self.assertEqual(result["progress"]["failed"], 4)
+        self.assertEqual(result["progress"]["state"], "failed")
+        self.assertEqual({error["error"] for error in result["errors"]}, {"item_failed"})
+
+    def test_producer_failure_ends_the_category(self):
+        def produce():
+            yield 1
+            yield 2
+            raise ConnectionError("listing failed")
+
+        result = self.run_category(CategoryPipeline("APP_USAGE", produce, lambda item: 1, workers=3))
+        self.assertEqual(result["progress"]["done"], 2)
+        self.assertEqual(result["errors"][0]["error"], "produce_failed")
+        self.assertEqual(result["errors"][0]["type"], "ConnectionError")
+
+    def test_finish_failure_is_recorded(self):
+        def finish():
+            raise RuntimeError("watermark write failed")
+
+        result = self.run_category(CategoryPipeline("SALES", lambda: [1], lambda item: 1, finish=finish))
+        self.assertIsNone(result["result"])
+        self.assertEqual(result["errors"][0]["error"], "finish_failed")
+
+
+class ReportIngestionPipelineTest(unittest.TestCase):
+    def test_a_stalled_category_does_not_block_the_others(self):
+        release = threading.Event()
+
+        def stalled(item):
+            release.wait(5)
+            return 1
+
+        pipeline = ReportIngestionPipeline()
+        slow = pipeline.add(CategoryPipeline("APP_USAGE", lambda: range(10), stalled))
+        fast = pipeline.add(CategoryPipeline("SALES", lambda: range(10), lambda item: 2))
+
+        results = {}
+        runner = threading.Thread(target=lambda: results.update(pipeline.run()))
+        runner.start()
+        try:
+            self.assertTrue(wait_for(lambda: fast.progress["done"] == 10))
+            self.assertEqual(slow.progress["done"], 0)
+            self.assertEqual(pipeline.progress()["SALES"]["rows"], 20)
+        finally:
+            release.set()
+            runner.join(5)
+
+        self.assertEqual(results["APP_USAGE"]["progress"]["done"], 10)
+        self.assertEqual(results["SALES"]["progress"]["state"], "finished")
+
+    def test_a_failing_category_leaves_the_others_intact(self):
+        def produce():
+            raise ValueError("invalid JSON")
+
+        pipeline = ReportIngestionPipeline()
+        pipeline.add(CategoryPipeline("APP_DOWNLOADS", produce, lambda item: 1))
+        pipeline.add(CategoryPipeline("SALES", lambda: range(5), lambda item: 1, finish=lambda: {"days": 5}))
+        results = pipeline.run()
+
+        self.assertEqual(results["APP_DOWNLOADS"]["progress"]["state"], "failed")
+        self.assertEqual(results["SALES"]["progress"]["state"], "finished")
+        self.assertEqual(results["SALES"]["result"], {"days": 5})
+
+
+class FakeClient:
+    archive = None
+
+
+class FakeIngestor:
+    client = FakeClient()
+
+    def __init__(self):
+        self.advanced = []
+
+    def segments_for(self, instances):
+        return [{"id": f"{instance['id']}-s1", "instance_id": instance["id"]} for instance in instances]
+
+    def ingest_segment(self, segment, raise_errors=False):
+        return 3
+
+    def advance_watermarks(self, instances, report_names=None):
+        self.advanced.append([instance["id"] for instance in instances])
+        return {"App Sessions Standard": "2026-10-15"}
+
+    def stats(self):
+        return {"errors": []}
+
+
+class AnalyticsCategoryTest(unittest.TestCase):
+    TREE = {"instances": [{"id": "i1", "category": "APP_USAGE", "report_name": "App Sessions Standard"},
+                          {"id": "i2", "category": "APP_STORE_ENGAGEMENT", "report_name": "Discovery"}],
+            "errors": []}
+
+    def run_category(self, tree) -> tuple:
+        ingestor = FakeIngestor()
+        category = analytics_category("APP_USAGE", ingestor, lambda: tree, ("APP_USAGE",))
+        category.start()
+        return category.join(), ingestor
+
+    def test_only_instances_of_the_category_are_ingested(self):
+        result, ingestor = self.run_category(self.TREE)
+        self.assertEqual(result["progress"]["done"], 1)
+        self.assertEqual(result["progress"]["rows"], 3)
+        self.assertEqual(ingestor.advanced, [["i1"]])
+        self.assertEqual(result["result"]["watermarks"], {"App Sessions Standard": "2026-10-15"})
+
+    def test_watermarks_stay_put_when_the_walk_had_errors(self):
+        result, ingestor = self.run_category(dict(self.TREE, errors=[{"error": 500}]))
+        self.assertEqual(ingestor.advanced, [])
+        self.assertEqual(result["result"]["watermarks"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
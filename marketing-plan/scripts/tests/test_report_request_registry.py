@@ -0,0 +1,104 @@
+import unittest
+
+from report_request_registry import ACCESS_ONE_TIME_SNAPSHOT, ACCESS_ONGOING, ReportRequestRegistry
+
+APP_ID = "6747953770"
+
+
+def resource(request_id: str, access_type: str = ACCESS_ONGOING, stopped: bool = False) -> dict:
+    return {"type": "analyticsReportRequests", "id": request_id,
+            "attributes": {"accessType": access_type, "stoppedDueToInactivity": stopped}}
+
+
+class FakeCache:
+    def __init__(self):
+        self.invalidated = []
+
+    def invalidate(self, url: str):
+        self.invalidated.append(url)
+
+
+class FakeClient:
+    """The listing, the forced re-listing and the POST response, each scripted per test"""
+
+    def __init__(self, listing, created=None, relisting=None):
+        self.listing = listing
+        self.created = created
+        self.relisting = relisting
+        self.http_cache = FakeCache()
+        self.calls = []
+
+    def url_for(self, endpoint: str) -> str:
+        return f"https://api.appstoreconnect.apple.com{endpoint}"
+
+    def get_all(self, endpoint: str):
+        self.calls.append("list")
+        return self.listing
+
+    def paginate(self, endpoint: str):
+        self.calls.append("relist")
+        return iter(self.relisting)
+
+    def request(self, endpoint: str, method: str, data):
+        self.calls.append(method)
+        self.posted = data
+        return self.created
+
+
+class ReportRequestRegistryTest(unittest.TestCase):
+    def registry(self, listing, created=None, relisting=None) -> ReportRequestRegistry:
+        self.client = FakeClient(listing, created, relisting)
+        return ReportRequestRegistry(self.client, APP_ID)
+
+    def test_existing_request_is_reused_without_a_post(self):
+        registry = self.registry({"data": [resource("r1", ACCESS_ONE_TIME_SNAPSHOT), resource("r2")]})
+        result = registry.ensure()
+        self.assertEqual(result["status"], "existing")
+        self.assertEqual(result["request"]["id"], "r2")
+        registry.ensure()
+        self.assertEqual(self.client.calls, ["list"])
+        self.assertEqual(registry.stats(), {"syncs": 1, "created": 0, "reused": 2, "known_requests": 2})
+
+    def test_missing_request_is_created_once(self):
+        registry = self.registry({"data": [resource("r1", stopped=True)]}, created={"data": resource("r2")})
+        self.assertEqual(registry.ensure()["status"], "created")
+        self.assertEqual(self.client.posted["data"]["relationships"]["app"]["data"]["id"], APP_ID)
+        self.assertEqual(registry.ensure()["status"], "existing")
+        self.assertEqual(self.client.calls, ["list", "POST"])
+        self.assertEqual(len(self.client.http_cache.invalidated), 1)
+
+    def test_conflict_re_lists_and_reuses_the_request_created_elsewhere(self):
+        registry = self.registry({"data": []}, created={"error": 409, "message": "already exists"},
+                                 relisting=[resource("r9")])
+        result = registry.ensure()
+        self.assertEqual(result, {"status": "existing", "request": {"id": "r9", "access_type": ACCESS_ONGOING,
+                                                                    "stopped_due_to_inactivity": False}})
+        self.assertEqual(self.client.calls, ["list", "POST", "relist"])
+        self.assertEqual(len(self.client.http_cache.invalidated), 1)
+        self.assertEqual(registry.stats()["syncs"], 2)
+
+    def test_conflict_without_a_matching_request_returns_the_error(self):
+        registry = self.registry({"data": []}, created={"error": 409, "message": "already exists"},
+                                 relisting=[resource("r9", ACCESS_ONE_TIME_SNAPSHOT)])
+        self.assertEqual(registry.ensure()["error"], 409)
+
+    def test_other_errors_are_returned(self):
+        registry = self.registry({"data": []}, created={"error": 403, "message": "forbidden"})
+        self.assertEqual(registry.ensure()["error"], 403)
+        self.assertEqual(self.client.calls, ["list", "POST"])
+
+    def test_failed_listing_is_returned_as_an_error(self):
+        registry = self.registry({"error": 500, "message": "server error"})
+        self.assertEqual(registry.ensure()["error"], 500)
+        self.assertNotIn("POST", self.client.calls)
+
+    def test_reset_lists_again(self):
+        registry = self.registry({"data": [resource("r1")]})
+        registry.ensure()
+        registry.reset()
+        registry.ensure()
+        self.assertEqual(self.client.calls, ["list", "list"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import gzip
+import unittest
+from datetime import date
+
+from analytics_store import sales_watermark_key
+from report_columns import NUMPY_AVAILABLE
+from sales_backfill import SalesReportBackfill, _parse_sales_columns, _parse_sales_rows, report_dates
+
+DAILY = sales_watermark_key("SALES", "DAILY")
+
+
+def report(report_date: str, report_type: str = "SALES", frequency: str = "DAILY") -> dict:
+    return {"report_type": report_type, "frequency": frequency, "report_date": report_date}
+
+
+class ReportDatesTest(unittest.TestCase):
+    def test_daily_is_newest_first_and_excludes_today(self):
+        self.assertEqual(report_dates("DAILY", date(2026, 10, 16), 3), ["2026-10-15", "2026-10-14", "2026-10-13"])
+
+    def test_weekly_uses_past_sundays(self):
+        # 2026-10-16 is a Friday; the week ending Sunday 2026-10-18 is not over yet
+        self.assertEqual(report_dates("WEEKLY", date(2026, 10, 16), 14), ["2026-10-11", "2026-10-04"])
+
+    def test_monthly_skips_the_current_month(self):
+        self.assertEqual(report_dates("MONTHLY", date(2026, 10, 16), 40), ["2026-09"])
+
+    def test_unknown_frequency(self):
+        with self.assertRaises(ValueError):
+            report_dates("HOURLY", date(2026, 10, 16), 1)
+
+
+class PlanTest(unittest.TestCase):
+    def test_resume_from_skips_earlier_days(self):
+        backfill = SalesReportBackfill(client=None, vendor_number="1")
+        jobs = backfill.plan(date(2026, 10, 16), 5, resume_from={DAILY: "2026-10-13"})
+        self.assertEqual(jobs, [("SALES", "DAILY", "2026-10-15"), ("SALES", "DAILY", "2026-10-14"),
+                                ("SALES", "DAILY", "2026-10-13")])
+
+    def test_subscriber_reports_are_daily_only(self):
+        backfill = SalesReportBackfill(client=None, vendor_number="1")
+        jobs = backfill.plan(date(2026, 10, 16), 1, report_types=("SUBSCRIBER",), frequencies=("DAILY", "WEEKLY"))
+        self.assertEqual(jobs, [("SUBSCRIBER", "DAILY", "2026-10-15")])
+
+    def test_unknown_report_type(self):
+        with self.assertRaises(ValueError):
+            SalesReportBackfill(client=None, vendor_number="1").plan(date(2026, 10, 16), 1, report_types=("X",))
+
+
+class CompleteThroughTest(unittest.TestCase):
+    def setUp(self):
+        self.backfill = SalesReportBackfill(client=None, vendor_number="1")
+        self.jobs = self.backfill.plan(date(2026, 10, 16), 5)
+
+    def test_newest_fetched_day(self):
+        reports = [report(day) for day in ("2026-10-11", "2026-10-12", "2026-10-13", "2026-10-14", "2026-10-15")]
+        self.assertEqual(self.backfill.complete_through(self.jobs, reports), {DAILY: "2026-10-15"})
+
+    def test_days_without_a_report_do_not_block(self):
+        # A 404 (no sales that day) is neither fetched nor failed
+        reports = [report("2026-10-11"), report("2026-10-14")]
+        self.assertEqual(self.backfill.complete_through(self.jobs, reports), {DAILY: "2026-10-14"})
+
+    def test_stops_before_a_failed_day(self):
+        self.backfill._record_failure(("SALES", "DAILY", "2026-10-13"), {"error": 500})
+        reports = [report(day) for day in ("2026-10-11", "2026-10-12", "2026-10-14", "2026-10-15")]
+        self.assertEqual(self.backfill.complete_through(self.jobs, reports), {DAILY: "2026-10-12"})
+        self.assertEqual(self.backfill.errors, [{"error": 500, "report_type": "SALES", "report_date": "2026-10-13"}])
+
+    def test_failed_first_day_leaves_no_mark(self):
+        self.backfill._record_failure(("SALES", "DAILY", "2026-10-11"), {"error": 500})
+        self.assertEqual(self.backfill.complete_through(self.jobs, [report("2026-10-15")]), {})
+
+    def test_keys_are_tracked_separately(self):
+        jobs = self.backfill.plan(date(2026, 10, 16), 2, report_types=("SALES", "SUBSCRIPTION"))
+        self.backfill._record_failure(("SUBSCRIPTION", "DAILY", "2026-10-14"), {"error": 500})
+        reports = [report("2026-10-15"), report("2026-10-15", "SUBSCRIPTION")]
+        self.assertEqual(self.backfill.complete_through(jobs, reports), {DAILY: "2026-10-15"})
+
+
+SALES_REPORT = gzip.compress(
+    b"Provider\tSKU\tUnits\tDeveloper Proceeds\tCountry Code\tCurrency of Proceeds\tProduct Type Identifier\n"
+    b"APPLE\tms\t3\t0\tUS\tUSD\t1F\n"
+    b"APPLE\tms.monthly\t2\t4.99\tUS\tUSD\tIAY\n"
+    b"APPLE\tms.monthly\t1\t4.20\tDE\tEUR\tIAY\n"
+    b"APPLE\tms.yearly\t1\t1,234.50\tJP\tJPY\tIAY\n"
+    b"\n"
+)
+
+
+class ParseSalesReportTest(unittest.TestCase):
+    def test_csv_summary(self):
+        summary = _parse_sales_rows(SALES_REPORT, "SALES")
+        self.assertEqual(summary["rows"], 4)
+        self.assertEqual(summary["totals"], {"Units": 7.0})
+        self.assertEqual(summary["proceeds"], {"USD": 9.98, "EUR": 4.2, "JPY": 1234.5})
+        self.assertEqual(summary["units_by_territory"], {"US": 5.0, "DE": 1.0, "JP": 1.0})
+        self.assertEqual(summary["units_by_product_type"], {"1F": 3.0, "IAY": 4.0})
+
+    @unittest.skipUnless(NUMPY_AVAILABLE, "needs numpy")
+    def test_column_parser_matches_csv_parser(self):
+        self.assertEqual(_parse_sales_columns(SALES_REPORT, "SALES"), _parse_sales_rows(SALES_REPORT, "SALES"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import json
+import tempfile
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+
+from subscription_catalog import SubscriptionCatalog
+
+
+def price(territory: str, proceeds: float, start_date=None, preserved: bool = False) -> dict:
+    return {"territory": territory, "currency": "USD", "customer_price": round(proceeds / 0.7, 2),
+            "proceeds": proceeds, "proceeds_year2": None, "start_date": start_date, "preserved": preserved}
+
+
+class SubscriptionCatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "subscription_catalog.json"
+        self.tomorrow = (date.today() + timedelta(days=1)).isoformat()
+        catalog = {
+            "groups_refreshed_at": 0,
+            "groups": {"g1": {"id": "g1", "reference_name": "Premium", "subscriptions": ["s1", "s2"]}},
+            "subscriptions": {
+                "s1": {"id": "s1", "product_id": "premium.monthly", "subscription_period": "ONE_MONTH",
+                       "prices": [price("USA", 7.0, "2026-01-01"),
+                                  price("USA", 6.3),
+                                  price("USA", 5.6, "2025-06-01", preserved=True),
+                                  price("USA", 8.4, self.tomorrow),
+                                  price("GBR", 6.0, "2026-03-01"),
+                                  price("FRA", 6.5, self.tomorrow)]},
+                "s2": {"id": "s2", "product_id": "premium.yearly", "subscription_period": "ONE_YEAR",
+                       "prices": [price("USA", 50.0, "2025-01-01")]}
+            }
+        }
+        with open(self.path, "w") as f:
+            json.dump(catalog, f)
+        self.catalog = SubscriptionCatalog(client=None, app_id="123", path=self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_price_history_by_date(self):
+        self.assertEqual(self.catalog.price("premium.monthly", "USA", on="2025-12-31")["proceeds"], 6.3)
+        self.assertEqual(self.catalog.price("premium.monthly", "USA", on="2026-01-01")["proceeds"], 7.0)
+        self.assertEqual(self.catalog.price("premium.monthly", "USA", on=self.tomorrow)["proceeds"], 8.4)
+
+    def test_no_price_before_the_first_start(self):
+        self.assertIsNone(self.catalog.price("premium.monthly", "GBR", on="2026-02-28"))
+        self.assertEqual(self.catalog.price("premium.monthly", "GBR", on="2026-03-01")["proceeds"], 6.0)
+
+    def test_preserved_prices_are_ignored(self):
+        # Without the preserved price, 2025-06-01 still falls under the open-ended list price
+        self.assertEqual(self.catalog.price("premium.monthly", "USA", on="2025-06-01")["proceeds"], 6.3)
+
+    def test_current_price_is_as_of_today(self):
+        self.assertEqual(self.catalog.price("premium.monthly", "USA")["proceeds"], 7.0)
+        self.assertIsNone(self.catalog.price("premium.monthly", "FRA"))
+        self.assertEqual(self.catalog.territories("premium.monthly"), ["GBR", "USA"])
+
+    def test_reindexing_picks_up_scheduled_prices(self):
+        self.catalog._index(date.today() + timedelta(days=1))
+        self.assertEqual(self.catalog.price("premium.monthly", "USA")["proceeds"], 8.4)
+        self.assertEqual(self.catalog.territories("premium.monthly"), ["FRA", "GBR", "USA"])
+
+    def test_unknown_product_or_territory(self):
+        self.assertIsNone(self.catalog.price("premium.weekly", "USA"))
+        self.assertIsNone(self.catalog.price("premium.monthly", "JPN", on="2026-06-01"))
+        self.assertEqual(self.catalog.territories("premium.weekly"), [])
+
+    def test_monthly_proceeds(self):
+        self.assertEqual(self.catalog.monthly_proceeds("premium.yearly", "USA"), 4.17)
+        self.assertEqual(self.catalog.monthly_proceeds("premium.monthly", "USA", on="2025-12-31"), 6.3)
+        self.assertIsNone(self.catalog.monthly_proceeds("premium.monthly", "GBR", on="2026-01-01"))
+
+    def test_groups_carry_requested_current_prices(self):
+        [group] = self.catalog.groups(["USA", "FRA"])
+        monthly = group["subscriptions"][0]
+        self.assertEqual(monthly["territories"], 2)
+        self.assertEqual(set(monthly["prices"]), {"USA"})
+        self.assertNotIn("prices_refreshed_at", monthly)
+
+
+if __name__ == "__main__":
+    unittest.main()